@@ -0,0 +1,49 @@
+"""
+Times reading EMD trees with many nodes, and compares the cost of looking up
+node classes in the class registry with rebuilding the lookup table from a
+full module search for every node, as emdfile did before the registry.
+
+Run with
+
+    python benchmarks/bench_class_registry.py
+"""
+
+import os
+import tempfile
+from time import perf_counter
+import h5py
+import numpy as np
+import emdfile as emd
+from emdfile.classes.utils import _get_class, _update_class_registry
+
+def make_tree(N):
+    root = emd.Root(name='root')
+    for i in range(N):
+        node = emd.Array(data=np.zeros(2),name=f'node{i}')
+        node.metadata = emd.Metadata(name='md',data={'i':i})
+        root.tree(node)
+    return root
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d,'bench.h5')
+        for N in (100,1000,5000):
+            emd.save(path,make_tree(N),mode='o')
+            t0 = perf_counter()
+            emd.read(path)
+            t_read = perf_counter()-t0
+            with h5py.File(path,'r') as f:
+                groups = [f[f'root/node{i}'] for i in range(N)]
+                t0 = perf_counter()
+                for g in groups:
+                    _get_class(g)
+                t_cached = perf_counter()-t0
+                t0 = perf_counter()
+                for g in groups:
+                    _update_class_registry(force=True)
+                    _get_class(g)
+                t_scan = perf_counter()-t0
+            print(f"{N:>5} nodes:  read {t_read:7.3f} s   class lookups: registry {t_cached:7.4f} s, full search per node {t_scan:7.3f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Times writing and reading a tree whose nodes carry large calibration-like
+Metadata instances, in the default and compact metadata layouts, and reading
+it lazily.
+
+Run with
+
+    python benchmarks/bench_metadata.py
+"""
+
+import os
+import tempfile
+from time import perf_counter
+import h5py
+import numpy as np
+import emdfile as emd
+
+def make_metadata(n_items):
+    md = emd.Metadata(name='calibration')
+    for i in range(n_items):
+        if i%3 == 0:
+            md[f'param{i}'] = float(i)
+        elif i%3 == 1:
+            md[f'param{i}'] = f'value{i}'
+        else:
+            md[f'param{i}'] = bool(i%2)
+    md['labels'] = [f'label{i}' for i in range(50)]
+    md['kernels'] = [np.ones(16)*i for i in range(20)]
+    return md
+
+def make_tree(n_nodes, n_items):
+    root = emd.Root(name='root')
+    for i in range(n_nodes):
+        node = emd.Array(data=np.zeros(2),name=f'node{i}')
+        node.metadata = make_metadata(n_items)
+        root.tree(node)
+    return root
+
+def count_objects(path):
+    n = []
+    with h5py.File(path,'r') as f:
+        f.visit(n.append)
+    return len(n)
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d,'bench.h5')
+        root = make_tree(20,300)
+        for compact in (False,True):
+            t0 = perf_counter()
+            emd.save(path,root,mode='o',compact_metadata=compact)
+            t_write = perf_counter()-t0
+            t0 = perf_counter()
+            emd.read(path)
+            t_read = perf_counter()-t0
+            t0 = perf_counter()
+            lazy = emd.read(path,lazy=True)
+            t_lazy = perf_counter()-t0
+            del lazy
+            print(f"compact={compact}: write {t_write:.3f} s, read {t_read:.3f} s, "
+                  f"lazy read {t_lazy:.3f} s, {count_objects(path)} HDF5 objects")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""
+Times building a PointList by appending one point at a time.
+
+Run with
+
+    python benchmarks/bench_pointlist_append.py
+"""
+
+from time import perf_counter
+import numpy as np
+import emdfile as emd
+
+dtype = np.dtype([('qx',np.float32),('qy',np.float32),('intensity',np.float32)])
+
+def main():
+    point = np.ones(1,dtype=dtype)
+    for N in (1000,10000,50000):
+        pl = emd.PointList(data=np.zeros(0,dtype=dtype))
+        t0 = perf_counter()
+        for i in range(N):
+            pl.add(point)
+        t = perf_counter()-t0
+        print(f"{N} appends: {t:.3f} s, {t/N*1e6:.2f} us per point")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Times the construction of large, empty PointListArrays and first access of
+every cell, then writing and reading them in the 'vlen' and 'flat' HDF5
+layouts, and reading 1000 random cells lazily.
+
+Run with
+
+    python benchmarks/bench_pointlistarray.py
+"""
+
+import os
+import tempfile
+import tracemalloc
+from time import perf_counter
+import numpy as np
+import emdfile as emd
+
+dtype = [('qx',np.float32),('qy',np.float32),('intensity',np.float32)]
+
+def main():
+    for N in (128,256,512):
+        tracemalloc.start()
+        t0 = perf_counter()
+        pla = emd.PointListArray(dtype=dtype,shape=(N,N))
+        t_init = perf_counter()-t0
+        mem = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        t0 = perf_counter()
+        for i in range(N):
+            for j in range(N):
+                pla[i,j]
+        t_access = perf_counter()-t0
+        print(f"{N}x{N}: init {t_init*1e3:.2f} ms, {mem/1e6:.3f} MB; "
+              f"first access of every cell {t_access:.2f} s")
+
+        # i/o, with ~10 points per cell
+        counts = np.random.poisson(10,N*N)
+        pla._data = np.zeros(counts.sum(),dtype=dtype)
+        pla._offsets[1:] = np.cumsum(counts)
+        pla._cells,pla._views = {},{}
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d,'bench.h5')
+            for layout in ('vlen','flat'):
+                pla.layout = layout
+                t0 = perf_counter()
+                emd.save(path,pla,mode='o')
+                t_write = perf_counter()-t0
+                t0 = perf_counter()
+                emd.read(path)
+                t_read = perf_counter()-t0
+                t0 = perf_counter()
+                lazy = emd.read(path,lazy=True)
+                for i,j in zip(*np.random.randint(0,N,(2,1000))):
+                    lazy[i,j]
+                t_lazy = perf_counter()-t0
+                del lazy
+                print(f"    {layout}: write {t_write:.3f} s, read {t_read:.3f} s, "
+                      f"lazy read of 1000 cells {t_lazy:.3f} s")
+
+if __name__ == '__main__':
+    main()
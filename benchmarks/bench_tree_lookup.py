@@ -0,0 +1,58 @@
+"""
+Times node lookups by path in deep and wide EMD trees, comparing the root's
+path index with walking the tree one level at a time through each node's
+Branch, as emdfile did before the index.
+
+Run with
+
+    python benchmarks/bench_tree_lookup.py
+"""
+
+from time import perf_counter
+import emdfile as emd
+
+def make_deep(depth):
+    root = emd.Root(name='root')
+    node,path = root,''
+    for i in range(depth):
+        n = emd.Node(name=f'n{i}')
+        node.tree(n)
+        node,path = n,path+f'/n{i}'
+    return root,[path]
+
+def make_wide(width):
+    root = emd.Root(name='root')
+    paths = []
+    for i in range(width):
+        n = emd.Node(name=f'n{i}')
+        root.tree(n)
+        n.tree(emd.Node(name='leaf'))
+        paths.append(f'/n{i}/leaf')
+    return root,paths
+
+def time_lookups(root,paths,N):
+    t0 = perf_counter()
+    for _ in range(N):
+        for p in paths:
+            root.tree(p)
+    t_index = perf_counter()-t0
+    t0 = perf_counter()
+    for _ in range(N):
+        for p in paths:
+            root._branch[p]
+    t_walk = perf_counter()-t0
+    return t_index,t_walk
+
+def main():
+    for label,(root,paths),N in (
+        ('deep,  10 levels',make_deep(10),20000),
+        ('deep, 100 levels',make_deep(100),2000),
+        ('wide,  1000 nodes',make_wide(1000),200),
+        ('wide, 10000 nodes',make_wide(10000),20),
+    ):
+        t_index,t_walk = time_lookups(root,paths,N)
+        n = N*len(paths)
+        print(f"{label}:  {n} lookups  index {1e6*t_index/n:6.2f} us/lookup   walk {1e6*t_walk/n:6.2f} us/lookup")
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,8 @@ from emdfile.classes import (
     Array,
     PointList,
     PointListArray,
-    Custom
+    Custom,
+    register_class
 )
 
 # version
@@ -31,9 +32,12 @@ def set_program(program):
     _PROGRAM_NAME = program
 
 # read/write
-from emdfile.read import read,print_h5_tree
+from emdfile.read import read,print_h5_tree,read_pla_counts
 from emdfile.read import print_h5_tree as printtree
-from emdfile.write import write as save
+from emdfile.write import write as save, Writer
+from emdfile.lazy import DatasetProxy
+from emdfile.stream import ArrayStream, PointListArrayStream
+from emdfile.repack import repack
 from emdfile.utils import (
     _is_EMD_file,
     _get_EMD_version,
@@ -8,3 +8,4 @@ from emdfile.classes.pointlist import PointList
 from emdfile.classes.pointlistarray import PointListArray
 from emdfile.classes.custom import Custom
 
+from emdfile.classes.utils import register_class
@@ -1,9 +1,12 @@
+import re
 import h5py
 import numpy as np
 from typing import Optional,Union
 from numbers import Number
 from os.path import basename
 from emdfile.classes.node import Node
+from emdfile.classes.utils import _get_io_option
+from emdfile.lazy import _lazy_dataset
 
 class Array(Node):
     """
@@ -130,6 +133,26 @@ class Array(Node):
             >>> ar.depth    # 0 for non stacks; # arrays for stacks
             >>> ar.rank     # N for non stacks; N-1 for stacks
             >>> ar.shape    # length N for non stacks; length N-1 for stacks
+
+    .. topic:: Storage
+
+        By default Array data is written to a contiguous, uncompressed HDF5
+        dataset. The dataset layout can be set for a single Array with
+
+            >>> ar.set_storage(
+            >>>     chunks = 'diffraction',
+            >>>     compression = 'gzip',
+            >>>     compression_opts = 4,
+            >>>     shuffle = True,
+            >>> )
+
+        or for all Arrays in a write call with
+
+            >>> emdfile.save(path, data, storage={'compression':'lzf'})
+
+        where values set on an Array take precedence over those passed to
+        ``save``.  See ``set_storage`` for the valid options.  Arrays read from
+        file retain the layout they were stored with.
     """
     _emd_group_type = 'array'
     def __init__(
@@ -194,6 +217,7 @@ class Array(Node):
         self.data = data
         self.name = name
         self.units = units
+        self._storage = {}
 
         # For array stacks, setup shape and labels
         if slicelabels is None:
@@ -497,13 +521,74 @@ class Array(Node):
         string += "\n)"
         return string
 
+    # HDF5 dataset layout
+    @property
+    def storage(self):
+        return dict(getattr(self,'_storage',{}))
+    def set_storage(
+        self,
+        chunks = None,
+        compression = None,
+        compression_opts = None,
+        shuffle = None,
+        fillvalue = None,
+        ):
+        """
+        Sets the layout of the HDF5 dataset this Array's data is written to.
+        Arguments left as None are not set, and fall back to any value passed
+        to ``emdfile.save(..., storage=...)``, and then to the defaults.
+
+        Parameters
+        ----------
+        chunks : None or True or False or str or tuple
+            the chunk shape. True or 'auto' lets h5py choose a chunk shape.
+            'diffraction' stores one array frame - the last two axes - per
+            chunk, e.g. one diffraction pattern of a 4D-STEM datacube.  'real'
+            stores the first two axes per chunk, e.g. one real space image of a
+            4D-STEM datacube at a single detector pixel.  For stack arrays the
+            stack axis is excluded from both patterns and is chunked with size
+            1. A tuple sets the chunk shape explicitly, and False requests a
+            contiguous dataset. If chunks are not set and a filter is, defaults
+            to 'diffraction' for arrays with 3 or more dimensions, and to 'auto'
+            otherwise
+        compression : None or str or int
+            'gzip', 'lzf', or the integer id of a registered HDF5 filter
+        compression_opts : None or int or tuple
+            options for the compression filter, e.g. the gzip level, 0-9
+        shuffle : None or bool
+            if True, applies the byte shuffle filter before compression
+        fillvalue : None or number
+            the dataset fill value
+        """
+        storage = {
+            'chunks' : chunks,
+            'compression' : compression,
+            'compression_opts' : compression_opts,
+            'shuffle' : shuffle,
+            'fillvalue' : fillvalue,
+        }
+        self._storage = self.storage
+        self._storage.update({k:v for k,v in storage.items() if v is not None})
+
+    def _get_dataset_kwargs(self,shape=None):
+        """
+        Returns a dictionary of keyword arguments for h5py's create_dataset
+        specifying the layout of this Array's data, merging this Array's
+        storage settings with those passed to the current write call. Chunk
+        shapes are computed for the data shape, or for ``shape`` if passed.
+        """
+        shape = self.data.shape if shape is None else shape
+        storage = _validate_storage(_get_io_option('storage'))
+        storage.update(self.storage)
+        return _get_dataset_kwargs(storage,shape,self.is_stack)
+
     # HDF5 read/write
     # write
     def to_h5(self,group):
         """
         Calls Node.to_h5 to greate the group's node and write its metadata.
         Then writes Array data, calibration vectors, units, and any stack/label
-        info.
+        info. The data's dataset layout is set by the ``.storage`` settings.
 
         Parameters
         ----------
@@ -520,11 +605,24 @@ class Array(Node):
         data = grp.create_dataset(
             "data",
             shape = self.data.shape,
-            data = self.data
-            #dtype = type(self.data)
+            data = self.data,
+            **self._get_dataset_kwargs()
         )
         data.attrs.create('units',self.units) # save 'units' but not 'name' - 'name' is the group name
 
+        # Add the dim vectors
+        self._write_dims(grp)
+
+        # return
+        return grp
+
+    def _write_dims(self,grp):
+        """
+        Writes the dim vectors, their names and units, and any stack labels
+        into the Array's h5py Group ``grp``. Dim datasets already in ``grp``
+        are overwritten.
+        """
+        names = []
         # Add the normal dim vectors
         for n in range(self.rank):
             # unpack info
@@ -535,26 +633,78 @@ class Array(Node):
             if self._dim_is_linear(dim,self.shape[n]):
                 dim = dim[:2]
             # write
-            dset = grp.create_dataset(
+            dset = _write_dataset(
+                grp,
                 f"dim{n}",
-                data = dim
+                dim
             )
             dset.attrs.create('name',str(name))
             dset.attrs.create('units',str(units))
+            names.append(f"dim{n}")
 
         # Add stack dim vector, if present
         if self.is_stack:
             n = self.rank
             dim = [s.encode('utf-8') for s in self.slicelabels]
             # write
-            dset = grp.create_dataset(
+            dset = _write_dataset(
+                grp,
                 f"dim{n}",
-                data = dim
+                dim
             )
             dset.attrs.create('name','_labels_')
+            names.append(f"dim{n}")
 
-        # return
-        return grp
+        # Remove any other dim vectors, leaving child nodes of the same name
+        for k in list(grp.keys()):
+            if re.fullmatch(r'dim\d+',k) and k not in names and \
+                    isinstance(grp[k],h5py.Dataset) and \
+                    'emd_group_type' not in grp[k].attrs:
+                del(grp[k])
+
+    def _update_h5(self,group):
+        """
+        Writes this Array into the group it was previously written to, in
+        place, if the stored data's shape, dtype, and layout still match;
+        otherwise returns False and leaves the group unchanged.  Rewrites the
+        data, units and dim vectors.  Metadata and downstream nodes are not
+        touched.
+
+        Parameters
+        ----------
+        group : h5py Group
+
+        Returns
+        -------
+        (bool) True if the group was updated
+        """
+        if not Node._update_h5(self,group):
+            return False
+        dset = group.get('data')
+        if not isinstance(dset,h5py.Dataset) or not _dataset_matches(
+            dset,
+            self.data.shape,
+            self.data.dtype,
+            self._get_dataset_kwargs()
+            ):
+            return False
+        # write the data
+        dset[...] = self.data
+        dset.attrs['units'] = self.units
+        # write the dim vectors
+        self._write_dims(group)
+        return True
+
+    def _fingerprint_items(self):
+        return [
+            self.data,
+            self.units,
+            self.dims,
+            self.dim_names,
+            self.dim_units,
+            self.slicelabels,
+            self._get_dataset_kwargs(),
+        ]
 
     # read
     @classmethod
@@ -565,8 +715,17 @@ class Array(Node):
         constructor.
         """
         # get data
+        # if a region was requested read only that hyperslab, and
+        # in lazy mode, defer reading to slicing/access time
         dset = group['data']
-        data = dset[:]
+        region = _get_io_option('region')
+        if region is not None:
+            region = _normalize_region(region,dset.shape)
+            data = dset[region]
+        elif _get_io_option('lazy', False):
+            data = _lazy_dataset(dset)
+        else:
+            data = dset[:]
         units = dset.attrs['units']
         rank = len(data.shape)
 
@@ -585,7 +744,13 @@ class Array(Node):
         dim_names = []
         for n in range(normal_dims):
             dim_dset = group[f"dim{n}"]
-            dims.append(dim_dset[:])
+            dim = dim_dset[:]
+            # slice the dim vectors to match a region
+            if region is not None:
+                ax = n+1 if is_stack else n
+                dim = np.asarray(cls._unpack_dim(dim,dset.shape[ax]))
+                dim = dim[region[ax]]
+            dims.append(dim)
             dim_units.append(dim_dset.attrs['units'])
             dim_names.append(dim_dset.attrs['name'])
 
@@ -593,6 +758,8 @@ class Array(Node):
         if is_stack:
             slicelabels = last_dim[:]
             slicelabels = [s.decode('utf-8') for s in slicelabels]
+            if region is not None:
+                slicelabels = slicelabels[region[0]]
         else:
             slicelabels = None
 
@@ -607,6 +774,183 @@ class Array(Node):
             'slicelabels' : slicelabels
         }
 
+    def _populate_instance(self,group):
+        """
+        Run while reading an object from file after initial instantiation.
+        Records the layout of the stored dataset, so that it's retained if
+        this Array is re-written.
+        """
+        self._storage = _get_storage(group['data'])
+
+
+# Dataset layout helpers
+
+_storage_keys = (
+    'chunks',
+    'compression',
+    'compression_opts',
+    'shuffle',
+    'fillvalue',
+)
+
+def _validate_storage(storage):
+    """
+    Checks the keys of a storage dictionary and returns a copy of it
+    """
+    if storage is None:
+        return {}
+    assert(isinstance(storage,dict)), f"`storage` must be a dict, not type {type(storage)}"
+    for k in storage.keys():
+        assert(k in _storage_keys), f"unrecognized storage option {k}; must be in {_storage_keys}"
+    return dict(storage)
+
+def _normalize_region(region, shape):
+    """
+    Returns a tuple of slices, one per axis of an array of shape ``shape``,
+    from a ``region`` selection. ``region`` may contain slices with positive
+    steps, integers, which select a length 1 slice so that the array rank is
+    preserved, and at most one Ellipsis. Missing trailing axes are selected
+    in full.
+    """
+    if not isinstance(region,tuple):
+        region = (region,)
+    assert(sum([x is Ellipsis for x in region]) <= 1), "a region may contain at most one Ellipsis"
+    if Ellipsis in region:
+        i = region.index(Ellipsis)
+        fill = (slice(None),)*(len(shape)-len(region)+1)
+        region = region[:i] + fill + region[i+1:]
+    assert(len(region) <= len(shape)), f"region {region} has more axes than the data shape {shape}"
+    region = region + (slice(None),)*(len(shape)-len(region))
+    ans = []
+    for x,s in zip(region,shape):
+        if isinstance(x,(int,np.integer)):
+            x = int(x)
+            if x < 0:
+                x += s
+            assert(0 <= x < s), f"region index {x} is out of bounds for an axis of length {s}"
+            x = slice(x,x+1)
+        assert(isinstance(x,slice)), f"regions must contain slices or integers, not type {type(x)}"
+        start,stop,step = x.indices(s)
+        assert(step > 0), "region slices must have positive steps"
+        stop = max(start,stop)
+        ans.append(slice(start,stop,step))
+    return tuple(ans)
+
+def _get_storage(dset):
+    """
+    Returns the storage settings describing the layout of h5py Dataset ``dset``
+    """
+    storage = {
+        'chunks' : dset.chunks,
+        'compression' : dset.compression,
+        'compression_opts' : dset.compression_opts,
+        'shuffle' : dset.shuffle or None,
+    }
+    return {k:v for k,v in storage.items() if v is not None}
+
+def _get_dataset_kwargs(storage, shape, is_stack=False):
+    """
+    Returns a dictionary of keyword arguments for h5py's create_dataset from
+    a dictionary of storage settings, for data of shape ``shape``
+    """
+    kwargs = {k:v for k,v in storage.items() if k != 'chunks' and v is not None}
+    chunks = storage.get('chunks')
+    # default to chunking when filters are requested
+    if chunks is None and any(
+        [kwargs.get(k) for k in ('compression','shuffle')]):
+        chunks = 'diffraction' if len(shape) >= 3 else True
+    chunks = _resolve_chunks(
+        chunks,
+        shape,
+        is_stack
+    )
+    if chunks is not None:
+        kwargs['chunks'] = chunks
+    return kwargs
+
+def _write_dataset(grp, name, data):
+    """
+    Writes ``data`` to the dataset ``name`` in h5py Group ``grp``, in place if
+    a dataset of that name with the same shape and dtype exists, or otherwise
+    creating it.  Returns the dataset.
+    """
+    data = np.asarray(data)
+    if name in grp:
+        dset = grp[name]
+        if dset.shape == data.shape and dset.dtype == data.dtype:
+            dset[...] = data
+            return dset
+        del(grp[name])
+    return grp.create_dataset(
+        name,
+        data = data
+    )
+
+def _dataset_matches(dset, shape, dtype, kwargs):
+    """
+    Returns True if the h5py Dataset ``dset`` has shape ``shape`` and dtype
+    ``dtype``, and the layout requested by the create_dataset keyword
+    arguments ``kwargs``, so that it can be written into in place.  Settings
+    absent from ``kwargs`` take their defaults.
+    """
+    if dset.shape != tuple(shape) or dset.dtype != dtype:
+        return False
+    # chunks
+    chunks = kwargs.get('chunks')
+    if chunks is None:
+        if dset.chunks is not None:
+            return False
+    elif chunks is True:
+        if dset.chunks is None:
+            return False
+    elif tuple(chunks) != dset.chunks:
+        return False
+    # filters
+    compression = kwargs.get('compression')
+    if compression is not None and not isinstance(compression,str):
+        return False
+    if compression != dset.compression:
+        return False
+    if kwargs.get('compression_opts') is not None and \
+            kwargs['compression_opts'] != dset.compression_opts:
+        return False
+    if bool(kwargs.get('shuffle',False)) != dset.shuffle:
+        return False
+    if dset.fletcher32 or dset.scaleoffset is not None:
+        return False
+    # fill value
+    if kwargs.get('fillvalue') is not None and \
+            kwargs['fillvalue'] != dset.fillvalue:
+        return False
+    return True
+
+def _resolve_chunks(chunks, shape, is_stack=False):
+    """
+    Returns a chunk shape to pass to h5py from a ``chunks`` storage setting
+    (see Array.set_storage) and the shape of the data being written. Returns
+    None for contiguous datasets.
+    """
+    if chunks is None or chunks is False:
+        return None
+    if chunks is True or chunks == 'auto':
+        return True
+    ndim = len(shape)
+    if isinstance(chunks,str):
+        # the first axis of stack arrays is excluded from the access patterns
+        start = 1 if is_stack else 0
+        if chunks == 'diffraction':
+            axes = range(max(start,ndim-2),ndim)
+        elif chunks == 'real':
+            axes = range(start,min(start+2,ndim))
+        else:
+            raise Exception(f"unrecognized chunk pattern '{chunks}'; must be 'auto', 'diffraction', or 'real'")
+        return tuple(
+            [max(shape[i],1) if i in axes else 1 for i in range(ndim)])
+    chunks = tuple(chunks)
+    assert(len(chunks) == ndim), f"chunk shape {chunks} doesn't match the data rank {ndim}"
+    # chunks may not be larger than the data
+    return tuple([min(c,max(s,1)) for c,s in zip(chunks,shape)])
+
 # List subclass for accessing data slices with a dict
 class Labels(list):
 
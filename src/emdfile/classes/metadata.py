@@ -1,7 +1,14 @@
+import json
+import h5py
 import numpy as np
-from numbers import Number
+from numbers import Number, Real
 from typing import Optional
 from os.path import basename
+from emdfile.classes.utils import _get_io_option
+
+# name of the dataset holding the packed scalar items of a Metadata group
+# written in compact mode
+_compact_items_name = '_emd_compact_items'
 
 class Metadata:
     """
@@ -83,6 +90,28 @@ class Metadata:
         will subsequently return Metadata instance 'md1'. When saved to
         an HDF5 file, all the metadata instances returned by a node's
         ``.metadata`` property are saved to that nodes metadatabundle group.
+
+    .. topic:: Compact Storage
+
+        By default each metadata item is stored as its own HDF5 dataset, and
+        each element of a list or tuple of strings or arrays as another.
+        Saving with ``emdfile.save(..., compact_metadata=True)`` instead packs
+        all the None, string, bool and real number items of each Metadata
+        instance or nested dict into a single JSON encoded dataset, stores
+        lists and tuples of strings as a single variable length string
+        dataset, and lists and tuples of arrays sharing a numeric dtype as a
+        single concatenated dataset, greatly reducing the number of HDF5
+        objects written and read. Both layouts are read transparently, but
+        files written in compact mode can't be read by versions of emdfile
+        which predate it.
+
+    .. topic:: Lazy Loading
+
+        Metadata read with ``emdfile.read(..., lazy=True)`` reads only the
+        names of its items from the file. Each value is read the first time
+        it's accessed, e.g. by ``md['param']``, and kept thereafter; items
+        packed in compact mode are read together up front. Until all its
+        values have been read the Metadata holds the HDF5 file open.
     """
     _emd_group_type = 'metadata'
     def __init__(
@@ -119,6 +148,13 @@ class Metadata:
         md._params.update(self._params)
         return md
 
+    def load(self):
+        """
+        Reads any values of lazily read Metadata not yet read from the file
+        """
+        if isinstance(self._params,_LazyParams):
+            self._params.load()
+
     def __repr__(self):
         space = ' '*len(self.__class__.__name__)+'  '
         string = f"{self.__class__.__name__}( A Metadata instance called '{self.name}', containing the following fields:"
@@ -149,9 +185,86 @@ class Metadata:
         grp.attrs.create("emd_group_type","metadata")
         grp.attrs.create("python_class",self.__class__.__name__)
         # Loop + save
-        for k,v in self._params.items():
+        self._save_items(self._params,grp)
+
+    def _save_items(self,items,grp):
+        """
+        For some (dict, group), saves each item in the dict to group. In
+        compact mode, the items which can be packed are first saved together.
+        """
+        packed,items = _split_packed(items)
+        if len(packed) > 0:
+            _save_packed(packed,grp)
+        for k,v in items.items():
             self._save_item(k,v,grp)
 
+    # update
+    def _update_h5(self,group):
+        """
+        Accepts the h5py Group this instance's name was previously saved to,
+        open in append mode, and updates it in place to match this instance:
+        items which have changed are rewritten, items no longer present are
+        removed, and unchanged items are left as they are.  In a dry run
+        write, only compares.
+
+        Parameters
+        ----------
+        group : h5py Group
+
+        Returns
+        -------
+        (bool) True if anything changed
+        """
+        return self._update_items(dict(self._params.items()),group)
+
+    def _update_items(self,items,grp):
+        """
+        For some (dict, group) holding previously saved items, rewrites only
+        the items which differ from those in the dict, and removes those not in
+        the dict. Nested dicts are updated in the same way. Returns True if any
+        item changed.
+        """
+        dry_run = _get_io_option('dry_run',False)
+        changed = False
+        packed,items = _split_packed(items)
+        # packed items are compared and rewritten together
+        if len(packed) > 0:
+            if _compact_items_name in grp:
+                if not _items_equal(packed,
+                        self._read_item(_compact_items_name,grp[_compact_items_name],grp)):
+                    changed = True
+                    if not dry_run:
+                        del grp[_compact_items_name]
+                        _save_packed(packed,grp)
+            else:
+                changed = True
+                if not dry_run:
+                    _save_packed(packed,grp)
+        # remove items no longer present
+        for k in list(grp.keys()):
+            if k not in items and not (k == _compact_items_name and len(packed) > 0):
+                changed = True
+                if not dry_run:
+                    del grp[k]
+        # update the rest
+        for k,v in items.items():
+            if k in grp:
+                if isinstance(v,dict) and _get_item_type(grp[k]) == 'dict':
+                    changed |= self._update_items(v,grp[k])
+                    continue
+                try:
+                    same = _items_equal(v,self._read_item(k,grp[k],grp))
+                except Exception:
+                    same = False
+                if same:
+                    continue
+                if not dry_run:
+                    del grp[k]
+            changed = True
+            if not dry_run:
+                self._save_item(k,v,grp)
+        return changed
+
     def _save_item(self,k,v,grp):
         """
         For some (key, value, group), saves the piece of metadata to group.
@@ -160,8 +273,24 @@ class Metadata:
         if isinstance(v,dict):
             _grp = grp.create_group(k)
             _grp.attrs['type'] = 'dict'
-            for _k,_v in v.items():
-                self._save_item(_k,_v,_grp)
+            self._save_items(v,_grp)
+        # compact mode lists and tuples of strings or arrays
+        elif _get_io_option('compact_metadata',False) and _is_packable_sequence(v):
+            name = ('list' if isinstance(v,list) else 'tuple') + \
+                ('_of_strings_packed' if isinstance(v[0],str) else '_of_arrays_packed')
+            if isinstance(v[0],str):
+                dset = grp.create_dataset(
+                    k,
+                    data = list(v),
+                    dtype = h5py.string_dtype('utf-8')
+                )
+            else:
+                dset = grp.create_dataset(
+                    k,
+                    data = np.concatenate([ar.ravel() for ar in v])
+                )
+                dset.attrs['shapes'] = json.dumps([list(ar.shape) for ar in v])
+            dset.attrs['type'] = name.encode('utf-8')
         # None
         elif v is None:
             v = "_None"
@@ -282,11 +411,22 @@ class Metadata:
         er = f"Group {group} is not a valid EMD Metadata group"
         assert("emd_group_type" in group.attrs.keys()), er
         assert(group.attrs["emd_group_type"] == "metadata"), er
+        # make Metadata instance
+        md = cls(name=basename(group.name))
+        # lazy mode: read the item names, and the values only on access
+        if _get_io_option('lazy',False):
+            params = _LazyParams(md._params)
+            for k in group.keys():
+                if k == _compact_items_name:
+                    params.update(cls._read_item(k,group[k],group))
+                else:
+                    dict.__setitem__(params,k,_LazyItem(cls,group,k))
+            md._params = params
+            return md
         # Loop and get data
         data = {}
         cls._read_items(group,data)
-        # make Metadata instance, add data, and return
-        md = cls(basename(group.name))
+        # add data and return
         md._params.update(data)
         return md
 
@@ -297,7 +437,10 @@ class Metadata:
         items into dict. Nothing is returned.
         """
         for k,v in group.items():
-            data[k] = cls._read_item(k,v,group)
+            if k == _compact_items_name:
+                data.update(cls._read_item(k,v,group))
+            else:
+                data[k] = cls._read_item(k,v,group)
 
     @classmethod
     def _read_item(cls, k, v, group):
@@ -307,9 +450,7 @@ class Metadata:
         """
         # Get type
         try:
-            t = group[k].attrs['type']
-            if isinstance(t,bytes):
-                t = t.decode('utf-8')
+            t = _get_item_type(group[k])
         except KeyError:
             raise Exception(f"unrecognized Metadata value type {type(v)}")
 
@@ -385,8 +526,145 @@ class Metadata:
                 s = v[str(l)][...].item().decode('utf-8')
                 _list.append(s)
             v = _list
+        # compact mode items
+        elif t == 'compact_items':
+            v = json.loads(v[...].item().decode('utf-8'))
+        elif t in ('list_of_strings_packed','tuple_of_strings_packed'):
+            v = list(v.asstr()[...])
+            v = v if t.startswith('list') else tuple(v)
+        elif t in ('list_of_arrays_packed','tuple_of_arrays_packed'):
+            shapes = json.loads(group[k].attrs['shapes'])
+            flat = v[...]
+            _list = []
+            i = 0
+            for shape in shapes:
+                n = int(np.prod(shape))
+                _list.append(flat[i:i+n].reshape(shape))
+                i += n
+            v = _list if t.startswith('list') else tuple(_list)
         else:
             raise Exception(f"unrecognized Metadata value type {t}")
 
         # return
         return v
+
+
+class _LazyItem:
+    """
+    Placeholder for a metadata value not yet read from its h5py Group
+    """
+    __slots__ = ('cls','group','key')
+    def __init__(self, cls, group, key):
+        self.cls = cls
+        self.group = group
+        self.key = key
+    def load(self):
+        return self.cls._read_item(self.key,self.group[self.key],self.group)
+
+class _LazyParams(dict):
+    """
+    The items dict of lazily read Metadata. Values held as placeholders are
+    read from file the first time they're accessed, by any means - indexing,
+    ``.get``, ``.items``, ``.values``, or copying into another dict.
+    """
+    def __getitem__(self, k):
+        v = dict.__getitem__(self, k)
+        if isinstance(v,_LazyItem):
+            v = v.load()
+            dict.__setitem__(self, k, v)
+        return v
+    # overriding __iter__ makes dict.update and dict() go through __getitem__
+    def __iter__(self):
+        return dict.__iter__(self)
+    def get(self, k, default=None):
+        return self[k] if k in self else default
+    def pop(self, k, *default):
+        v = dict.pop(self, k, *default)
+        return v.load() if isinstance(v,_LazyItem) else v
+    def items(self):
+        return [(k,self[k]) for k in self]
+    def values(self):
+        return [self[k] for k in self]
+    def copy(self):
+        return dict(self.items())
+    def load(self):
+        for k in self:
+            self[k]
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+def _get_item_type(obj):
+    """
+    Returns the type tag of the h5py Dataset or Group holding a metadata item
+    """
+    t = obj.attrs['type']
+    if isinstance(t,bytes):
+        t = t.decode('utf-8')
+    return t
+
+def _items_equal(a, b):
+    """
+    True if metadata values ``a`` and ``b`` are equal in value and type, up
+    to numpy scalars being read back as Python scalars
+    """
+    a,b = _to_json(a),_to_json(b)
+    if isinstance(a,np.ndarray) or isinstance(b,np.ndarray):
+        return isinstance(a,np.ndarray) and isinstance(b,np.ndarray) and \
+            a.dtype == b.dtype and a.shape == b.shape and \
+            a.tobytes() == b.tobytes()
+    if type(a) != type(b):
+        return False
+    if isinstance(a,(list,tuple)):
+        return len(a) == len(b) and all([_items_equal(x,y) for x,y in zip(a,b)])
+    if isinstance(a,dict):
+        return a.keys() == b.keys() and all([_items_equal(a[k],b[k]) for k in a])
+    return a == b
+
+def _split_packed(items):
+    """
+    Returns the dicts of (items packed in compact mode, all other items).
+    Nothing is packed unless compact mode is on.
+    """
+    if not _get_io_option('compact_metadata',False):
+        return {},items
+    packed = {k:v for k,v in items.items() if _is_packable(v)}
+    return packed,{k:v for k,v in items.items() if k not in packed}
+
+def _save_packed(packed, grp):
+    """
+    Saves a dict of packable items to group as a single dataset
+    """
+    dset = grp.create_dataset(
+        _compact_items_name,
+        data = json.dumps(
+            {k:_to_json(v) for k,v in packed.items()}
+        ).encode('utf-8')
+    )
+    dset.attrs['type'] = 'compact_items'.encode('utf-8')
+
+def _is_packable(v):
+    """
+    True if ``v`` is stored in the compact items dataset in compact mode
+    """
+    return v is None or isinstance(v,(str,bool)) or (
+        isinstance(v,Real) and not isinstance(v,np.bool_))
+
+def _to_json(v):
+    """
+    Converts a packable value to a native Python type
+    """
+    return v.item() if isinstance(v,np.generic) else v
+
+def _is_packable_sequence(v):
+    """
+    True if ``v`` is a list or tuple of strings, or of numeric arrays sharing
+    a dtype, which are stored in a single dataset in compact mode
+    """
+    if not isinstance(v,(list,tuple)) or len(v) == 0:
+        return False
+    if all([isinstance(x,str) for x in v]):
+        return True
+    return all([isinstance(x,np.ndarray) for x in v]) and \
+        v[0].dtype.kind in 'biufc' and \
+        all([x.dtype == v[0].dtype for x in v])
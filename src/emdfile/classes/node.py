@@ -2,7 +2,8 @@ import h5py
 from os.path import basename
 from typing import Optional
 from emdfile.classes import Metadata
-from emdfile.classes.utils import EMD_group_types, _get_class
+from emdfile.classes.utils import (EMD_group_types, _get_class, _get_io_option,
+    _set_io_options, _checksum, _defining_class)
 
 class Node:
     """
@@ -172,6 +173,12 @@ class Node:
         You'll then need to make sure this data is read successfully by modifying
         another method, discussed next.
 
+        Nodes of classes which override ``.to_h5`` are always rewritten when
+        saved in append-over mode.  To let unchanged instances of such a class
+        be skipped, also override ``._fingerprint_items`` to return the parent
+        class's list plus any values the new ``.to_h5`` writes outside of
+        metadata.
+
         The ``.from_h5`` method should not require modification in most
         instances - instead, its two helper methods should be overwritten. When
         run, node.from_h5 calls
@@ -244,6 +251,7 @@ class Node:
         self._treepath = None     # enables accessing parent groups
         self._root = None
         self._metadata = {}
+        self._origin = None       # enables skipping unchanged nodes on write
 
     @property
     def root(self):
@@ -264,8 +272,9 @@ class Node:
         space = ' '*len(self.__class__.__name__)+'  '
         string = f"{self.__class__.__name__}( A Node called '{self.name}', containing the following top-level objects in its tree:"
         string += "\n"
-        for k,v in self._branch.items():
-            string += "\n"+space+f"    {k.ljust(24,' ')} \t ({v.__class__.__name__})"
+        for k,v in self._branch._dict.items():
+            classname = v.classname if isinstance(v,_NodeStub) else v.__class__.__name__
+            string += "\n"+space+f"    {k.ljust(24,' ')} \t ({classname})"
         string += "\n)"
         return string
 
@@ -291,9 +300,13 @@ class Node:
         assert(isinstance(node,Node))
         assert(self.root is not None), "Can't add objects to an unrooted node. See the Node docstring for more info."
         assert(node.root is None), "Can't add a rooted node to a different tree.  Use `.tree(graft=node)` instead."
+        # drop any branch this node replaces from the path index
+        if node.name in self._branch.keys():
+            self._root._unindex_branch(self._branch._dict[node.name])
         node._root = self._root
         self._branch[node.name] = node
         node._treepath = self._treepath+'/'+node.name
+        self._root._index_branch(node)
 
     def force_add_to_tree(self,node):
         """
@@ -326,7 +339,17 @@ class Node:
         """
         if name == '':
             return self.root
-        elif name[0] != '/':
+        # look up the node in the root's path index...
+        if self.root is not None:
+            if name[0] != '/':
+                key = self._treepath+'/'+name.rstrip('/')
+            else:
+                key = name.rstrip('/')
+            node = self.root._index.get(key)
+            if node is not None:
+                return node
+        # ...falling back to walking the tree
+        if name[0] != '/':
             return self._branch[name]
         else:
             return self.root._branch[name]
@@ -368,6 +391,7 @@ class Node:
         if this_node != '':
             # remove connection from upstream to this node
             del(upstream_node._branch[this_node])
+            old_root._unindex_branch(self)
             # add to a new tree
             self._root = None
             node.add_to_tree(self)
@@ -378,6 +402,7 @@ class Node:
             keys = list(upstream_node._branch.keys())
             for k in keys:
                 n = upstream_node.tree(k)
+                old_root._unindex_branch(n)
                 n._root = None
                 node.add_to_tree(n)
                 # remove upstream connections
@@ -626,21 +651,19 @@ class Node:
         # Read any metadata
         try:
             grp_metadata = group['metadatabundle']
+        except KeyError:
+            grp_metadata = None
+        if grp_metadata is not None:
             for md in grp_metadata.values():
-                node.metadata = Metadata.from_h5(md)
-                # check for inherited classes
+                # check for inherited classes, and read each instance once
+                # with the class it was written from
+                mdcls = Metadata
                 if md.attrs['python_class'] != 'Metadata':
-                    # and attempt promotion
                     try:
-                        cls = _get_class(md)
-                        inst = cls( name=basename(md.name) )
-                        inst._params.update(node.metadata[basename(md.name)]._params)
-                        node.metadata = inst
-                    except KeyError:
+                        mdcls = _get_class(md)
+                    except Exception:
                         print(f"Warning: unable to promote class from Metadata to {md.attrs['python_class']}")
-                        pass
-        except KeyError:
-            pass
+                node.metadata = mdcls.from_h5(md)
 
         # Return
         return node
@@ -668,9 +691,9 @@ class Node:
         grp.attrs.create("emd_group_type",self.__class__._emd_group_type)
         grp.attrs.create("python_class",self.__class__.__name__)
 
-        # add metadata
+        # add metadata, unless it's being updated in place by the writer
         items = self._metadata.items()
-        if len(items)>0:
+        if len(items)>0 and _get_io_option('skip_metadata_of') is not self:
             # create container group for metadata dictionaries
             grp_metadata = grp.create_group('metadatabundle')
             grp_metadata.attrs.create("emd_group_type","metadatabundle")
@@ -682,6 +705,55 @@ class Node:
         # return
         return grp
 
+    def _update_h5(self,group):
+        """
+        Writes this node into ``group``, the h5py Group it was previously
+        written to, in place, if the stored layout allows it.  Returns True if
+        the group was updated, or False, leaving it unchanged, if it must be
+        rewritten with ``to_h5``.  Metadata and downstream nodes are handled by
+        the caller.
+
+        Classes which add data to ``to_h5`` should override this method
+        alongside it to update that data; when ``to_h5`` is overridden
+        without it, False is returned.
+
+        Parameters
+        ----------
+        group : h5py Group
+
+        Returns
+        -------
+        (bool) True if the group was updated
+        """
+        cls = self.__class__
+        if _defining_class(cls,'to_h5') is not _defining_class(cls,'_update_h5'):
+            return False
+        return group.attrs.get('python_class') == cls.__name__ and \
+            group.attrs.get('emd_group_type') == cls._emd_group_type
+
+    # change tracking
+    def _fingerprint(self):
+        """
+        Returns a checksum of everything this node's ``to_h5`` method writes,
+        excluding metadata, or None if it can't be computed.  Classes which
+        write more than their parent class should override
+        ``_fingerprint_items`` alongside ``to_h5``; when ``to_h5`` is
+        overridden without it, None is returned and the node is always
+        rewritten.
+        """
+        cls = self.__class__
+        if _defining_class(cls,'to_h5') is not _defining_class(cls,'_fingerprint_items'):
+            return None
+        return _checksum(
+            [cls.__name__,cls._emd_group_type] + self._fingerprint_items())
+
+    def _fingerprint_items(self):
+        """
+        Returns a list of the values written by ``to_h5``, excluding metadata
+        and the group tags
+        """
+        return []
+
 class Branch:
 
     def __init__(self):
@@ -712,11 +784,18 @@ class Branch:
         assert(k in self._dict.keys()), er
 
         if len(x) == 0:
-            return self._dict[k]
+            return self._get(k)
         else:
-            tree = self._dict[k]._branch
+            tree = self._get(k)._branch
             return tree._getitem_from_list(x)
 
+    # returns the node at key `k`, reading it first if it's a stub
+    def _get(self,k):
+        v = self._dict[k]
+        if isinstance(v,_NodeStub):
+            v = v._materialize()
+        return v
+
     def __delitem__(self,x):
         del(self._dict[x])
 
@@ -724,6 +803,9 @@ class Branch:
     def keys(self):
         return self._dict.keys()
     def items(self):
+        for k,v in list(self._dict.items()):
+            if isinstance(v,_NodeStub):
+                v._materialize()
         return self._dict.items()
 
     # print the full tree contents to screen
@@ -754,7 +836,7 @@ class Branch:
                 linelevels.remove(tablevel)
             try:
                 tree._print_tree_to_screen(
-                    tree[k]._branch,
+                    tree._dict[k]._branch,
                     tablevel=tablevel+1,
                     linelevels=linelevels)
             except AttributeError:
@@ -771,3 +853,44 @@ class Branch:
         string += "\n)"
         return string
 
+
+class _NodeStub:
+    """
+    A placeholder for a node in a lazily read tree.  Holds the h5py Group the
+    node is stored in, the parent node it belongs under, and the I/O options
+    it should be read with.  The node is read, replacing the stub in its
+    parent's Branch, the first time the Branch returns it.
+    """
+    def __init__(self,parent,group,options):
+        self.parent = parent
+        self.group = group
+        self.options = options
+
+    @property
+    def classname(self):
+        return self.group.attrs['python_class']
+
+    # stubs for the nodes downstream of this one, for display
+    @property
+    def _branch(self):
+        from emdfile.utils import _get_node_groupnames
+        branch = Branch()
+        for k in _get_node_groupnames(self.group):
+            branch._dict[k] = _NodeStub(None,self.group[k],self.options)
+        return branch
+
+    def _materialize(self):
+        """
+        Reads the node, adds it to the tree in place of this stub, and adds
+        stubs for its children. Returns the node.
+        """
+        from emdfile.utils import _read_single_node, _populate_tree
+        assert(self.parent is not None), "Can't read a node stub without a parent"
+        with _set_io_options(**self.options):
+            node = _read_single_node(self.group)
+            self.parent.add_to_tree(node)
+            _populate_tree(node,self.group,lazy_tree=True)
+        key = basename(self.group.name)
+        if self.parent._branch._dict.get(key) is self:
+            del(self.parent._branch._dict[key])
+        return node
@@ -54,10 +54,21 @@ class PointList(Node):
 
             >>> pl.copy()                 # return a copy
             >>> pl.add(data)              # concatenates additional data
-            >>> pl + data                 # concatenates additional data
+            >>> pl += data                # concatenates additional data
+            >>> pl + data                 # returns a new, concatenated pointlist
             >>> pl.remove(mask)           # removes indicated data points
             >>> pl.sort('x','ascending')  # sort by the selected field
             >>> pl.add_fields(new_fields) # return a new pointlist with added fields
+            >>> pl.compact()              # releases unused appending space
+
+    .. topic:: Appending Data
+
+        ``.add``, ``+=`` and ``.add_data_by_field`` append into a buffer
+        whose capacity doubles whenever it fills, so building a PointList
+        one point at a time takes time linear in its final length.
+        ``.data`` is a view of the filled part of the buffer. The spare
+        capacity, up to the length of the data, is released by
+        ``.compact()`` or by assigning new data to ``.data``.
     """
     _emd_group_type = 'pointlist'
     def __init__(
@@ -91,6 +102,14 @@ class PointList(Node):
             self._types = (self._dtype,)
 
     # properties
+    @property
+    def data(self):
+        return self._data
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._buffer = None
+
     @property
     def dtype(self):
         return self._dtype
@@ -125,16 +144,53 @@ class PointList(Node):
         assert self.dtype == data.dtype, "Error: dtypes must agree"
         if isinstance(data,PointList):
             data = data.data
-        ans = np.append(self.data, data)
+        ans = np.concatenate([
+            np.atleast_1d(self.data),
+            np.atleast_1d(data)
+        ])
         return PointList(
             name = self.name,
             data = ans
         )
+    def __iadd__(self, data):
+        """
+        Append a numpy structured array in place.  The dtypes must agree.
+        """
+        self.add(data)
+        return self
     def add(self, data):
         """
         Appends a numpy structured array. Its dtypes must agree with the existing data.
         """
-        self.data = (self + data).data
+        assert self.dtype == data.dtype, "Error: dtypes must agree"
+        if isinstance(data,PointList):
+            data = data.data
+        data = np.atleast_1d(data)
+        n = len(self)
+        m = len(data)
+        self._reserve(n+m)
+        self._buffer[n:n+m] = data
+        self._data = self._buffer[:n+m]
+    def _reserve(self, length):
+        """
+        Ensures the append buffer can hold ``length`` points, reallocating it
+        with double the required capacity if not. A new buffer is always made
+        if the data isn't already in one, so appending never writes past the
+        end of an array the PointList doesn't own.
+        """
+        if self._buffer is None or length > len(self._buffer):
+            n = len(self)
+            buf = np.empty(max(2*length,16),dtype=self._data.dtype)
+            buf[:n] = np.atleast_1d(self._data)
+            self._buffer = buf
+            self._data = buf[:n]
+    def compact(self):
+        """
+        Releases any unused capacity in the append buffer, copying the data
+        into an array of exactly its length.
+        """
+        if self._buffer is not None:
+            self.data = np.copy(self._data)
     def remove(self, mask):
         """ Removes points wherever mask==True
         """
@@ -202,7 +258,7 @@ class PointList(Node):
         _fields = self.fields if fields is None else fields
         for d,f in zip(data, _fields):
             newdata[f] = d
-        self.data = np.append(self.data,newdata)
+        self.add(newdata)
 
     # Representation to standard output
     def __repr__(self):
@@ -248,6 +304,9 @@ class PointList(Node):
         # Return
         return grp
 
+    def _fingerprint_items(self):
+        return [self.data]
+
     # read
     @classmethod
     def _get_constructor_args(cls,group):
@@ -2,9 +2,12 @@ import h5py
 import numpy as np
 from typing import Optional
 from os.path import basename
-from emdfile.tqdmnd import tqdmnd
+from collections import OrderedDict
+from weakref import WeakValueDictionary
 from emdfile.classes.node import Node
 from emdfile.classes.pointlist import PointList
+from emdfile.classes.utils import _get_io_option
+from emdfile.classes.array import _normalize_region
 
 class PointListArray(Node):
     """
@@ -38,6 +41,19 @@ class PointListArray(Node):
             >>>     for y in range(5):
             >>>         pla[x,y] = PointList(np.zeros(x+y,dt))
 
+        Data for many cells is much faster to add all at once. For a
+        structured array ``data`` of points and arrays ``rx``, ``ry`` of the
+        cell each point belongs in,
+
+            >>> pla = PointListArray.from_flat(data, rx, ry, shape=(5,5))
+
+        creates a populated PointListArray, ``pla.set_flat(data, rx, ry)``
+        replaces the data of an existing one, and
+
+            >>> data, rx, ry = pla.to_flat()
+
+        does the reverse.
+
     .. topic:: Attributes & Methods
 
         PointListArrays include attributes
@@ -45,18 +61,76 @@ class PointListArray(Node):
             >>> pla.shape
             >>> pla.dtype
             >>> pla.fields
+            >>> pla.counts      # 2D array of the number of points in each cell
 
         and methods
 
             >>> pla.copy        # returns a copy
             >>> pla.add_fields  # returns a copy with additional fields
+
+        Operations on the points of all the cells at once run as a few numpy
+        calls on the PointListArray's single array of points, e.g.
+
+            >>> pla.histogram('intensity',bins=100)     # histogram of a field
+            >>> pla.filter(lambda d: d['intensity']>10) # keep some points
+            >>> pla.apply('qx',np.multiply,0.5)         # transform a field
+
+    .. topic:: Storage
+
+        The points of all the PointLists are held in a single structured
+        array, ordered by cell, together with an array of offsets such that
+        the points of cell (i,j) are at
+        ``offsets[i*shape[1]+j]:offsets[i*shape[1]+j+1]``.  Indexing
+        ``pla[i,j]`` returns a PointList whose data is a view into this array,
+        so it costs no copy, and editing the view's data in place edits the
+        PointListArray. PointLists are only created for cells which are
+        accessed, and are kept, so the same PointList is returned by repeated
+        access. Cells whose PointList is assigned new data - e.g. by ``.add``,
+        ``.remove``, ``.sort``, or ``pla[i,j] = pointlist`` - are merged back
+        into the single array when it's next needed, for instance when the
+        PointListArray is saved or copied.
+
+        Two layouts are available on disk, set with the ``layout`` argument
+        or attribute. In the default 'vlen' layout, the data is stored as a
+        2D HDF5 dataset of variable length elements, one per PointList. In
+        the 'flat' layout, the data is stored as a single 1D structured
+        dataset holding all the points, ordered by cell. In both layouts the
+        number of points in each cell is also stored, in a 2D integer dataset
+        called 'counts', which ``emdfile.read_pla_counts`` reads without
+        touching the data. Both are written and read with a few bulk calls,
+        but the flat layout is faster still, and readable by any HDF5
+        software as ordinary datasets. Files written with the flat layout
+        can't be read by versions of emdfile which predate it.
+
+    .. topic:: Lazy Loading
+
+        PointListArrays read with ``emdfile.read(..., lazy=True)`` load no
+        data up front. Each cell is read from disk the first time it's
+        accessed, and recently used cells are kept in memory in a least
+        recently used cache, up to ``pla.cache_size`` bytes.  A rectangular
+        block of cells can be loaded ahead of time with a single HDF5 read,
+        e.g.
+
+            >>> pla.prefetch(slice(0,16),slice(0,16))
+
+        The data of cells read lazily is read-only. Cells can be changed with
+        the PointList methods which replace data - ``.add``, ``.remove``,
+        ``.sort`` etc. - or by assignment, ``pla[i,j] = pointlist``, and
+        changed cells are held in memory until the PointListArray is loaded.
+        To edit data in place, first load everything into memory with
+        ``pla.load()``, which is done automatically by operations on the whole
+        PointListArray, like ``.copy`` or saving.  The HDF5 file is kept open
+        until the PointListArray is loaded or released.
     """
     _emd_group_type = "pointlistarray"
+    # byte budget of the cell cache of lazily read PointListArrays
+    cache_size = 2**28
     def __init__(
         self,
         dtype,
         shape,
         name: Optional[str] = 'pointlistarray',
+        layout: Optional[str] = 'vlen',
         ):
         """
 		Creates an empty PointListArray.
@@ -68,6 +142,9 @@ class PointListArray(Node):
         shape : 2-tuple of ints
             the shape of the array of PointLists
         name : str
+        layout : 'vlen' or 'flat'
+            the layout used to store the data in HDF5; see the Storage
+            section of the class docstring
 
         Returns
         -------
@@ -75,7 +152,9 @@ class PointListArray(Node):
         """
         super().__init__()
         assert len(shape) == 2, "Shape must have length 2."
+        assert layout in _pla_layouts, f"layout must be in {_pla_layouts}, not {layout}"
         self.name = name
+        self.layout = layout
         self.shape = shape
         self.dtype = np.dtype(dtype)
         self.fields = self.dtype.names
@@ -85,9 +164,19 @@ class PointListArray(Node):
             self.fields = ('',)
             self.types = (dtype,)
 
-        # Populate with empty PointLists
-        self._pointlists = [[PointList(data=np.zeros(0,dtype=self.dtype), name=f"{i},{j}")
-                             for j in range(self.shape[1])] for i in range(self.shape[0])]
+        # Empty storage: all points in one array, and cell offsets into it
+        self._data = np.zeros(0,dtype=self.dtype)
+        self._offsets = np.zeros(self.shape[0]*self.shape[1]+1,dtype=np.int64)
+        # PointLists handed out so far, and the views they were given
+        self._cells = {}
+        self._views = {}
+        # lazy loading: the source dataset and cell offsets into it, and the
+        # cell cache
+        self._source = None
+        self._source_offsets = None
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._evicted = WeakValueDictionary()
 
     ## get/set pointlists
     def __getitem__(self, tup):
@@ -98,29 +187,395 @@ class PointListArray(Node):
         l = len(tup) if isinstance(tup,tuple) else 1
         assert(l==2), f"Expected 2 slice values, recieved {l}"
         assert(pointlist.fields == self.fields), "fields must match"
-        self._pointlists[tup[0]][tup[1]] = pointlist
+        k = self._flat_index(tup[0],tup[1])
+        self._cells[k] = pointlist
+        self._views.pop(k,None)
+        if k in self._cache:
+            self._cache_bytes -= self._cache.pop(k)[2]
+        self._evicted.pop(k,None)
     def get_pointlist(self, i, j, name=None):
         """
         Returns the pointlist at i,j
         """
-        pl = self._pointlists[i][j]
+        k = self._flat_index(i,j)
+        if k in self._cells:
+            pl = self._cells[k]
+        elif self._source is not None:
+            pl = self._get_lazy_pointlist(k)
+        else:
+            view = self._data[self._offsets[k]:self._offsets[k+1]]
+            pl = PointList(data=view, name=f"{i},{j}")
+            self._cells[k] = pl
+            self._views[k] = view
         if name is not None:
             pl = pl.copy(name=name)
         return pl
 
+    def _flat_index(self, i, j):
+        """
+        Returns the index of cell i,j in the flattened array of cells
+        """
+        i,j = int(i),int(j)
+        Rx,Ry = self.shape
+        assert(-Rx <= i < Rx and -Ry <= j < Ry), f"index ({i},{j}) out of bounds for PointListArray of shape {self.shape}"
+        return (i%Rx)*Ry + (j%Ry)
+
+    def _consolidate(self):
+        """
+        Merges the data of every PointList which has been assigned new data
+        into the single point array, and points each PointList handed out
+        at its view into the new array.
+        """
+        self.load()
+        changed = sorted([k for k,pl in self._cells.items()
+            if pl.data is not self._views.get(k)])
+        if len(changed) == 0:
+            return
+        # splice the new cell data between runs of unchanged cells
+        counts = np.diff(self._offsets)
+        pieces = []
+        start = 0
+        for k in changed:
+            pieces.append(self._data[self._offsets[start]:self._offsets[k]])
+            data = np.atleast_1d(np.asarray(self._cells[k].data,dtype=self.dtype))
+            pieces.append(data)
+            counts[k] = len(data)
+            start = k+1
+        pieces.append(self._data[self._offsets[start]:])
+        self._data = np.concatenate(pieces)
+        self._offsets = np.zeros(len(counts)+1,dtype=np.int64)
+        np.cumsum(counts,out=self._offsets[1:])
+        # repoint PointLists at their new views.  a PointList assigned to
+        # more than one cell keeps the first, and the others get new
+        # PointLists
+        self._views = {}
+        seen = set()
+        for k in list(self._cells.keys()):
+            view = self._data[self._offsets[k]:self._offsets[k+1]]
+            pl = self._cells[k]
+            if id(pl) in seen:
+                i,j = divmod(k,self.shape[1])
+                pl = PointList(data=view, name=f"{i},{j}")
+                self._cells[k] = pl
+            seen.add(id(pl))
+            pl.data = view
+            self._views[k] = view
+
+    ## Flat data
+    @classmethod
+    def from_flat(
+        cls,
+        data,
+        rx,
+        ry,
+        shape,
+        name: Optional[str] = 'pointlistarray',
+        layout: Optional[str] = 'vlen',
+        ):
+        """
+        Creates a PointListArray from a single array of points and the cell
+        each point belongs in.
+
+        Parameters
+        ----------
+        data : structured numpy ndarray
+            the points, in any order
+        rx, ry : arrays of ints or str
+            the cell indices of each point, or the names of fields in ``data``
+            holding them
+        shape : 2-tuple of ints
+        name : str
+        layout : 'vlen' or 'flat'
+
+        Returns
+        -------
+        (PointListArray)
+        """
+        pla = cls(
+            dtype = data.dtype,
+            shape = shape,
+            name = name,
+            layout = layout
+        )
+        pla.set_flat(data,rx,ry)
+        return pla
+
+    def set_flat(self, data, rx, ry):
+        """
+        Replaces the data in all cells with the points in ``data``, placing
+        each point in the cell given by ``rx``, ``ry``. Points keep their
+        relative order within each cell. See ``from_flat``.
+        """
+        if isinstance(rx,str):
+            rx = data[rx]
+        if isinstance(ry,str):
+            ry = data[ry]
+        rx = np.asarray(rx,dtype=np.int64).ravel()
+        ry = np.asarray(ry,dtype=np.int64).ravel()
+        data = np.asarray(data,dtype=self.dtype).ravel()
+        assert(len(rx) == len(ry) == len(data)), "data, rx and ry must have the same length"
+        Rx,Ry = self.shape
+        assert(np.all((rx >= 0) & (rx < Rx) & (ry >= 0) & (ry < Ry))), f"cell indices out of bounds for PointListArray of shape {self.shape}"
+        # group the points by cell
+        k = rx*Ry + ry
+        order = np.argsort(k,kind='stable')
+        counts = np.bincount(k,minlength=Rx*Ry)
+        self.load()
+        self._set_data(data[order],counts)
+
+    def to_flat(self):
+        """
+        Returns all the points of all the cells as a single array, ordered by
+        cell, and the cell indices of each point.
+
+        Returns
+        -------
+        (data, rx, ry) : a copy of the structured array of all points, and
+        arrays of their cell indices
+        """
+        self._consolidate()
+        k = np.repeat(
+            np.arange(self.shape[0]*self.shape[1]),
+            np.diff(self._offsets)
+        )
+        rx,ry = np.divmod(k,self.shape[1])
+        return np.copy(self._data),rx,ry
+
+    ## Operations on all cells
+    @property
+    def counts(self):
+        """
+        A 2D array of the number of points in each cell
+        """
+        self._consolidate()
+        return np.diff(self._offsets).reshape(self.shape)
+
+    def histogram(self, field, bins=10, range=None, weights=None):
+        """
+        Computes a histogram of the values of ``field`` over the points of all
+        cells.
+
+        Parameters
+        ----------
+        field : str
+            the field to histogram
+        bins, range : see ``np.histogram``
+        weights : str or None
+            if passed, the field used to weight each point
+
+        Returns
+        -------
+        (hist, bin_edges) : see ``np.histogram``
+        """
+        self._consolidate()
+        if weights is not None:
+            weights = self._field(weights)
+        return np.histogram(
+            self._field(field),
+            bins = bins,
+            range = range,
+            weights = weights
+        )
+
+    def filter(self, mask):
+        """
+        Keeps only the points where ``mask`` is True, in all cells at once.
+
+        Parameters
+        ----------
+        mask : boolean array or callable
+            either an array with one element per point, ordered by cell, or a
+            function which accepts the structured array of all the points of
+            all the cells, ordered by cell, and returns such a mask, e.g.
+            ``lambda d: d['intensity']>10``
+        """
+        self._consolidate()
+        if callable(mask):
+            mask = mask(self._data)
+        mask = np.asarray(mask,dtype=bool)
+        assert(mask.shape == self._data.shape), f"mask must have one element per point, {self._data.shape}, not {mask.shape}"
+        # the number of points kept before each cell's offset
+        kept = np.zeros(len(mask)+1,dtype=np.int64)
+        np.cumsum(mask,out=kept[1:])
+        self._set_data(self._data[mask],np.diff(kept[self._offsets]))
+
+    def apply(self, field, func, *args, **kwargs):
+        """
+        Applies a vectorized function, like a numpy ufunc, to ``field`` in all
+        cells at once, replacing the field's values with
+        ``func(values, *args, **kwargs)``. For instance
+        ``pla.apply('qx',np.subtract,qx0)`` subtracts ``qx0`` from every 'qx'
+        value.
+        """
+        self._consolidate()
+        if self.dtype.names is None:
+            self._data[...] = func(self._data,*args,**kwargs)
+        else:
+            self._data[field] = func(self._data[field],*args,**kwargs)
+
+    def _field(self, field):
+        """
+        Returns the values of ``field`` of all points
+        """
+        if self.dtype.names is None:
+            assert(field in self.fields), f"{field} is not a field"
+            return self._data
+        return self._data[field]
+
+    def _set_data(self, data, counts):
+        """
+        Replaces the data with the structured array ``data`` of all points,
+        ordered by cell, and the number of points in each cell ``counts``, and
+        points each PointList handed out at its view into the new data.
+        """
+        self._data = data
+        self._offsets = np.zeros(self.shape[0]*self.shape[1]+1,dtype=np.int64)
+        np.cumsum(np.ravel(counts),out=self._offsets[1:])
+        for k,pl in self._cells.items():
+            view = self._data[self._offsets[k]:self._offsets[k+1]]
+            pl.data = view
+            self._views[k] = view
+
+    ## Lazy loading
+    @property
+    def is_lazy(self):
+        """
+        True if the PointListArray's data is still on disk
+        """
+        return self._source is not None
+
+    def load(self):
+        """
+        Reads all the data of a lazily read PointListArray into memory, keeping
+        any changed cells, and releases the HDF5 file.  Does nothing if the
+        data is already in memory.
+        """
+        if self._source is None:
+            return
+        data,counts = _read_data(
+            self._source,
+            self.layout,
+            None if self._source_offsets is None else np.diff(self._source_offsets),
+            self.dtype,
+        )
+        # every PointList handed out and still alive is kept, and merged on
+        # the next consolidation
+        cells = dict(self._evicted.items())
+        cells.update({k:v[0] for k,v in self._cache.items()})
+        cells.update(self._cells)
+        self._data = data
+        self._offsets[1:] = np.cumsum(counts)
+        self._cells = cells
+        self._views = {}
+        self._source = None
+        self._source_offsets = None
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._evicted = WeakValueDictionary()
+
+    def prefetch(self, x, y):
+        """
+        Reads a rectangular block of cells of a lazily read PointListArray
+        into the cache with a single HDF5 read.
+
+        Parameters
+        ----------
+        x, y : int or slice
+            the block of cells to read, e.g. ``slice(0,16), slice(0,16)``
+        """
+        if self._source is None:
+            return
+        xs = _cell_range(x,self.shape[0])
+        ys = _cell_range(y,self.shape[1])
+        for k,data in self._read_block(xs,ys):
+            if k in self._cells or k in self._cache:
+                continue
+            i,j = divmod(k,self.shape[1])
+            self._cache_insert(k, PointList(data=data, name=f"{i},{j}"))
+
+    def _get_lazy_pointlist(self, k):
+        """
+        Returns the PointList of cell k of a lazily read PointListArray, from
+        the cache if it's there and from disk if not
+        """
+        if k in self._cache:
+            self._cache.move_to_end(k)
+            return self._cache[k][0]
+        # a PointList evicted from the cache but still referenced elsewhere
+        # is reused, so that any changes made to it aren't lost
+        pl = self._evicted.pop(k,None)
+        if pl is None:
+            i,j = divmod(k,self.shape[1])
+            _,data = next(self._read_block(range(i,i+1),range(j,j+1)))
+            pl = PointList(data=data, name=f"{i},{j}")
+        elif pl.data.flags.writeable:
+            self._cells[k] = pl
+            return pl
+        self._cache_insert(k,pl)
+        return pl
+
+    def _cache_insert(self, k, pl):
+        """
+        Adds the PointList of cell k to the cache, and evicts the least
+        recently used cells until the cache is within its budget.  Evicted
+        cells which have been changed are kept.
+        """
+        # count a nominal size for the PointList object itself
+        nbytes = pl.data.nbytes + 2048
+        self._cache[k] = (pl,pl.data,nbytes)
+        self._cache_bytes += nbytes
+        while self._cache_bytes > self.cache_size and len(self._cache) > 1:
+            _k,(_pl,data,_nbytes) = self._cache.popitem(last=False)
+            self._cache_bytes -= _nbytes
+            if _pl.data is not data:
+                self._cells[_k] = _pl
+            else:
+                self._evicted[_k] = _pl
+
+    def _read_block(self, xs, ys):
+        """
+        Reads the cells in the ranges ``xs``, ``ys`` from the source dataset
+        in a single HDF5 call, and yields (flat index, read-only data) pairs
+        """
+        Ry = self.shape[1]
+        i0,i1,j0,j1 = xs.start,xs.stop,ys.start,ys.stop
+        if len(xs) == 0 or len(ys) == 0:
+            return
+        if self._source_offsets is None:
+            block = self._source[i0:i1,j0:j1]
+            for a,i in enumerate(xs):
+                for b,j in enumerate(ys):
+                    data = np.asarray(block[a,b],dtype=self.dtype)
+                    data.flags.writeable = False
+                    yield i*Ry+j,data
+        else:
+            off = self._source_offsets
+            start,stop = off[i0*Ry+j0],off[(i1-1)*Ry+j1]
+            chunk = self._source[start:stop]
+            single = len(xs) == 1 and len(ys) == 1
+            for i in xs:
+                for j in ys:
+                    k = i*Ry+j
+                    data = chunk[off[k]-start:off[k+1]-start]
+                    if not single:
+                        # don't hold the whole block in memory
+                        data = np.copy(data)
+                    data.flags.writeable = False
+                    yield k,data
+
     ## Make copies
     def copy(self, name=''):
         """
         Returns a copy of itself.
         """
+        self._consolidate()
         new_pla = PointListArray(
             dtype=self.dtype,
             shape=self.shape,
-            name=name)
-        for i in range(new_pla.shape[0]):
-            for j in range(new_pla.shape[1]):
-                pl = new_pla.get_pointlist(i,j)
-                pl.add(np.copy(self.get_pointlist(i,j).data))
+            name=name,
+            layout=self.layout)
+        new_pla._data = np.copy(self._data)
+        new_pla._offsets = np.copy(self._offsets)
         for k,v in self.metadata.items():
             new_pla.metadata = v.copy(name=k)
         return new_pla
@@ -135,6 +590,7 @@ class PointListArray(Node):
         new_fields : list of 2-tuples, ('name', dtype)
         name : string
         """
+        self._consolidate()
         dtype = []
         for f,t in zip(self.fields,self.types):
             dtype.append((f,t))
@@ -143,17 +599,14 @@ class PointListArray(Node):
         new_pla = PointListArray(
             dtype=dtype,
             shape=self.shape,
-            name=name)
-        for i in range(new_pla.shape[0]):
-            for j in range(new_pla.shape[1]):
-                # Copy old data into a new structured array
-                pl_old = self.get_pointlist(i,j)
-                data = np.zeros(pl_old.length, np.dtype(dtype))
-                for f in self.fields:
-                    data[f] = np.copy(pl_old.data[f])
-                # Write into new pointlist
-                pl_new = new_pla.get_pointlist(i,j)
-                pl_new.add(data)
+            name=name,
+            layout=self.layout)
+        # Copy old data into a new structured array
+        data = np.zeros(len(self._data), np.dtype(dtype))
+        for f in self.fields:
+            data[f] = self._data[f]
+        new_pla._data = data
+        new_pla._offsets = np.copy(self._offsets)
         return new_pla
 
     ## Representation to standard output
@@ -174,7 +627,7 @@ class PointListArray(Node):
         """
         Calls Node.to_h5 to greate the group's node and write its metadata.
         Then writes PointListArray data including the data itself, array shape
-        and the dtype.
+        and the dtype, in the layout set by ``self.layout``.
 
         Parameters
         ----------
@@ -186,19 +639,42 @@ class PointListArray(Node):
         """
         # Construct group and add metadata
         grp = Node.to_h5(self,group)
-        # Add metadata
-        dtype = h5py.special_dtype(vlen=self.dtype)
-        dset = grp.create_dataset(
-            "data",
-            self.shape,
-            dtype
-        )
         # Add data
-        for (i,j) in tqdmnd(dset.shape[0],dset.shape[1]):
-            dset[i,j] = self[i,j].data
+        self._consolidate()
+        if self.layout == 'flat':
+            dset = grp.create_dataset(
+                "data",
+                data = self._data
+            )
+            dset.attrs['layout'] = 'flat'
+        else:
+            dtype = h5py.special_dtype(vlen=self.dtype)
+            dset = grp.create_dataset(
+                "data",
+                self.shape,
+                dtype
+            )
+            cells = np.empty(self.shape[0]*self.shape[1],dtype=object)
+            for k in range(len(cells)):
+                cells[k] = self._data[self._offsets[k]:self._offsets[k+1]]
+            dset[...] = cells.reshape(self.shape)
+        # Add the number of points in each cell
+        grp.create_dataset(
+            "counts",
+            data = np.diff(self._offsets).reshape(self.shape)
+        )
         # Return
         return grp
 
+    def _fingerprint_items(self):
+        # a lazily read PointListArray with no changed cells is represented by
+        # its location on disk
+        if self.is_lazy and len(self._cells) == 0 and len(self._evicted) == 0 and \
+                all([pl.data is data for pl,data,_ in self._cache.values()]):
+            return [('lazy',self._source.file.filename,self._source.name),self.layout]
+        self._consolidate()
+        return [self._data,self._offsets,self.shape,self.layout]
+
     # read
     @classmethod
     def _get_constructor_args(cls,group):
@@ -209,30 +685,128 @@ class PointListArray(Node):
         """
         # Get the DataSet
         dset = group['data']
-        dtype = h5py.check_vlen_dtype( dset.dtype )
-        shape = dset.shape
+        if _get_layout(dset) == 'flat':
+            dtype = dset.dtype
+            shape = group['counts'].shape
+        else:
+            dtype = h5py.check_vlen_dtype( dset.dtype )
+            shape = dset.shape
+        # reading a subregion
+        region = _get_io_option('region')
+        if region is not None:
+            region = _normalize_region(region,shape)
+            shape = tuple([len(range(*r.indices(s))) for r,s in zip(region,shape)])
         # make args dictionary and return
         return {
             'dtype' : dtype,
             'shape' : shape,
             'name' : basename(group.name)
         }
-        # Add metadata
-        _read_metadata(pla, group)
-        return pla
 
     def _populate_instance(self,group):
         """
         Accepts an already extant class self, and populates it with the data from h5py Group `group`
         """
-        # Find the data and shape
+        # Find the data and layout
         dset = group['data']
-        shape = self.shape
+        self.layout = _get_layout(dset)
+        counts = group['counts'][()].ravel() if self.layout == 'flat' else None
+        # Region: read a block of cells
+        region = _get_io_option('region')
+        if region is not None:
+            shape = group['counts'].shape if self.layout == 'flat' else dset.shape
+            region = _normalize_region(region,shape)
+            self._data,counts = _read_region(dset,self.layout,counts,shape,region,self.dtype)
+            self._offsets[1:] = np.cumsum(counts)
+            return self
+        # Lazy mode: keep the source, and read cells on demand
+        if _get_io_option('lazy',False):
+            self._source = dset
+            if counts is not None:
+                self._source_offsets = np.zeros(len(counts)+1,dtype=np.int64)
+                np.cumsum(counts,out=self._source_offsets[1:])
+            return self
         # Add data
-        for (i,j) in tqdmnd(shape[0],shape[1],desc="Reading PointListArray",unit="PointList"):
-            try:
-                self[i,j].add(dset[i,j])
-            except ValueError:
-                pass
+        self._data,counts = _read_data(dset,self.layout,counts,self.dtype)
+        self._offsets[1:] = np.cumsum(counts)
         return self
 
+
+# PointListArray HDF5 layouts
+_pla_layouts = ('vlen','flat')
+
+def _get_layout(dset):
+    """
+    Returns the layout of the PointListArray whose 'data' h5py Dataset is
+    ``dset``. Files predating the flat layout are all 'vlen'.
+    """
+    return dset.attrs.get('layout','vlen')
+
+def _read_data(dset, layout, counts, dtype):
+    """
+    Reads all the data of a PointListArray from its 'data' h5py Dataset
+    ``dset``, and returns the concatenated points and the number of points in
+    each cell. ``counts`` must be passed for the flat layout.
+    """
+    if layout == 'flat':
+        return dset[()],counts
+    return _concatenate_cells(dset[()],dtype)
+
+def _read_region(dset, layout, counts, shape, region, dtype):
+    """
+    Reads the block of cells ``region``, a tuple of two slices with positive
+    steps, of a PointListArray of shape ``shape`` from its 'data' h5py
+    Dataset ``dset``, and returns the concatenated points and the number of
+    points in each cell of the block. ``counts`` must be passed for the flat
+    layout.
+    """
+    # vlen: a single hyperslab read
+    if layout != 'flat':
+        return _concatenate_cells(dset[region],dtype)
+    # flat: read the span of points covering each row of the block, or the
+    # whole block at once if it spans complete rows
+    offsets = np.zeros(len(counts)+1,dtype=np.int64)
+    np.cumsum(counts,out=offsets[1:])
+    xs = range(*region[0].indices(shape[0]))
+    ys = range(*region[1].indices(shape[1]))
+    block_counts = counts.reshape(shape)[region]
+    if len(xs) == 0 or len(ys) == 0:
+        return np.zeros(0,dtype=dtype),block_counts.ravel()
+    if len(ys) == shape[1] and xs.step == 1:
+        rows = [(xs,dset[offsets[xs[0]*shape[1]]:offsets[(xs[-1]+1)*shape[1]]])]
+    else:
+        rows = [(range(i,i+1),
+            dset[offsets[i*shape[1]+ys[0]]:offsets[i*shape[1]+ys[-1]+1]])
+            for i in xs]
+    cells = []
+    for _xs,span in rows:
+        start = offsets[_xs[0]*shape[1]+ys[0]]
+        for i in _xs:
+            for j in ys:
+                k = i*shape[1]+j
+                cells.append(span[offsets[k]-start:offsets[k+1]-start])
+    return _concatenate_cells(cells,dtype)[0],block_counts.ravel()
+
+def _concatenate_cells(cells, dtype):
+    """
+    Returns the concatenation of an array or list of cell arrays, and the
+    number of points in each cell
+    """
+    if not isinstance(cells,list):
+        cells = cells.ravel()
+    counts = np.array([len(c) for c in cells],dtype=np.int64)
+    if counts.sum() > 0:
+        return np.concatenate(cells).astype(dtype,copy=False),counts
+    return np.zeros(0,dtype=dtype),counts
+
+def _cell_range(x, length):
+    """
+    Returns a range of cell indices from an int or step 1 slice
+    """
+    if isinstance(x,slice):
+        r = range(*x.indices(length))
+        assert(r.step == 1), "slices of cells must have step 1"
+        return r
+    x = int(x)
+    assert(-length <= x < length), f"index {x} out of bounds for axis of length {length}"
+    return range(x%length,x%length+1)
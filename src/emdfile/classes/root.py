@@ -12,9 +12,46 @@ class Root(Node):
     tree, and any write operation emanating from this tree will include its root
     metadata.  Cut and merge node.tree include several handling options for root
     metadata - see those docstrings for details.
+
+    A Root keeps an index mapping the treepath of every node in its tree to the
+    node, so that ``node.tree('path/to/node')`` lookups don't walk the tree.
+    The index is kept in sync by the tree building, cutting and grafting
+    methods.
     """
     _emd_group_type = 'root'
     def __init__(self,name='root'):
         Node.__init__(self,name=name)
         self._treepath = ''
         self._root = self
+        self._index = {}
+
+    def _index_branch(self,node):
+        """
+        Adds ``node`` and all nodes downstream of it to the path index, setting
+        their roots and treepaths.  ``node`` must already be in this tree.
+        """
+        self._index[node._treepath] = node
+        stack = [node]
+        while len(stack) > 0:
+            n = stack.pop()
+            for k,child in n._branch._dict.items():
+                # unread nodes in lazily read trees are indexed once read
+                if not isinstance(child,Node):
+                    continue
+                child._root = self
+                child._treepath = n._treepath+'/'+k
+                self._index[child._treepath] = child
+                stack.append(child)
+
+    def _unindex_branch(self,node):
+        """
+        Removes ``node`` and all nodes downstream of it from the path index
+        """
+        stack = [node]
+        while len(stack) > 0:
+            n = stack.pop()
+            if not isinstance(n,Node):
+                continue
+            if self._index.get(n._treepath) is n:
+                del(self._index[n._treepath])
+            stack.extend(n._branch._dict.values())
@@ -1,6 +1,10 @@
 import sys
+import mmap
+import hashlib
 import types
 import inspect
+import numpy as np
+from contextlib import contextmanager
 
 # Define the EMD group types
 EMD_base_group_types = (
@@ -20,23 +24,170 @@ EMD_custom_group_types = tuple(
 )
 EMD_group_types = EMD_base_group_types + EMD_data_group_types + EMD_custom_group_types
 
-def _get_class(grp):
+# I/O options which apply for the duration of a single read or write call.
+# These are set by the module level read/write functions, and let the class
+# I/O methods change behavior without changing their call signatures, which
+# are overwritten by downstream classes
+_io_options = {}
+
+@contextmanager
+def _set_io_options(**kwargs):
+    """
+    Context manager which sets the I/O options in ``kwargs`` on entry and
+    restores their previous values on exit
+    """
+    previous = _io_options.copy()
+    _io_options.update(kwargs)
+    try:
+        yield
+    finally:
+        _io_options.clear()
+        _io_options.update(previous)
+
+def _get_io_option(key, default=None):
+    """
+    Returns the value of the I/O option ``key`` for the current read/write call
+    """
+    return _io_options.get(key, default)
+
+# Change tracking
+# Nodes read with ``read(..., track_changes=True)`` record a checksum of the
+# content their class writes to file, apart from their metadata, and where in
+# which file it was read from. Append-over writes compare checksums to skip
+# rewriting unchanged nodes.
+
+def _checksum(values):
     """
-    Returns a dictionary of Class constructors from corresponding strings
+    Returns a blake2b digest of the list ``values``, which may hold numpy
+    arrays, lists, tuples, dicts, and other objects with a deterministic repr.
+    Arrays which are memory mapped or proxies for HDF5 datasets are
+    represented by their location on disk, and aren't read.
+    """
+    h = hashlib.blake2b(digest_size=32)
+    _update_checksum(h,values)
+    return h.digest()
+
+def _update_checksum(h, values):
+    """
+    Feeds the list ``values`` into the hashlib hash object ``h``
+    """
+    from emdfile.lazy import DatasetProxy
+    for v in values:
+        if isinstance(v,DatasetProxy):
+            v = ('proxy',v.filename,v.dataset.name,v.shape,v.dtype.str)
+        elif isinstance(v,np.memmap) and isinstance(v.base,mmap.mmap):
+            v = ('memmap',v.filename,v.offset,v.shape,v.dtype.str)
+        if isinstance(v,np.ndarray):
+            h.update(repr((v.dtype.descr,v.shape)).encode())
+            if v.dtype.hasobject:
+                _update_checksum(h,v.ravel().tolist())
+            else:
+                h.update(np.ascontiguousarray(v).reshape(-1).view(np.uint8))
+        elif isinstance(v,(list,tuple)):
+            h.update(f"{type(v).__name__}{len(v)}".encode())
+            _update_checksum(h,v)
+        elif isinstance(v,dict):
+            h.update(f"dict{len(v)}".encode())
+            for k in sorted(v.keys(),key=repr):
+                _update_checksum(h,[k,v[k]])
+        else:
+            h.update(repr(v).encode())
+
+def _defining_class(cls, attr):
+    """
+    Returns the first class in the method resolution order of ``cls`` which
+    defines ``attr``
+    """
+    for c in cls.__mro__:
+        if attr in c.__dict__:
+            return c
+    return None
+
+# Class registry
+# Maps python class names to classes, so that the classes of EMD groups can be
+# found by name at read time.  Holds emdfile's own classes, classes registered
+# with `register_class`, and classes found in modules with the `_emd_hook`
+# attribute. Hooked modules are searched once; the search is repeated only
+# when new modules have been imported, or if a lookup fails.
+_class_registry = {}
+_registered_classes = {}
+_hooked_classes = {}
+_registry_state = {
+    'n_modules' : -1,
+    'hooked_modules' : (),
+}
+
+def register_class(cls, name=None):
+    """
+    Registers a class inheriting from an emdfile class so that the ``read``
+    function can find it, under ``name`` if passed or otherwise under the class
+    name. Registered classes take precedence over classes found with the
+    ``_emd_hook`` mechanism.  May be used as a class decorator.
+
+    Parameters
+    ----------
+    cls : class
+        a subclass of Node or Metadata
+    name : str or None
+
+    Returns
+    -------
+    cls
+    """
+    from emdfile import Node,Metadata
+    assert(inspect.isclass(cls) and issubclass(cls,(Node,Metadata))), f"only Node and Metadata subclasses can be registered, not {cls}"
+    name = cls.__name__ if name is None else name
+    _registered_classes[name] = cls
+    _build_class_registry()
+    return cls
+
+def _update_class_registry(force=False):
+    """
+    Searches for new hooked modules if any modules have been imported since
+    the last search, or if ``force`` is True, and rebuilds the registry
+    if needed
+    """
+    n_modules = len(sys.modules)
+    if not force and n_modules == _registry_state['n_modules'] and len(_class_registry) > 0:
+        return
+    _registry_state['n_modules'] = n_modules
+    hooked_modules = tuple(_get_dependent_packages())
+    if not force and hooked_modules == _registry_state['hooked_modules'] and len(_class_registry) > 0:
+        return
+    _registry_state['hooked_modules'] = hooked_modules
+    _hooked_classes.clear()
+    for module in hooked_modules:
+        _walk_module_find_classes(module, _hooked_classes)
+    _build_class_registry()
+
+def _build_class_registry():
+    """
+    Builds the class registry from emdfile's classes, hooked classes, and
+    registered classes, in increasing order of precedence
     """
     from emdfile import classes
-    # Build lookup table for classes
     lookup = {}
     for name, obj in inspect.getmembers(classes):
         if inspect.isclass(obj):
             lookup[name] = obj
-    # hook for dependent package classes
-    for module in _get_dependent_packages():
-        _walk_module_find_classes(module, lookup)
-    # Get the class from the group tags and return
+    lookup.update(_hooked_classes)
+    lookup.update(_registered_classes)
+    _class_registry.clear()
+    _class_registry.update(lookup)
+
+def _get_class(grp):
+    """
+    Returns the class of the EMD node or metadata in the h5py Group ``grp``,
+    found from its 'python_class' tag in the class registry
+    """
+    classname = grp.attrs['python_class']
+    _update_class_registry()
+    # on a miss, search the hooked modules again before failing,
+    # in case classes were added to them after they were searched
+    if classname not in _class_registry:
+        _update_class_registry(force=True)
     try:
-        classname = grp.attrs['python_class']
-        __class__ = lookup[classname]
+        __class__ = _class_registry[classname]
         return __class__
     except KeyError:
         raise Exception(f"Unknown classname {classname}")
@@ -46,7 +197,7 @@ def _get_dependent_packages():
     Searches packages with the top level attribute "_emd_hook" = True.
     Returns a generator of all such packages
     """
-    mods = sys.modules.values()
+    mods = list(sys.modules.values())
     for module in mods:
         if isinstance(module, types.ModuleType):
             if hasattr(module, "_emd_hook"):
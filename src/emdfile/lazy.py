@@ -0,0 +1,93 @@
+# Lazy access to data stored in HDF5 files
+
+import h5py
+import numpy as np
+
+class DatasetProxy:
+    """
+    A read-only, numpy-like stand-in for an array stored in an HDF5 dataset.
+
+    Arrays read with ``emdfile.read(..., lazy=True)`` whose data can't be
+    memory mapped hold a DatasetProxy as their ``.data``. Nothing is read on
+    instantiation; slicing
+
+        >>> proxy[0,0]
+        >>> proxy[10:20,:,::2]
+
+    reads only the requested hyperslab from disk and returns a numpy array, and
+    ``np.asarray(proxy)`` or ``proxy[:]`` loads the full array. The HDF5 file is
+    kept open as long as any proxy pointing into it is alive.
+    """
+    def __init__(self, dset):
+        """
+        Parameters
+        ----------
+        dset : h5py Dataset
+        """
+        assert(isinstance(dset,h5py.Dataset)), f"expected an h5py Dataset, not type {type(dset)}"
+        self._dset = dset
+        # holding a reference to the file keeps it open
+        self._file = dset.file
+
+    # array-like properties
+    @property
+    def shape(self):
+        return self._dset.shape
+    @property
+    def dtype(self):
+        return self._dset.dtype
+    @property
+    def ndim(self):
+        return self._dset.ndim
+    @property
+    def size(self):
+        return self._dset.size
+    @property
+    def nbytes(self):
+        return self._dset.size * self._dset.dtype.itemsize
+    def __len__(self):
+        return len(self._dset)
+
+    # source info
+    @property
+    def dataset(self):
+        return self._dset
+    @property
+    def filename(self):
+        return self._file.filename
+
+    # data access
+    def __getitem__(self, x):
+        return self._dset[x]
+    def __array__(self, dtype=None, copy=None):
+        ar = np.asarray(self._dset[...])
+        if dtype is not None:
+            ar = ar.astype(dtype, copy=False)
+        return ar
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}( shape {self.shape}, dtype {self.dtype}, at '{self._dset.name}' in '{self.filename}' )"
+
+
+def _lazy_dataset(dset):
+    """
+    Returns a lazy stand-in for the data in h5py Dataset ``dset``. Contiguous,
+    unfiltered datasets of numeric type in plain (sec2 driver) files are memory
+    mapped with ``np.memmap``; all others are wrapped in a DatasetProxy.
+    """
+    offset = dset.id.get_offset()
+    if (
+        dset.chunks is None and
+        offset is not None and
+        dset.size > 0 and
+        dset.dtype.kind in 'biufc' and
+        dset.file.driver == 'sec2'
+    ):
+        return np.memmap(
+            dset.file.filename,
+            mode = 'r',
+            dtype = dset.dtype,
+            shape = dset.shape,
+            offset = offset,
+        )
+    return DatasetProxy(dset)
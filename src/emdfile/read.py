@@ -2,9 +2,11 @@
 
 import h5py
 import pathlib
+import numpy as np
 from os.path import exists, join
 from typing import Union, Optional
 from emdfile import Root
+from emdfile.classes.utils import _set_io_options
 from emdfile.read_EMD_v0p1 import read_EMD_v0p1
 from emdfile.utils import (
     _is_EMD_file,
@@ -14,10 +16,21 @@ from emdfile.utils import (
     _read_single_node,
 )
 
+# EMD group types which support reading a subregion
+_region_group_types = (
+    'array',
+    'pointlistarray',
+)
+
 def read(
     filepath,
     emdpath: Optional[str] = None,
     tree: Optional[Union[bool,str]] = True,
+    lazy: bool = False,
+    lazy_tree: bool = False,
+    region: Optional[tuple] = None,
+    track_changes: bool = False,
+    mode: str = 'r',
     **legacy_options,
     ):
     """
@@ -36,8 +49,11 @@ def read(
 
     Parameters
     ----------
-    filepath : str or Path
-        the file path
+    filepath : str or Path or h5py File or h5py Group
+        the file path, or an open h5py File, in which case the file is read
+        from this handle and left open. If an h5py Group is passed,
+        ``emdpath`` is taken relative to the group, or if None, the group is
+        the target node
     emdpath : str or None
         to read a subset of the file, set this argument to the HDF5 goup path of
         a target node in the file. If None and the file contains a single root,
@@ -53,18 +69,78 @@ def read(
         excluding the target node.  Note that if ``emdpath`` points to a root
         node, setting ``tree`` to None or True are equivalent - both return the
         whole data tree.
+    lazy : bool
+        if True, array data is not read from disk until it's accessed. Arrays
+        are returned with their ``.data`` set to a ``np.memmap`` for contiguous,
+        uncompressed datasets, or otherwise to a DatasetProxy, a numpy-like
+        object which reads only the requested hyperslab when sliced. The file
+        is kept open for as long as any of these objects are alive.
+    lazy_tree : bool
+        if True, nodes downstream of the target node are not read until they're
+        accessed, e.g. with ``node.tree('a/b')`` or by iterating over a node's
+        branch - until then the tree holds placeholders which know where their
+        node is stored. The file is kept open until every node has been read, or
+        the tree is released. Has no effect if ``tree`` is False.
+    region : tuple or None
+        reads only a subregion of the node at ``emdpath``, which must be an
+        Array or a PointListArray. A tuple of slices and/or integers, e.g.
+        ``(slice(0,64),slice(0,64),...)``, following numpy conventions, except
+        that integers select a length 1 slice rather than removing the axis, and
+        slice steps must be positive. Only the selected hyperslab is read from
+        disk, and the dim vectors of the returned Array are sliced to match.
+        For PointListArrays, the region selects a block of cells, and a smaller
+        PointListArray holding only those cells is returned. Nodes downstream
+        of the target node, if read, are read in full.
+    track_changes : bool
+        if True, each node read records where it was read from and a checksum
+        of its data, so that saving the tree back to the same file in
+        append-over mode rewrites only the nodes which have changed. Adds the
+        cost of checksumming the data of nodes which aren't read lazily. A
+        lazily read tree holds its file open, read-only unless ``mode`` is
+        'r+', and can only be saved back to it from this process in 'r+' mode.
+    mode : str
+        'r' (default) opens the file read-only. 'r+' opens it for reading and
+        writing, so that a tree read with ``lazy`` or ``lazy_tree``, which
+        holds the file open, can be saved back to it from this process. The
+        file is then locked against other processes until it's released.
+        Ignored if ``filepath`` is an open h5py File or Group.
 
     Returns
     -------
     Root or Node or Metadata
     """
     # validate filepath
-    assert(isinstance(filepath, (str,pathlib.Path) )), f"filepath must be a string or Path, not {type(filepath)}"
-    assert(exists(filepath)), f"specified filepath '{filepath}' was not found on the filesystem"
+    # an open h5py File or Group may be passed in place of a path
+    if isinstance(filepath, h5py.Group):
+        f = filepath.file
+        owns_file = False
+        if filepath.name != '/':
+            if emdpath is None:
+                emdpath = filepath.name
+            else:
+                emdpath = filepath.name + '/' + emdpath
+    else:
+        assert(isinstance(filepath, (str,pathlib.Path) )), f"filepath must be a string, Path, or h5py File or Group, not {type(filepath)}"
+        assert(exists(filepath)), f"specified filepath '{filepath}' was not found on the filesystem"
+        # Open the h5 file, once...
+        # in lazy mode the file is left open, and closes once the last object
+        # holding a reference to it is released
+        assert(mode in ('r','r+')), f"unrecognized mode {mode}; must be 'r' or 'r+'"
+        try:
+            f = h5py.File(filepath,mode)
+        except OSError:
+            if mode == 'r+':
+                raise
+            raise Exception(f"The file at '{filepath}' is not recognized as an EMD file!")
+        owns_file = True
 
     # determine if the file is EMD 1.0
     # if not, try reading it as an EMD 0.1
-    if not _is_EMD_file(filepath):
+    if not _is_EMD_file(f):
+        if owns_file:
+            f.close()
+        else:
+            filepath = f.filename
         try:
             print(f"This file is not an EMD v1.0 file - attempting to read as an EMD v0.1...")
             ans = read_EMD_v0p1(filepath)
@@ -72,88 +148,137 @@ def read(
         except:
             raise Exception(f"The file at '{filepath}' is not recognized as an EMD file!")
     # get the version
-    v = _get_EMD_version(filepath)
+    v = _get_EMD_version(f)
 
     # determine `emdpath` if it was left as None
     if emdpath is None:
-        rootgroups = _get_EMD_rootgroups(filepath)
+        rootgroups = _get_EMD_rootgroups(f)
         if len(rootgroups) == 0:
             raise Exception("No root groups found! This error should never occur! You're amazing! You've broken the basic laws of logic, reason, and thermodynamics itself!!")
         elif len(rootgroups) == 1:
             emdpath = rootgroups[0]
         else:
+            if owns_file:
+                f.close()
             print("Multiple root groups detected - please specify the `emdpath` argument. Returning a list of root group names.")
             return rootgroups
 
     # parse the root and tree paths
     p = emdpath.split('/')
-    if '' in p:
-        p.remove('')
+    p = [x for x in p if x != '']
     rootpath = p[0]
     treepath = '/'.join(p[1:])
 
-    # Open the h5 file...
-    with h5py.File(filepath,'r') as f:
-        # Find the root group
-        assert(rootpath in f.keys()), f"Error: root group {rootpath} not found"
-        rootgroup = f[rootpath]
-        # Find the node of interest
-        group_names = treepath.split('/')
-        nodegroup = rootgroup
-        if len(group_names)==1 and group_names[0]=='':
-            pass
-        else:
-            for name in group_names:
-                assert(name in nodegroup.keys()), f"Error: group {name} not found in group {nodegroup.name}"
-                nodegroup = nodegroup[name]
-        # Read the root
-        root = Root.from_h5(rootgroup)
-        # if this is all that was requested, return
-        if nodegroup is rootgroup and tree is False:
-                return root
-
-        # Read...
-        # ...if the whole tree was requested
-        if nodegroup is rootgroup and tree in (True,'branch'):
-            # build the tree
-            n = _populate_tree(root,rootgroup)
-            # return...
-            if n == 1:
-                # ...if there's one node, return it
-                key = list(root._branch.keys())[0]
-                node = root.tree(key)
-            elif n == 0 and len(root.metadata) == 1:
-                # ...if there's no nodes and one dictionary,
-                # return it
-                key = list(root.metadata.keys())[0]
-                node = root.metadata[key]
+    try:
+        with _set_io_options(lazy=lazy,track_changes=track_changes):
+            # Find the root group
+            assert(rootpath in f.keys()), f"Error: root group {rootpath} not found"
+            rootgroup = f[rootpath]
+            # Find the node of interest
+            group_names = treepath.split('/')
+            nodegroup = rootgroup
+            if len(group_names)==1 and group_names[0]=='':
+                pass
             else:
-                # ...otherwise, return the root
+                for name in group_names:
+                    assert(name in nodegroup.keys()), f"Error: group {name} not found in group {nodegroup.name}"
+                    nodegroup = nodegroup[name]
+            # validate the region
+            if region is not None:
+                assert(nodegroup is not rootgroup and tree in (True,False)), "`region` requires `emdpath` to point to a data node, and `tree` to be True or False"
+                t = nodegroup.attrs['emd_group_type']
+                assert(t in _region_group_types), f"`region` can't be used to read an EMD group of type '{t}'"
+            # Read the root
+            root = Root.from_h5(rootgroup)
+            # if this is all that was requested, return
+            if nodegroup is rootgroup and tree is False:
+                    return root
+
+            # Read...
+            # ...if the whole tree was requested
+            if nodegroup is rootgroup and tree in (True,'branch'):
+                # build the tree
+                n = _populate_tree(root,rootgroup,lazy_tree=lazy_tree)
+                # return...
+                if n == 1:
+                    # ...if there's one node, return it
+                    key = list(root._branch.keys())[0]
+                    node = root.tree(key)
+                elif n == 0 and len(root.metadata) == 1:
+                    # ...if there's no nodes and one dictionary,
+                    # return it
+                    key = list(root.metadata.keys())[0]
+                    node = root.metadata[key]
+                else:
+                    # ...otherwise, return the root
+                    node = root
+            # ...if a single node was requested
+            elif tree is False:
+                # read the node
+                with _set_io_options(region=region):
+                    node = _read_single_node(nodegroup)
+                # build the tree and return
+                root.force_add_to_tree(node)
+            # ...if a branch was requested
+            elif tree is True:
+                # read source node and add to tree
+                with _set_io_options(region=region):
+                    node = _read_single_node(nodegroup)
+                root.force_add_to_tree(node)
+                # build the tree
+                _populate_tree(node,nodegroup,lazy_tree=lazy_tree)
+            # ...if `tree == None`
+            elif tree is None or tree=='branch':
+                # build the tree
+                _populate_tree(root,nodegroup,lazy_tree=lazy_tree)
                 node = root
-        # ...if a single node was requested
-        elif tree is False:
-            # read the node
-            node = _read_single_node(nodegroup)
-            # build the tree and return
-            root.force_add_to_tree(node)
-        # ...if a branch was requested
-        elif tree is True:
-            # read source node and add to tree
-            node = _read_single_node(nodegroup)
-            root.force_add_to_tree(node)
-            # build the tree
-            _populate_tree(node,nodegroup)
-        # ...if `tree == None`
-        elif tree is None or tree=='branch':
-            # build the tree
-            _populate_tree(root,nodegroup)
-            node = root
-        else:
-            raise Exception(f"Invalid argument for `tree` {tree}; must be True, False, or None")
+            else:
+                raise Exception(f"Invalid argument for `tree` {tree}; must be True, False, or None")
+    finally:
+        if owns_file and not (lazy or lazy_tree):
+            f.close()
 
     # Return
     return node
 
+# Read the number of points in each cell of a PointListArray
+def read_pla_counts(filepath, emdpath):
+    """
+    Reads the number of points in each cell of a PointListArray stored in an
+    EMD file, e.g. to make a map of the number of Bragg peaks at each scan
+    position, without reading the PointListArray's data.
+
+    Parameters
+    ----------
+    filepath : str or Path or h5py File or h5py Group
+        the file path or an open h5py File, or a Group, relative to which
+        ``emdpath`` is found
+    emdpath : str
+        the HDF5 group path of the PointListArray, e.g.
+        ``'root/braggvectors'``
+
+    Returns
+    -------
+    (2D ndarray of ints) the number of points in each cell
+    """
+    if isinstance(filepath, h5py.Group):
+        return _read_pla_counts(filepath, emdpath)
+    assert(exists(filepath)), f"specified filepath '{filepath}' was not found on the filesystem"
+    with h5py.File(filepath,'r') as f:
+        return _read_pla_counts(f, emdpath)
+
+def _read_pla_counts(group, emdpath):
+    assert(emdpath in group), f"Error: group {emdpath} not found"
+    grp = group[emdpath]
+    t = grp.attrs.get('emd_group_type')
+    assert(t == 'pointlistarray'), f"{emdpath} is an EMD group of type '{t}', not a pointlistarray"
+    if 'counts' in grp:
+        return grp['counts'][()]
+    # files written before the counts were stored
+    dset = grp['data']
+    counts = np.array([len(c) for c in dset[()].ravel()],dtype=np.int64)
+    return counts.reshape(dset.shape)
+
 # Print the HDF5 filetree to screen
 def print_h5_tree(filepath, show_metadata=False):
     """
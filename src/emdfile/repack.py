@@ -0,0 +1,182 @@
+# Reclaim the space left unused in EMD files by append-over writes
+#
+# HDF5 doesn't return the space freed by deleting or rewriting objects to the
+# operating system, and usually doesn't reuse it once the file is closed.
+# Repacking copies every live object into a fresh file with HDF5 object copy,
+# then replaces the original.
+
+import h5py
+import numpy as np
+from os import replace, remove, close
+from os.path import exists, getsize, dirname, abspath
+from shutil import copymode
+from tempfile import mkstemp
+from typing import Optional
+from emdfile.classes.array import (_validate_storage, _get_storage,
+    _get_dataset_kwargs)
+from emdfile.utils import _is_EMD_file
+
+def repack(
+    filepath,
+    outpath = None,
+    storage: Optional[dict] = None,
+    threshold: Optional[float] = None,
+    ):
+    """
+    Copies the EMD trees in the file at ``filepath`` into a fresh file,
+    reclaiming the space left unused when nodes are overwritten or removed,
+    e.g. by saving in append-over mode.  Objects are copied with HDF5 object
+    copy, without reading their data, unless ``storage`` is passed.  The file
+    header, including its UUID, is kept.
+
+    Parameters
+    ----------
+    filepath : str or Path
+        the EMD file
+    outpath : str or Path or None
+        if None, the file at ``filepath`` is replaced by the repacked file.
+        Otherwise, the repacked file is written here and the original is left
+        as it is
+    storage : dict or None
+        if passed, changes the HDF5 dataset layout of the data of every Array
+        in the file, by updating the layout of each Array with these settings.
+        Valid keys are 'chunks', 'compression', 'compression_opts',
+        'shuffle', and 'fillvalue'; see ``Array.set_storage``. Explicit chunk
+        shapes apply only to Arrays of the same rank. Data is copied chunk by
+        chunk.
+    threshold : float or None
+        if passed, the file is repacked only if the estimated fraction of the
+        file which is unused exceeds ``threshold``, a number between 0 and 1
+
+    Returns
+    -------
+    (int) the number of bytes reclaimed, i.e. the difference between the sizes
+    of the original and repacked files, or 0 if the file wasn't repacked
+    """
+    assert(exists(filepath)), f"specified filepath '{filepath}' was not found on the filesystem"
+    storage = _validate_storage(storage)
+    if threshold is not None:
+        assert(0 <= threshold <= 1), f"`threshold` must be between 0 and 1, not {threshold}"
+        if _get_unused_fraction(filepath) <= threshold:
+            return 0
+
+    # write to a temporary file beside the original, unless `outpath` is set
+    size = getsize(filepath)
+    if outpath is None:
+        fd,target = mkstemp(
+            suffix = '.h5',
+            dir = dirname(abspath(filepath))
+        )
+        close(fd)
+    else:
+        target = outpath
+    try:
+        with h5py.File(filepath,'r') as f:
+            assert(_is_EMD_file(f)), f"{filepath} does not point to an EMD 1.0 file"
+            with h5py.File(target,'w') as g:
+                for k,v in f.attrs.items():
+                    g.attrs[k] = v
+                for k in f.keys():
+                    if len(storage) == 0:
+                        f.copy(f[k],g,name=k)
+                    else:
+                        _copy_with_storage(f[k],g,k,storage)
+    except BaseException:
+        if outpath is None and exists(target):
+            remove(target)
+        raise
+    if outpath is None:
+        # temporary files are made private; keep the original's permissions
+        copymode(filepath,target)
+        replace(target,filepath)
+        return size - getsize(filepath)
+    return size - getsize(target)
+
+def _copy_with_storage(obj, group, name, storage):
+    """
+    Copies h5py object `obj` into h5py Group `group` as `name`, recreating the
+    data datasets of Arrays with their layout updated by `storage`
+    """
+    if isinstance(obj,h5py.Dataset):
+        obj.file.copy(obj,group,name=name)
+        return
+    grp = group.create_group(name)
+    for k,v in obj.attrs.items():
+        grp.attrs[k] = v
+    is_array = obj.attrs.get('emd_group_type') in ('array','custom_array')
+    for k in obj.keys():
+        if is_array and k == 'data' and isinstance(obj[k],h5py.Dataset):
+            _copy_array_data(obj,grp,storage)
+        else:
+            _copy_with_storage(obj[k],grp,k,storage)
+
+def _copy_array_data(src, dst, storage):
+    """
+    Copies the data dataset of the Array in h5py Group `src` into Group `dst`,
+    with its layout updated by `storage`
+    """
+    dset = src['data']
+    shape = dset.shape
+    rank = len(shape)
+    is_stack = rank > 0 and f"dim{rank-1}" in src and \
+        src[f"dim{rank-1}"].attrs.get('name') == '_labels_'
+    settings = _get_storage(dset)
+    settings.update(storage)
+    # explicit chunk shapes apply only to Arrays of the same rank
+    chunks = storage.get('chunks')
+    if isinstance(chunks,(tuple,list)) and len(chunks) != rank:
+        settings['chunks'] = dset.chunks
+    new = dst.create_dataset(
+        'data',
+        shape = shape,
+        dtype = dset.dtype,
+        **_get_dataset_kwargs(settings,shape,is_stack)
+    )
+    for k,v in dset.attrs.items():
+        new.attrs[k] = v
+    # copy chunk by chunk, or for contiguous datasets, in slabs along the
+    # first axis
+    if rank == 0 or dset.size == 0:
+        new[()] = dset[()]
+    elif new.chunks is not None:
+        for sl in new.iter_chunks():
+            new[sl] = dset[sl]
+    else:
+        step = max(1,2**26 // max(1,dset.dtype.itemsize*dset.size//shape[0]))
+        for i in range(0,shape[0],step):
+            new[i:i+step] = dset[i:i+step]
+
+def _get_unused_fraction(filepath):
+    """
+    Returns an estimate of the fraction of the file at `filepath` which isn't
+    used by any object reachable from its root group: the file size, less the
+    data, headers, and indices of every object.  Small files, in which the
+    structures not counted here weigh more, are overestimated.
+    """
+    with h5py.File(filepath,'r') as f:
+        size = f.id.get_filesize()
+        used = [_get_object_size(f)]
+        f.visititems(lambda name,obj: used.append(_get_object_size(obj)))
+    return max(0.,1.-sum(used)/size) if size > 0 else 0.
+
+def _get_object_size(obj):
+    """
+    Returns the number of bytes used in its file by h5py object `obj`
+    """
+    info = h5py.h5o.get_info(obj.id)
+    size = info.hdr.space.total
+    size += info.meta_size.obj.index_size + info.meta_size.obj.heap_size
+    size += info.meta_size.attr.index_size + info.meta_size.attr.heap_size
+    if isinstance(obj,h5py.Dataset):
+        size += obj.id.get_storage_size()
+        # variable length data is stored in the file's global heap
+        base = h5py.check_vlen_dtype(obj.dtype)
+        if base is not None and base not in (str,bytes):
+            base = np.dtype(base)
+            counts = obj.parent.get('counts')
+            if isinstance(counts,h5py.Dataset) and counts.shape == obj.shape:
+                n = int(np.sum(counts[()]))
+            else:
+                n = sum([len(x) for x in obj[()].ravel()])
+            size += n*base.itemsize
+    return size
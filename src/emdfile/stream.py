@@ -0,0 +1,430 @@
+# Incremental writing of EMD nodes
+
+import h5py
+import numpy as np
+from os.path import exists
+from os import remove
+from typing import Optional
+from emdfile.classes import Node, Root, Array, PointList, PointListArray, Metadata
+from emdfile.classes.array import _validate_storage, _resolve_chunks
+from emdfile.utils import (_is_EMD_file, _write_header, _write_single_node,
+    _validate_treepath)
+
+class _NodeStream:
+    """
+    Base class for streams, which open an EMD file and write a single node
+    into it incrementally
+    """
+    def _open(self, filepath, mode, swmr=False):
+        """
+        Opens the file in mode 'w', 'o' or 'a', writing a header if it's new
+        """
+        assert(mode in ('w','o','a')), f"unrecognized mode {mode}; must be 'w', 'o' or 'a'"
+        if mode == 'w':
+            assert(not(exists(filepath))), "A file already exists at this destination; use append or overwrite mode, or choose a new file path."
+        elif mode == 'o' and exists(filepath):
+            remove(filepath)
+        kwargs = {'libver':'latest'} if swmr else {}
+        if exists(filepath):
+            assert(_is_EMD_file(filepath)), f"{filepath} does not point to an EMD 1.0 file"
+            self._file = h5py.File(filepath,'a',**kwargs)
+        else:
+            self._file = h5py.File(filepath,'w',**kwargs)
+            _write_header(self._file)
+
+    def _get_parent_group(self, emdpath):
+        """
+        Returns the h5py Group the node will be written into
+        """
+        f = self._file
+        # no emdpath - use or make a root named for the node
+        if emdpath is None:
+            rootname = self.name+'_root'
+            if rootname not in f.keys():
+                rootgroup = _write_single_node(
+                    group = f,
+                    data = Root(name=rootname)
+                )
+                rootgroup.attrs['emd_group_type'] = 'root'
+            return f[rootname]
+        # otherwise find the target node
+        l = [x for x in emdpath.split('/') if x != '']
+        rootname,treepath = l[0],'/'.join(l[1:])
+        assert(rootname in f.keys()), f"No root called {rootname} found - check your `emdpath`"
+        where = _validate_treepath(f[rootname],treepath)
+        if where is False or where[1] is False:
+            raise Exception(f"No node found at {emdpath} - check your `emdpath`")
+        return where[0]
+
+    def flush(self):
+        """
+        Flushes all data written so far to disk.
+        """
+        self._file.flush()
+
+    def close(self):
+        """
+        Flushes and closes the file.
+        """
+        if self._file.id.valid:
+            self.flush()
+            self._file.close()
+
+    # context manager
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ArrayStream(_NodeStream):
+    """
+    Writes an Array to an EMD file incrementally, so that data can be stored
+    as it's produced without holding the whole array in memory.
+
+    .. topic:: Usage
+
+        Declare the Array's shape, dtype and calibrations up front, then push
+        data into the file with ``.append`` or ``.write``
+
+            >>> with ArrayStream(
+            >>>     path,
+            >>>     shape = (None,256,256),
+            >>>     dtype = np.uint16,
+            >>>     name = 'frames',
+            >>>     dims = [0.01,[0,0.1],[0,0.1]],
+            >>>     dim_units = ['s','A^-1','A^-1'],
+            >>> ) as stream:
+            >>>     for frame in detector:
+            >>>         stream.append(frame)
+
+        A shape of ``None`` for the first axis makes the dataset resizable
+        along that axis, and each ``.append`` grows it by one frame or one
+        block of frames.  For a fixed final shape, ``.append`` fills the
+        first axis in order, and ``.write`` stores data at any location, e.g.
+
+            >>> stream.write((rx,ry), diffraction_pattern)
+
+        for a 4D datacube of shape (Rx,Ry,Qx,Qy).
+
+    .. topic:: File Validity
+
+        The header, root, node group, metadata and dim vectors are written
+        when the stream is opened, so the file is a valid EMD file from the
+        start.  After each ``.flush``, the file holds a readable Array whose
+        data contains everything pushed so far; regions of a fixed shape
+        array which have not been written hold the fill value. With
+        ``swmr=True`` the file is opened in HDF5 single-writer/multiple-reader
+        mode, so other processes can read it while it's being written.
+    """
+    def __init__(
+        self,
+        filepath,
+        shape: tuple,
+        dtype = np.float64,
+        name: Optional[str] = 'array',
+        units: Optional[str] = '',
+        dims: Optional[list] = None,
+        dim_names: Optional[list] = None,
+        dim_units: Optional[list] = None,
+        metadata = None,
+        mode: str = 'w',
+        emdpath: Optional[str] = None,
+        storage: Optional[dict] = None,
+        swmr: bool = False,
+        ):
+        """
+        Parameters
+        ----------
+        filepath : str or Path
+        shape : tuple
+            the final shape of the array. The first element may be None,
+            in which case the first axis is unbounded and grows as data is
+            appended
+        dtype : dtype
+        name : str
+        units : str
+        dims, dim_names, dim_units : list
+            calibrations, as for an Array. The dim vector of an unbounded
+            axis must be linear, i.e. None, a number, or a length 2 list
+        metadata : None or Metadata or list of Metadata
+            metadata to store with the Array
+        mode : str
+            'w' writes a new file, and raises an Exception if one exists. 'o'
+            overwrites any existing file. 'a' appends to an existing EMD file,
+            or writes a new file if none exists.
+        emdpath : str or None
+            the '/' delimited path to an existing node under which the Array
+            is placed. If None, the Array is placed under a root called
+            '{name}_root', which is created if it doesn't exist
+        storage : dict or None
+            the dataset layout - see ``Array.set_storage``. Datasets with an
+            unbounded axis must be chunked; if no chunks are specified the
+            'diffraction' pattern is used for 3+ dimensional arrays
+        swmr : bool
+            if True, opens the file in HDF5 single-writer/multiple-reader mode
+        """
+        # validate inputs
+        shape = tuple(shape)
+        assert(all([s is not None for s in shape[1:]])), "only the first axis may be unbounded"
+        self.name = name
+        self.unbounded = shape[0] is None
+        self._maxshape = shape
+
+        # build a template Array for the group, metadata, and dim vectors.
+        # it's backed by a single broadcast element, so uses no memory.
+        # unbounded axes are given length 2, so their dim vectors are stored
+        # in their linear, length 2 form
+        tmpshape = tuple([2 if s is None else s for s in shape])
+        template = Array(
+            data = np.broadcast_to(np.zeros((),dtype=dtype),tmpshape),
+            name = name,
+            units = units,
+            dims = dims,
+            dim_names = dim_names,
+            dim_units = dim_units,
+        )
+        if self.unbounded:
+            assert(template._dim_is_linear(template.dims[0],2)), "the dim vector of an unbounded axis must be linear"
+        if metadata is not None:
+            if isinstance(metadata,Metadata):
+                metadata = [metadata]
+            for md in metadata:
+                template.metadata = md
+        if storage is not None:
+            template.set_storage(**_validate_storage(storage))
+
+        # open the file
+        self._open(filepath,mode,swmr)
+
+        # find or make the parent group
+        try:
+            parentgroup = self._get_parent_group(emdpath)
+            # write the node group, metadata and dims
+            grp = Node.to_h5(template,parentgroup)
+            dsetkwargs = template._get_dataset_kwargs(
+                shape = tuple([1 if s is None else s for s in shape]))
+            if self.unbounded and 'chunks' not in dsetkwargs:
+                dsetkwargs['chunks'] = _resolve_chunks(
+                    'diffraction' if len(shape) >= 3 else True,
+                    tuple([1 if s is None else s for s in shape]))
+            self._dset = grp.create_dataset(
+                "data",
+                shape = (0,)+shape[1:] if self.unbounded else shape,
+                maxshape = shape,
+                dtype = dtype,
+                **dsetkwargs
+            )
+            self._dset.attrs.create('units',units)
+            template._write_dims(grp)
+            self._file.flush()
+            if swmr:
+                self._file.swmr_mode = True
+        except:
+            self._file.close()
+            raise
+
+        # index of the next frame to append
+        self._index = 0
+
+    # properties
+    @property
+    def shape(self):
+        return self._dset.shape
+    @property
+    def dtype(self):
+        return self._dset.dtype
+    @property
+    def dataset(self):
+        return self._dset
+    def __len__(self):
+        return self._index
+
+    # write data
+    def append(self, data):
+        """
+        Appends a single frame, with shape equal to the array shape excluding
+        the first axis, or a block of frames, with the array shape excluding the
+        first axis' length, at the next position along the first axis.
+        """
+        data = np.asarray(data)
+        framesize = self._dset.shape[1:]
+        if data.shape == framesize:
+            data = data[np.newaxis]
+        assert(data.shape[1:] == framesize), f"data of shape {data.shape} can't be appended to an array of shape {self._dset.shape}"
+        N = data.shape[0]
+        end = self._index + N
+        if self.unbounded:
+            if end > self._dset.shape[0]:
+                self._dset.resize(end,axis=0)
+        else:
+            assert(end <= self._dset.shape[0]), f"can't append {N} frames to an array with {self._dset.shape[0]-self._index} frames remaining"
+        self._dset[self._index:end] = data
+        self._index = end
+
+    def write(self, index, data):
+        """
+        Writes ``data`` into the array at ``index``, which may be any slice
+        into the dataset which h5py accepts, e.g. ``stream.write((2,3),frame)``
+        or ``stream.write(np.s_[0:4,:,:],block)``. For unbounded arrays, the
+        region written must already be within the array's current extent.
+        """
+        self._dset[index] = data
+
+    def flush(self):
+        """
+        Flushes all data written so far to disk.
+        """
+        self._dset.flush()
+        self._file.flush()
+
+    def __repr__(self):
+        space = ' '*len(self.__class__.__name__)+'  '
+        string = f"{self.__class__.__name__}( A stream writing an Array called '{self.name}',"
+        if self._file.id.valid:
+            string += "\n"+space+f"currently of shape {self.shape}, with maximum shape {self._maxshape}"
+        else:
+            string += "\n"+space+"which has been closed"
+        string += "\n)"
+        return string
+
+
+class PointListArrayStream(_NodeStream):
+    """
+    Writes a PointListArray to an EMD file incrementally, cell by cell or row
+    by row, so that results can be stored as they're produced without holding
+    the whole PointListArray in memory.
+
+    .. topic:: Usage
+
+        Declare the PointListArray's dtype and shape up front, then write
+        completed cells or rows of cells into the file
+
+            >>> with PointListArrayStream(
+            >>>     path,
+            >>>     dtype = [('qx',float),('qy',float),('intensity',float)],
+            >>>     shape = (512,512),
+            >>>     name = 'braggpeaks',
+            >>> ) as stream:
+            >>>     for rx in range(512):
+            >>>         stream.write_row(rx, [find_peaks(rx,ry) for ry in range(512)])
+
+        where each cell is a structured array or a PointList, and single cells
+        are written with ``stream.write(rx, ry, peaks)``.
+
+    .. topic:: File Validity
+
+        The PointListArray is written in the 'vlen' layout. Its group,
+        metadata, and a data and counts dataset with every cell empty are
+        written when the stream is opened, so the file holds a readable
+        PointListArray from the start. After each ``.flush`` the file holds
+        every cell written so far, so partial results survive if the writing
+        process is stopped. Cells may be written in any order, and rewritten.
+        Because HDF5 doesn't support variable length data in
+        single-writer/multiple-reader mode, the file should only be read by
+        other processes between flushes, or once the stream is closed.
+    """
+    def __init__(
+        self,
+        filepath,
+        dtype,
+        shape: tuple,
+        name: Optional[str] = 'pointlistarray',
+        metadata = None,
+        mode: str = 'w',
+        emdpath: Optional[str] = None,
+        ):
+        """
+        Parameters
+        ----------
+        filepath : str or Path
+        dtype : dtype
+            the dtype of the data comprising each PointList
+        shape : 2-tuple of ints
+            the shape of the array of PointLists
+        name : str
+        metadata : None or Metadata or list of Metadata
+            metadata to store with the PointListArray
+        mode : str
+            'w' writes a new file, and raises an Exception if one exists. 'o'
+            overwrites any existing file. 'a' appends to an existing EMD file,
+            or writes a new file if none exists.
+        emdpath : str or None
+            the '/' delimited path to an existing node under which the
+            PointListArray is placed. If None, it's placed under a root called
+            '{name}_root', which is created if it doesn't exist
+        """
+        # build an empty template PointListArray for the group and metadata
+        shape = tuple(shape)
+        template = PointListArray(
+            dtype = dtype,
+            shape = shape,
+            name = name,
+        )
+        self.name = name
+        self.shape = shape
+        self.dtype = template.dtype
+        if metadata is not None:
+            if isinstance(metadata,Metadata):
+                metadata = [metadata]
+            for md in metadata:
+                template.metadata = md
+
+        # open the file
+        self._open(filepath,mode)
+
+        # find or make the parent group
+        try:
+            parentgroup = self._get_parent_group(emdpath)
+            # write the node group, metadata, and empty data
+            grp = Node.to_h5(template,parentgroup)
+            self._dset = grp.create_dataset(
+                "data",
+                shape,
+                h5py.special_dtype(vlen=self.dtype)
+            )
+            self._counts = grp.create_dataset(
+                "counts",
+                data = np.zeros(shape,dtype=np.int64)
+            )
+            self._file.flush()
+        except:
+            self._file.close()
+            raise
+
+    def _as_cell(self, data):
+        """
+        Returns the data of a cell as a 1D array of the stream's dtype
+        """
+        if isinstance(data,PointList):
+            data = data.data
+        return np.atleast_1d(np.asarray(data,dtype=self.dtype))
+
+    # write data
+    def write(self, rx, ry, data):
+        """
+        Writes the structured array or PointList ``data`` into cell rx,ry.
+        """
+        data = self._as_cell(data)
+        self._dset[rx,ry] = data
+        self._counts[rx,ry] = len(data)
+
+    def write_row(self, rx, cells):
+        """
+        Writes the row of cells rx, where ``cells`` is a sequence of one
+        structured array or PointList per cell.
+        """
+        assert(len(cells) == self.shape[1]), f"a row must have {self.shape[1]} cells, not {len(cells)}"
+        row = np.empty(self.shape[1],dtype=object)
+        for ry,data in enumerate(cells):
+            row[ry] = self._as_cell(data)
+        self._dset[rx] = row
+        self._counts[rx] = [len(data) for data in row]
+
+    def __repr__(self):
+        space = ' '*len(self.__class__.__name__)+'  '
+        string = f"{self.__class__.__name__}( A stream writing a shape {self.shape} PointListArray called '{self.name}'"
+        if not self._file.id.valid:
+            string += ",\n"+space+"which has been closed"
+        string += "\n)"
+        return string
@@ -1,44 +1,65 @@
 import h5py
 from emdfile.classes import Metadata
-from emdfile.classes.utils import _get_class, EMD_data_group_types
+from emdfile.classes.node import _NodeStub
+from emdfile.classes.utils import (_get_class, EMD_data_group_types,
+    _set_io_options, _get_io_option)
+from os.path import realpath
 from uuid import uuid4
 
 # read utilities - file level
 
 def _get_EMD_rootgroups(filepath):
     """
-    Returns a list of root groups in an EMD 1.0 file.
+    Returns a list of root groups in an EMD 1.0 file. ``filepath`` may be a
+    path or an open h5py File.
     """
-    rootgroups = []
+    if isinstance(filepath, h5py.File):
+        return _find_rootgroups(filepath)
     with h5py.File(filepath,'r') as f:
-        for key in f.keys():
-            if 'emd_group_type' in f[key].attrs:
-                if f[key].attrs['emd_group_type'] == 'root':
-                    rootgroups.append(key)
+        return _find_rootgroups(f)
+
+def _find_rootgroups(f):
+    """
+    Returns a list of root groups in the open h5py File ``f``.
+    """
+    rootgroups = []
+    for key in f.keys():
+        if 'emd_group_type' in f[key].attrs:
+            if f[key].attrs['emd_group_type'] == 'root':
+                rootgroups.append(key)
     return rootgroups
 
 def _is_EMD_file(filepath):
     """
-    Returns True iff filepath points to a valid EMD 1.0 file.
+    Returns True iff filepath points to a valid EMD 1.0 file. ``filepath``
+    may be a path or an open h5py File.
     """
+    if isinstance(filepath, h5py.File):
+        return _is_EMD_header(filepath)
     # confirm that the file is an HDF5 file
     try:
-        with h5py.File(filepath,'r') as f:
-            pass
+        f = h5py.File(filepath,'r')
     except OSError:
         raise Exception(f"The file at {filepath} is not an HDF5 file!")
+    with f:
+        return _is_EMD_header(f)
+
+def _is_EMD_header(f):
+    """
+    Returns True iff the open h5py File ``f`` has an EMD 1.0 header and
+    at least one root group.
+    """
     # check for the 'emd_group_type'='file' attribute
-    with h5py.File(filepath,'r') as f:
-        try:
-            assert('emd_group_type' in f.attrs.keys())
-            assert('version_major' in f.attrs.keys())
-            assert('version_minor' in f.attrs.keys())
-            assert(f.attrs['emd_group_type'] == 'file')
-            assert(f.attrs['version_major'] == 1)
-            assert(f.attrs['version_minor'] == 0)
-        except AssertionError:
-            return False
-    rootgroups = _get_EMD_rootgroups(filepath)
+    try:
+        assert('emd_group_type' in f.attrs.keys())
+        assert('version_major' in f.attrs.keys())
+        assert('version_minor' in f.attrs.keys())
+        assert(f.attrs['emd_group_type'] == 'file')
+        assert(f.attrs['version_major'] == 1)
+        assert(f.attrs['version_minor'] == 0)
+    except AssertionError:
+        return False
+    rootgroups = _find_rootgroups(f)
     if len(rootgroups)>0:
         return True
     else:
@@ -46,26 +67,41 @@ def _is_EMD_file(filepath):
 
 def _get_EMD_version(filepath, rootgroup=None):
     """
-    Returns the version (major,minor,release) of an EMD file.
+    Returns the version (major,minor,release) of an EMD file. ``filepath``
+    may be a path or an open h5py File.
     """
-    assert(_is_EMD_file(filepath)), "Error: not recognized as an EMD file"
+    if isinstance(filepath, h5py.File):
+        return _read_EMD_version(filepath)
     with h5py.File(filepath,'r') as f:
-        v_major = int(f.attrs['version_major'])
-        v_minor = int(f.attrs['version_minor'])
-        if 'version_release' in f.attrs.keys():
-            v_release = int(f.attrs['version_release'])
-        else:
-            v_release = 0
-        return v_major, v_minor, v_release
+        return _read_EMD_version(f)
+
+def _read_EMD_version(f):
+    """
+    Returns the version (major,minor,release) of the open h5py File ``f``.
+    """
+    assert(_is_EMD_header(f)), "Error: not recognized as an EMD file"
+    v_major = int(f.attrs['version_major'])
+    v_minor = int(f.attrs['version_minor'])
+    if 'version_release' in f.attrs.keys():
+        v_release = int(f.attrs['version_release'])
+    else:
+        v_release = 0
+    return v_major, v_minor, v_release
 
 def _get_UUID(filepath):
     """
     Returns the UUID of an EMD file, or if unavailable returns -1.
+    ``filepath`` may be a path or an open h5py File.
     """
-    assert(_is_EMD_file(filepath)), "Error: not recognized as an EMD file"
+    if isinstance(filepath, h5py.File):
+        return _read_UUID(filepath)
     with h5py.File(filepath,'r') as f:
-        if 'UUID' in f.attrs:
-            return f.attrs['UUID']
+        return _read_UUID(f)
+
+def _read_UUID(f):
+    assert(_is_EMD_header(f)), "Error: not recognized as an EMD file"
+    if 'UUID' in f.attrs:
+        return f.attrs['UUID']
     return -1
 
 def _version_is_geq(current,minimum):
@@ -96,21 +132,30 @@ def _read_single_node(grp):
     """
     __class__ = _get_class(grp)
     data = __class__.from_h5(grp)
+    if _get_io_option('track_changes',False):
+        data._origin = _get_origin(grp,data)
     return data
 
-def _populate_tree(node,group,count=0):
+def _populate_tree(node,group,count=0,lazy_tree=False):
     """
     `node` is a Node and `group` is its parallel h5py Group.
     Reads the tree underneath this nodegroup in the h5 file and adds it
     to the runtime tree underneath this node. Does *not* read `group`
-    itself - this function grafts everything underneath `group` onto node
+    itself - this function grafts everything underneath `group` onto node.
+    If `lazy_tree` is True, only adds stubs for the nodes directly under
+    `node`, which are read when they're first accessed.
 
     Returns the number of new nodes added to the tree
     """
-    keys = [k for k in group.keys() if isinstance(group[k],h5py.Group)]
-    keys = [k for k in keys if 'emd_group_type' in group[k].attrs.keys()]
-    keys = [k for k in keys if group[k].attrs['emd_group_type'] in \
-        EMD_data_group_types]
+    keys = _get_node_groupnames(group)
+    if lazy_tree:
+        options = {
+            'lazy' : _get_io_option('lazy',False),
+            'track_changes' : _get_io_option('track_changes',False),
+        }
+        for key in keys:
+            node._branch._dict[key] = _NodeStub(node,group[key],options)
+        return count+len(keys)
     for key in keys:
         new_node = _read_single_node(group[key])
         count += 1
@@ -122,6 +167,62 @@ def _populate_tree(node,group,count=0):
         )
     return count
 
+def _get_node_groupnames(group):
+    """
+    Returns the names of the EMD data node groups directly under `group`
+    """
+    keys = [k for k in group.keys() if isinstance(group[k],h5py.Group)]
+    keys = [k for k in keys if 'emd_group_type' in group[k].attrs.keys()]
+    keys = [k for k in keys if group[k].attrs['emd_group_type'] in \
+        EMD_data_group_types]
+    return keys
+
+def _get_origin(group,node):
+    """
+    Returns a record of the file and h5py Group `node` is stored in and of its
+    content, or None if the node's content can't be fingerprinted
+    """
+    fingerprint = node._fingerprint()
+    if fingerprint is None:
+        return None
+    return (_get_file_id(group.file),group.name,fingerprint)
+
+def _get_file_id(f):
+    return (realpath(f.filename),f.attrs.get('UUID'))
+
+def _is_unchanged(group,node):
+    """
+    Returns True if `node` was read from, or last written to, h5py Group
+    `group`, and its content apart from its metadata has not changed since
+    """
+    origin = getattr(node,'_origin',None)
+    if origin is None:
+        return False
+    if origin[:2] != (_get_file_id(group.file),group.name):
+        return False
+    return node._fingerprint() == origin[2]
+
+def _report(path,action):
+    """
+    Adds (`path`,`action`) to the report of the current write call
+    """
+    report = _get_io_option('report')
+    if report is not None:
+        report.append((path,action))
+
+def _get_path(group,name):
+    """
+    Returns the path of node `name` under `group`, an h5py Group, or in a dry
+    run, possibly the path string of a group which hasn't been written
+    """
+    if group is None:
+        path = ''
+    elif isinstance(group,str):
+        path = group
+    else:
+        path = group.name.rstrip('/')
+    return path+'/'+name
+
 def _read_metadata(
     group,
     name
@@ -168,7 +269,8 @@ def _write_from_root(
         group = file,
         data = root,
     )
-    rootgroup.attrs['emd_group_type'] = 'root'
+    if not _get_io_option('dry_run',False):
+        rootgroup.attrs['emd_group_type'] = 'root'
 
     # write the rest
     if data is root:
@@ -204,7 +306,12 @@ def _write_single_node(
     group,
     data
     ):
+    _report(_get_path(group,data.name),'write')
+    if _get_io_option('dry_run',False):
+        return _get_path(group,data.name)
     grp = data.to_h5(group)
+    if getattr(data,'_origin',None) is not None:
+        data._origin = _get_origin(grp,data)
     return grp
 
 def _write_tree(
@@ -231,10 +338,11 @@ def _append_root_metadata(
     # Determine if there is new group metadata
     if len(root._metadata)==0:
         return
+    dry_run = _get_io_option('dry_run',False)
     # Get file root metadata groups
     metadata_groups = []
     if "metadatabundle" not in rootgroup.keys():
-        mdbundle_group = rootgroup.create_group('metadatabundle')
+        mdbundle_group = None if dry_run else rootgroup.create_group('metadatabundle')
     else:
         mdbundle_group = rootgroup['metadatabundle']
         for k in mdbundle_group.keys():
@@ -242,21 +350,83 @@ def _append_root_metadata(
                 if mdbundle_group[k].attrs["emd_group_type"] == "metadata":
                     metadata_groups.append(k)
     # loop
+    changed = False
     for key in root._metadata:
         # if this group already exists
         if key in metadata_groups:
-            # overwrite it
+            # overwrite it, rewriting only changed items
             if appendover:
-                del(mdbundle_group[key])
-                root._metadata[key].to_h5(mdbundle_group)
+                changed |= _update_metadata_group(
+                    mdbundle_group,
+                    root._metadata[key]
+                )
             # or skip it
             else:
                 pass
         # otherwise, write it
         else:
-            root._metadata[key].to_h5(mdbundle_group)
+            changed = True
+            if not dry_run:
+                root._metadata[key].to_h5(mdbundle_group)
+    if changed:
+        _report(rootgroup.name,'metadata')
     return
 
+def _update_metadatabundle(
+    group,
+    metadata
+    ):
+    """
+    Updates the metadatabundle of the node in h5py Group `group` to hold
+    exactly the Metadata instances in dict `metadata`, rewriting only items
+    which have changed.  Returns True if anything changed.
+    """
+    dry_run = _get_io_option('dry_run',False)
+    if 'metadatabundle' not in group:
+        if len(metadata) == 0:
+            return False
+        if dry_run:
+            return True
+        bundle = group.create_group('metadatabundle')
+        bundle.attrs.create("emd_group_type","metadatabundle")
+    else:
+        bundle = group['metadatabundle']
+    # remove Metadata no longer present
+    changed = False
+    for k in list(bundle.keys()):
+        if k not in metadata:
+            changed = True
+            if not dry_run:
+                del(bundle[k])
+    if len(metadata) == 0:
+        if not dry_run:
+            del(group['metadatabundle'])
+        return True
+    # update the rest
+    for k,md in metadata.items():
+        md.name = k
+        changed |= _update_metadata_group(bundle,md)
+    return changed
+
+def _update_metadata_group(
+    bundle,
+    md
+    ):
+    """
+    Writes Metadata `md` into h5py Group `bundle`. If it's already there and
+    of the same class, only the items which have changed are rewritten.
+    Returns True if anything changed.
+    """
+    if bundle is not None and md.name in bundle:
+        grp = bundle[md.name]
+        if grp.attrs.get('python_class') == md.__class__.__name__:
+            return md._update_h5(grp)
+        if not _get_io_option('dry_run',False):
+            del(bundle[md.name])
+    if not _get_io_option('dry_run',False):
+        md.to_h5(bundle)
+    return True
+
 def _validate_treepath(
     rootgroup,
     treepath
@@ -301,6 +471,31 @@ def _overwrite_single_node(
     assert(data.name == name), f"Can't overwrite - data/group names don't match: {data.name} != {name}"
     assert(groupname == data._treepath), f"Can't overwrite - data/group paths dont match: {group.name != data._treepath}"
 
+    # If the node hasn't changed since it was read from or written to this
+    # group, update only its metadata
+    if _is_unchanged(group,data):
+        changed = _update_metadatabundle(
+            group,
+            data._metadata
+        )
+        _report(group.name,'metadata' if changed else 'skip')
+        return group
+    if _get_io_option('dry_run',False):
+        _report(group.name,'overwrite')
+        return group
+
+    # If the stored layout still fits, update the group in place
+    if data._update_h5(group):
+        _report(group.name,'overwrite')
+        _update_metadatabundle(
+            group,
+            data._metadata
+        )
+        if getattr(data,'_origin',None) is not None:
+            data._origin = _get_origin(group,data)
+        return group
+
+    # Otherwise, rewrite it
     # Get parent group
     parentpath = data._treepath.split('/')
     parentpath = rootname+'/'.join(parentpath[:-1])
@@ -309,10 +504,20 @@ def _overwrite_single_node(
     # Rename the old group
     parentgroup.move(name,"_tmp_"+name)
 
-    # Write the new data 
-    new_group = _write_single_node(
-        parentgroup,
-        data
+    # Write the new data, without its metadata
+    with _set_io_options(skip_metadata_of=data,report=None):
+        new_group = _write_single_node(
+            parentgroup,
+            data
+        )
+    _report(new_group.name,'overwrite')
+
+    # Move the old metadata over, and update it in place
+    if 'metadatabundle' in group:
+        new_group['metadatabundle'] = group['metadatabundle']
+    _update_metadatabundle(
+        new_group,
+        data._metadata
     )
 
     # Copy the links
@@ -338,12 +543,12 @@ def _append_branch(
         d = data._branch[key]
         # ...if this node doesn't exist in the H5, do a simple write
         if d.name not in groupkeys:
-            _write_single_node(
+            new_group = _write_single_node(
                 group,
                 d
             )
             _write_tree(
-                group,
+                new_group,
                 d
             )
         # otherwise, overwrite or skip it, then call this fn again
@@ -355,6 +560,7 @@ def _append_branch(
                 )
             else:
                 next_node = group[key]
+                _report(next_node.name,'skip')
             _append_branch(
                 next_node,
                 d,
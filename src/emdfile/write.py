@@ -6,7 +6,10 @@ from warnings import warn
 from os.path import exists,basename
 from os import remove
 from emdfile.classes import Node, Root, Array, Metadata
-from emdfile.classes.utils import EMD_data_group_types
+from emdfile.classes.utils import (EMD_data_group_types, _set_io_options,
+    _get_io_option)
+from emdfile.classes.array import _validate_storage
+from emdfile.repack import repack
 from emdfile.utils import (_is_EMD_file, _get_EMD_rootgroups, _write_header,
     _write_from_root, _write_single_node, _write_tree, _append_root_metadata,
     _validate_treepath, _overwrite_single_node, _append_branch)
@@ -17,6 +20,10 @@ def write(
     mode = 'w',
     tree = True,
     emdpath = None,
+    storage = None,
+    compact_metadata = False,
+    dry_run = False,
+    repack_threshold = None,
     ):
     """
     Saves data to an .h5 file at filepath.
@@ -62,6 +69,76 @@ def write(
         in the file, a diffmerge-like append is performed, comparing the trees
         and adding any new nodes and skipping or overwriting existing nodes
         according to the ``mode`` argument.
+    storage : dict or None
+        sets the HDF5 dataset layout - chunking, compression, and fill value -
+        for all Arrays written in this call. Valid keys are 'chunks',
+        'compression', 'compression_opts', 'shuffle', and 'fillvalue'; see
+        ``Array.set_storage`` for their meanings. Settings made on individual
+        Arrays with ``.set_storage`` take precedence.
+    compact_metadata : bool
+        if True, Metadata is written in a compact layout which packs many
+        items into a few datasets; see the Metadata class docstring. Files
+        written this way can't be read by versions of emdfile which predate
+        this option.
+    dry_run : bool
+        if True, nothing is written, and a report of what would be written is
+        returned instead.
+    repack_threshold : float or None
+        if passed, after writing, the file is repacked with ``emdfile.repack``
+        if the estimated fraction of the file left unused, e.g. by overwritten
+        nodes, exceeds this value, a number between 0 and 1.
+
+    Returns
+    -------
+    None, or if ``dry_run`` is True, a list of (path, action) tuples, one for
+    each node which would be written or considered, where path is the node's
+    HDF5 group path and action is one of 'write' (a new node), 'overwrite'
+    (an existing node is rewritten), 'metadata' (only the node's metadata
+    changes, and only changed items are rewritten) or 'skip' (the node is
+    left as it is).
+
+    Notes
+    -----
+    In append-over mode, nodes which were read with
+    ``read(..., track_changes=True)`` and haven't changed since - apart from
+    their metadata - are not rewritten, and only their changed metadata items
+    are updated. Nodes are compared by checksum, so in-place changes to their
+    data are detected. Other nodes, and nodes of classes which override
+    ``to_h5``, are always rewritten.
+    """
+    storage = _validate_storage(storage)
+    report = []
+    options = {'dry_run':True,'removed':set()} if dry_run else {}
+    with _set_io_options(
+        storage = storage,
+        compact_metadata = compact_metadata,
+        report = report,
+        **options
+        ):
+        _write(
+            filepath,
+            data,
+            mode = mode,
+            tree = tree,
+            emdpath = emdpath
+        )
+    if dry_run:
+        return report
+    if repack_threshold is not None:
+        repack(
+            filepath,
+            threshold = repack_threshold
+        )
+
+def _write(
+    filepath,
+    data,
+    mode = 'w',
+    tree = True,
+    emdpath = None,
+    ):
+    """
+    Saves data to an .h5 file at filepath. See ``write``.
     """
     # parse mode
     writemode = ['w', 'write']
@@ -82,27 +159,14 @@ def write(
         tree = None
     assert(tree in (True,False,None)), f"invalid value {tree} passed for `tree`"
     if mode in writemode:
-        assert(not(exists(filepath))), "A file already exists at this destination; use append or overwrite mode, or choose a new file path."
-
-    # validate `data` inputs, and handle non-Node `data` inputs
-    # numpy array -> Array
-    if isinstance(data, np.ndarray):
-        root = Root(name='root')
-        data = Array(name='np.array',data=data)
-        root.add_to_tree(data)
-    # dictionaries -> Metadata
-    elif isinstance(data, dict):
-        root = Root(name='root')
-        md = Metadata(name='dictionary',data=data)
-        root.metadata = md
-        data = root
-    # Metadata
-    elif isinstance(data, Metadata):
-        root = Root(name='root')
-        root.metadata = data
-        data = root
+        assert(not(_exists(filepath))), "A file already exists at this destination; use append or overwrite mode, or choose a new file path."
+
+    # all writes in this call share one open file
+    filemode = 'o' if mode in overwritemode else 'a'
+    appendover = mode in appendovermode
+
     # Lists and tuples
-    elif isinstance(data, (list,tuple)):
+    if isinstance(data, (list,tuple)):
         assert(all( [isinstance(x,(np.ndarray,dict,Node)) for x in data] )), \
             "can only save np.array, dictionary, or emd.Node objects"
 
@@ -172,384 +236,598 @@ def write(
                     root_new.metadata = m
                 dict_roots[rname] = root_new
 
-        # set mode to append
-        if mode in writemode:
-            mode = 'a'
-        elif mode in overwritemode:
-            if exists(filepath):
-                remove(filepath)
-            mode = 'a'
-        else:
-            pass
-
-        # write roots
-        for root in list_roots:
-            write(
-                filepath,
-                root,
-                tree = True,
-                mode = mode
-            )
-
-        # write nodes
-        for root in dict_roots.values():
-            write(
-                filepath,
-                root,
-                mode = mode
-            )
-        for item in list_rooted_nodes:
-            write(
-                filepath,
-                item,
-                emdpath = item.root.name,
-                tree = False,
-                mode = 'ao'
-            )
+        # write roots, then nodes
+        with Writer(filepath, mode=filemode) as w:
+            for root in list_roots:
+                w._save(
+                    root,
+                    tree = True,
+                    appendover = appendover
+                )
+            for root in dict_roots.values():
+                w._save(
+                    root,
+                    appendover = appendover
+                )
+            for item in list_rooted_nodes:
+                w._save(
+                    item,
+                    emdpath = item.root.name,
+                    tree = False,
+                    appendover = True
+                )
         return
 
-    # `data` should now be a Node!
-    assert(isinstance(data,Node)), f"invalid type {type(data)} found for `data`"
+    with Writer(filepath, mode=filemode) as w:
+        w._save(
+            data,
+            tree = tree,
+            emdpath = emdpath,
+            appendover = appendover
+        )
 
-    # get the root
-    root = data._root
-    if root is None:
-        added_a_root = True
-        root = Root(name=data.name+"_root")
-        root.add_to_tree(data)
+def _exists(filepath):
+    # in a dry run, files which would have been removed don't exist
+    return exists(filepath) and filepath not in _get_io_option('removed',())
+
+def _remove(filepath):
+    if _get_io_option('dry_run',False):
+        _get_io_option('removed').add(filepath)
     else:
-        added_a_root = False
-
-    # overwrite mode - delete existing file
-    if mode in overwritemode:
-        if exists(filepath):
-            remove(filepath)
-        mode = 'w'
-
-    # write a new file
-    if mode in writemode or (
-        mode in appendmode+appendovermode and not exists(filepath)):
-        # open the file
-        with h5py.File(filepath, 'w') as f:
-            # write header
-            _write_header(
-                file = f
+        remove(filepath)
+
+
+class Writer:
+    """
+    A write session, which keeps an EMD file open for many writes.
+
+    .. topic:: Usage
+
+            >>> with Writer(path) as w:
+            >>>     w.save(root)
+            >>>     w.append(node, emdpath='root/data')
+
+        ``.save`` and ``.append`` accept the same ``data``, ``tree``, and
+        ``emdpath`` arguments as ``emdfile.save``, and behave like it in
+        append-over and append mode, respectively: new nodes are added, and
+        nodes already in the file are overwritten by ``.save`` and skipped by
+        ``.append``.
+
+    The file is opened and validated once, and the names of its root groups
+    are kept for the whole session, so many small writes to the same file
+    don't each pay to reopen it.
+
+    Parameters
+    ----------
+    filepath : str or Path
+        the file path
+    mode : str
+        'w' writes a new file, and raises an exception if a file of this name
+        exists. 'o' deletes any file of this name and writes a new file. 'a'
+        (default) opens the file if it exists, or writes a new file otherwise.
+    storage : dict or None
+        the HDF5 dataset layout for Arrays written in this session; see
+        ``emdfile.save``
+    compact_metadata : bool or None
+        if True, Metadata is written in the compact layout; see
+        ``emdfile.save``
+    """
+    def __init__(
+        self,
+        filepath,
+        mode = 'a',
+        storage = None,
+        compact_metadata = None,
+        ):
+        assert(mode in ('w','o','a')), f"unrecognized mode {mode}; must be 'w', 'o' or 'a'"
+        self.filepath = filepath
+        # options left as None keep the values set by an enclosing call
+        options = {
+            'storage' : None if storage is None else _validate_storage(storage),
+            'compact_metadata' : compact_metadata,
+        }
+        self._options = {k:v for k,v in options.items() if v is not None}
+        with _set_io_options(**self._options):
+            self._open(filepath, mode)
+
+    def _open(self, filepath, mode):
+        """
+        Opens the file, writing a header if it's new, and finds its roots.
+        In a dry run, existing files are opened read-only and new files aren't
+        made.
+        """
+        dry_run = _get_io_option('dry_run',False)
+        if mode == 'w':
+            assert(not(_exists(filepath))), "A file already exists at this destination; use append or overwrite mode, or choose a new file path."
+        elif mode == 'o' and _exists(filepath):
+            _remove(filepath)
+        self._rootgroups = []
+        self._closed = False
+        if _exists(filepath):
+            try:
+                self._file = h5py.File(filepath, 'r' if dry_run else 'a')
+            except OSError as e:
+                if 'already open for read-only' in str(e):
+                    raise Exception(f"{filepath} is held open read-only by lazily read data; to save back to it, read it with `mode='r+'`, or release the lazily read data") from e
+                raise
+            valid = _is_EMD_file(self._file)
+            if not valid:
+                self._file.close()
+            assert(valid), f"{filepath} does not point to an EMD 1.0 file"
+            self._rootgroups = _get_EMD_rootgroups(self._file)
+        elif dry_run:
+            self._file = None
+        else:
+            self._file = h5py.File(filepath, 'w')
+            _write_header(self._file)
+
+    def save(
+        self,
+        data,
+        tree = True,
+        emdpath = None,
+        ):
+        """
+        Writes ``data`` to the file, overwriting nodes which are already
+        there, as ``emdfile.save`` does in append-over mode.
+        """
+        self._save(
+            data,
+            tree = tree,
+            emdpath = emdpath,
+            appendover = True
+        )
+
+    def append(
+        self,
+        data,
+        tree = True,
+        emdpath = None,
+        ):
+        """
+        Writes ``data`` to the file, skipping nodes which are already there,
+        as ``emdfile.save`` does in append mode.
+        """
+        self._save(
+            data,
+            tree = tree,
+            emdpath = emdpath,
+            appendover = False
+        )
+
+    def flush(self):
+        """
+        Flushes all data written so far to disk.
+        """
+        if self._file is not None and self._file.id.valid:
+            self._file.flush()
+
+    def close(self):
+        """
+        Closes the file.
+        """
+        if self._file is not None and self._file.id.valid:
+            self._file.close()
+        self._file = None
+        self._closed = True
+
+    # context manager
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _save(
+        self,
+        data,
+        tree = True,
+        emdpath = None,
+        appendover = False,
+        ):
+        assert(not self._closed), "this Writer has been closed"
+        assert(tree in (True,False,None)), f"invalid value {tree} passed for `tree`"
+        with _set_io_options(**self._options):
+            self._write(
+                data,
+                tree = tree,
+                emdpath = emdpath,
+                appendover = appendover
             )
-            # write the file
+
+    def _write(
+        self,
+        data,
+        tree,
+        emdpath,
+        appendover,
+        ):
+        """
+        Writes `data` into the open file. See ``write``.
+        """
+        # validate `data` inputs, and handle non-Node `data` inputs
+        # numpy array -> Array
+        if isinstance(data, np.ndarray):
+            root = Root(name='root')
+            data = Array(name='np.array',data=data)
+            root.add_to_tree(data)
+        # dictionaries -> Metadata
+        elif isinstance(data, dict):
+            root = Root(name='root')
+            md = Metadata(name='dictionary',data=data)
+            root.metadata = md
+            data = root
+        # Metadata
+        elif isinstance(data, Metadata):
+            root = Root(name='root')
+            root.metadata = data
+            data = root
+
+        # `data` should now be a Node!
+        assert(isinstance(data,Node)), f"invalid type {type(data)} found for `data`"
+
+        # get the root
+        root = data._root
+        if root is None:
+            added_a_root = True
+            root = Root(name=data.name+"_root")
+            root.add_to_tree(data)
+        else:
+            added_a_root = False
+
+        f = self._file
+        # if the root isn't in the file and emdpath is None, or the file is
+        # new, write a new tree
+        if not(root.name in self._rootgroups) and (
+            emdpath is None or len(self._rootgroups) == 0):
             _write_from_root(
                 file = f,
                 root = root,
                 data = data,
                 tree = tree
             )
+            self._rootgroups.append(root.name)
+        # in a dry run, roots added earlier in the session aren't in the file
+        elif self._is_pending(root.name) or (
+            emdpath is not None and
+            self._is_pending(emdpath.strip('/').split('/')[0])):
+            self._report_tree(
+                root = root,
+                data = data,
+                tree = tree,
+                emdpath = emdpath
+            )
+        # if the root doesn't already exist and emdpath is specified,
+        # append the data to the target node
+        elif not(root.name in self._rootgroups):
+            # parse emdpath
+            if emdpath[0] == '/':
+                emdpath = emdpath[1:]
+            l = emdpath.split('/')
+            rootname = l[0]
+            treepath = '/'.join(l[1:])
+            # get the rootgroup
+            assert(f is not None and rootname in f.keys()), f"No root called {rootname} found - check your `emdpath`"
+            rootgroup = f[rootname]
+            # validate the emdpath
+            # set target_grp to targeted EMD node
+            where = _validate_treepath(
+                rootgroup,
+                treepath
+            )
+            if where is False:
+                raise Exception(f"No node found at {emdpath} in the EMD tree called {rootname} - check your `emdpath`")
+            elif where[1] is False:
+                raise Exception(f"No node found at {emdpath} in the EMD tree called {rootname} - check your `emdpath`")
+            else:
+                target_grp = where[0]
 
-    # append to an existing file
-    else:
-        # validate that its an EMD file
-        # get the rootgroups
-        assert(_is_EMD_file(filepath)), "{filepath} does not point to an EMD 1.0 file"
-        emd_rootgroups = _get_EMD_rootgroups(filepath)
-        # open the file
-        with h5py.File(filepath, 'a') as f:
-            # if the root doesn't already exist and emdpath is None,
-            # do a simple write as above
-            if not(root.name in emd_rootgroups) and (emdpath is None):
-                _write_from_root(
-                    file = f,
-                    root = root,
-                    data = data,
-                    tree = tree
+            # append to the tree...
+            # ...if data is Root and tree is False
+            if isinstance(data,Root) and (tree is False):
+                raise Exception("Incompatible inputs: if appending from a Root to an existing tree, `tree` can't be False.  Try changing `data` or `tree`.")
+            # ...if data is Root and tree is True or None
+            elif isinstance(data,Root):
+                _write_tree(
+                    target_grp,
+                    data
+                )
+            # ...if data is a Node and tree is False
+            elif tree is False:
+                _write_single_node(
+                    target_grp,
+                    data
+                )
+            # ...if data is a Node and tree is True
+            elif tree is True:
+                target_grp = _write_single_node(
+                    target_grp,
+                    data
+                )
+                _write_tree(
+                    target_grp,
+                    data
                 )
-            # if the root doesn't already exist and emdpath is specified,
-            # append the data to the target node
-            elif not(root.name in emd_rootgroups):
-                # parse emdpath
-                if emdpath[0] == '/':
-                    emdpath = emdpath[1:]
-                l = emdpath.split('/')
-                rootname = l[0]
-                treepath = '/'.join(l[1:])
-                # get the rootgroup
-                assert(rootname in f.keys()), f"No root called {rootname} found - check your `emdpath`"
-                rootgroup = f[rootname]
-                # validate the emdpath
-                # set target_grp to targeted EMD node
+            # ...if data is a Node and tree is None
+            else:
+                _write_tree(
+                    target_grp,
+                    data
+                )
+
+        # if the root does exist and emdpath is None,
+        # peform diffmerge A
+        elif emdpath is None:
+            # get the rootgroup
+            rootgroup = f[root.name]
+            # compare/append root metadata
+            _append_root_metadata(
+                rootgroup = rootgroup,
+                root = root,
+                appendover = appendover
+            )
+            # choose behavior and write...
+            if data is root:
+                # ...if the data is the root
+                if tree is True:
+                    _append_branch(
+                        rootgroup,
+                        data,
+                        appendover
+                    )
+                else:
+                    pass
+            else:
                 where = _validate_treepath(
                     rootgroup,
-                    treepath
+                    data._treepath
                 )
+                # ...if the datapath is not in the H5 path
                 if where is False:
-                    raise Exception(f"No node found at {emdpath} in the EMD tree called {rootname} - check your `emdpath`")
-                elif where[1] is False:
-                    raise Exception(f"No node found at {emdpath} in the EMD tree called {rootname} - check your `emdpath`")
+                    raise Exception("The data passed can't be added to it's corresponding H5 tree - check that the data's `_treepath` is present in the existing EMD file")
                 else:
-                    target_grp = where[0]
-
-                # append to the tree...
-                # ...if data is Root and tree is False
-                if isinstance(data,Root) and (tree is False):
-                    raise Exception("Incompatible inputs: if appending from a Root to an existing tree, `tree` can't be False.  Try changing `data` or `tree`.")
-                # ...if data is Root and tree is True or None
-                elif isinstance(data,Root):
-                    _write_tree(
-                        target_grp,
-                        data
-                    )
-                # ...if data is a Node and tree is False
-                elif tree is False:
-                    _write_single_node(
-                        target_grp,
-                        data
-                    )
-                # ...if data is a Node and tree is True
-                elif tree is True:
-                    target_grp = _write_single_node(
-                        target_grp,
-                        data
-                    )
-                    _write_tree(
+                    where,inside = where
+                    # ...if the datapath is in the H5 path
+                    if inside is True:
+                        if tree is True:
+                            if appendover:
+                                next_node = _overwrite_single_node(
+                                    where,
+                                    data
+                                )
+                            else:
+                                next_node = where
+                            _append_branch(
+                                next_node,
+                                data,
+                                appendover
+                            )
+                        elif tree is False:
+                            if appendover:
+                                next_node = _overwrite_single_node(
+                                    where,
+                                    data
+                                )
+                            else:
+                                pass
+                        else:
+                            _append_branch(
+                                where,
+                                data,
+                                appendover
+                            )
+                    # ...if the datapath is one node beyond the H5 path
+                    else:
+                        if tree is True:
+                            new_node = _write_single_node(
+                                where,
+                                data
+                            )
+                            _write_tree(
+                                new_node,
+                                data
+                            )
+                        elif tree is False:
+                            _write_single_node(
+                                where,
+                                data
+                            )
+                            pass
+                        else:
+                            _write_tree(
+                                where,
+                                data
+                            )
+
+        # if the root does exist and emdpath is specified,
+        # peform diffmerge B
+        else:
+            # parse emdpath
+            if emdpath[0] == '/':
+                emdpath = emdpath[1:]
+            l = emdpath.split('/')
+            rootname = l[0]
+            treepath = '/'.join(l[1:])
+            # get the rootgroup
+            rootgroup = f[root.name]
+            # validate the emdpath
+            # set target_grp to targeted EMD node
+            where = _validate_treepath(
+                rootgroup,
+                treepath
+            )
+            if where is False:
+                raise Exception(f"No node found at {emdpath} in the EMD tree called {rootname} - check your `emdpath`")
+            elif where[1] is False:
+                raise Exception(f"No node found at {emdpath} in the EMD tree called {rootname} - check your `emdpath`")
+            else:
+                target_grp = where[0]
+            # compare/append root metadata
+            _append_root_metadata(
+                rootgroup = rootgroup,
+                root = root,
+                appendover = appendover
+            )
+
+            # choose behavior and write...
+            # ...if the data is the root
+            if data is root:
+                # Confirm that the target node is downstream of the root...
+                assert(rootgroup.__contains__(target_grp.name)), "Specified target node not found in the EMD file - check your emdpath."
+                # get the path from source to target, then
+                # move `data` to the target node point
+                path_to_target = target_grp.name.replace(rootgroup.name,'')[1:]
+                try:
+                    data = data.tree(path_to_target)
+                except AssertionError:
+                    raise Exception("Append failure - the target EMD node exists downstream of the source EMD node, however the target is not present in the corresponding runtime tree")
+                # write
+                if appendover and tree in (True,False):
+                    target_grp = _overwrite_single_node(
                         target_grp,
                         data
                     )
-                # ...if data is a Node and tree is None
-                else:
-                    _write_tree(
+                if tree in (True,None):
+                    _append_branch(
                         target_grp,
-                        data
+                        data,
+                        appendover
                     )
-
-            # if the root does exist and emdpath is None,
-            # peform diffmerge A
-            elif emdpath is None:
-                # choose how to handle conflicts
-                appendover = True if mode in appendovermode else False
-                # get the rootgroup
-                rootgroup = f[root.name]
-                # compare/append root metadata
-                _append_root_metadata(
-                    rootgroup = rootgroup,
-                    root = root,
-                    appendover = appendover
+            # ...if the data is a node...
+            else:
+                # validate the source node path
+                where = _validate_treepath(
+                    rootgroup,
+                    data._treepath
                 )
-                # choose behavior and write...
-                if data is root:
-                    # ...if the data is the root
-                    if tree is True:
-                        _append_branch(
-                            rootgroup,
-                            data,
-                            appendover
-                        )
-                    else:
-                        pass
+                # ...if the source node is not in the H5
+                if where is False:
+                    raise Exception("The data passed can't be appended to it's corresponding H5 tree - the source runtime node can't be matched to the existing tree")
                 else:
-                    where = _validate_treepath(
-                        rootgroup,
-                        data._treepath
-                    )
-                    # ...if the datapath is not in the H5 path
-                    if where is False:
-                        raise Exception("The data passed can't be added to it's corresponding H5 tree - check that the data's `_treepath` is present in the existing EMD file")
-                    else:
-                        where,inside = where
-                        # ...if the datapath is in the H5 path
-                        if inside is True:
-                            if tree is True:
-                                if appendover:
-                                    next_node = _overwrite_single_node(
-                                        where,
-                                        data
-                                    )
-                                else:
-                                    next_node = where
+                    source_grp,inside = where
+
+                    # ...if the source node is one node beyond the H5
+                    if inside is False:
+                        # ...if it is one node past the targetted node, write
+                        if source_grp.name == target_grp.name:
+                            if tree in (True,None):
                                 _append_branch(
-                                    next_node,
+                                    target_grp,
                                     data,
                                     appendover
                                 )
-                            elif tree is False:
-                                if appendover:
-                                    next_node = _overwrite_single_node(
-                                        where,
-                                        data
-                                    )
-                                else:
-                                    pass
                             else:
+                                _write_single_node(
+                                    target_grp,
+                                    data
+                                )
+                        # ...otherwise, raise an Exception
+                        else:
+                            raise Exception("The data passed can't be added to it's corresponding H5 tree - check that the data's `.tree()` path is present in the existing EMD file")
+
+                    # ...if the source node is in inside the H5
+                    else:
+                        # ...if the source node is the target node, write
+                        if source_grp.name == target_grp.name:
+                            if appendover and tree in (True,False):
+                                target_grp = _overwrite_single_node(
+                                    target_grp,
+                                    data
+                                )
+                            if tree in (True,None):
                                 _append_branch(
-                                    where,
+                                    target_grp,
                                     data,
                                     appendover
                                 )
-                        # ...if the datapath is one node beyond the H5 path
-                        else:
-                            if tree is True:
-                                new_node = _write_single_node(
-                                    where,
+                        # ...if the source node is one node downstream of the target, write
+                        elif basename(source_grp.name) in list(target_grp.keys()):
+                            target_grp = source_grp
+                            if appendover and tree in (True,False):
+                                target_grp = _overwrite_single_node(
+                                    target_grp,
                                     data
                                 )
-                                _write_tree(
-                                    new_node,
-                                    data
+                            if tree in (True,None):
+                                _append_branch(
+                                    target_grp,
+                                    data,
+                                    appendover
                                 )
-                            elif tree is False:
-                                _write_single_node(
-                                    where,
+                        # ...if the target node is downstream of the source node...
+                        elif source_grp.__contains__(target_grp.name):
+                            # get the path from source to target, then
+                            # move `data` to the target node point
+                            path_to_target = target_grp.name.replace(source_grp.name,'')[1:]
+                            try:
+                                data = data.tree(path_to_target)
+                            except AssertionError:
+                                raise Exception("Append failure - the target EMD node exists downstream of the source EMD node, however the target is not present in the corresponding runtime tree")
+                            # write
+                            if appendover and tree in (True,False):
+                                target_grp = _overwrite_single_node(
+                                    target_grp,
                                     data
                                 )
-                                pass
-                            else:
-                                _write_tree(
-                                    where,
-                                    data
+                            if tree in (True,None):
+                                _append_branch(
+                                    target_grp,
+                                    data,
+                                    appendover
                                 )
-
-            # if the root does exist and emdpath is specified,
-            # peform diffmerge B
-            else:
-                # choose how to handle conflicts
-                appendover = True if mode in appendovermode else False
-                # parse emdpath
-                if emdpath[0] == '/':
-                    emdpath = emdpath[1:]
-                l = emdpath.split('/')
-                rootname = l[0]
-                treepath = '/'.join(l[1:])
-                # get the rootgroup
-                rootgroup = f[root.name]
-                # validate the emdpath
-                # set target_grp to targeted EMD node
-                where = _validate_treepath(
-                    rootgroup,
-                    treepath
-                )
-                if where is False:
-                    raise Exception(f"No node found at {emdpath} in the EMD tree called {rootname} - check your `emdpath`")
-                elif where[1] is False:
-                    raise Exception(f"No node found at {emdpath} in the EMD tree called {rootname} - check your `emdpath`")
-                else:
-                    target_grp = where[0]
-                # compare/append root metadata
-                _append_root_metadata(
-                    rootgroup = rootgroup,
-                    root = root,
-                    appendover = appendover
-                )
-
-                # choose behavior and write...
-                # ...if the data is the root
-                if data is root:
-                    # Confirm that the target node is downstream of the root...
-                    assert(rootgroup.__contains__(target_grp.name)), "Specified target node not found in the EMD file - check your emdpath."
-                    # get the path from source to target, then
-                    # move `data` to the target node point
-                    path_to_target = target_grp.name.replace(rootgroup.name,'')[1:]
-                    try:
-                        data = data.tree(path_to_target)
-                    except AssertionError:
-                        raise Exception("Append failure - the target EMD node exists downstream of the source EMD node, however the target is not present in the corresponding runtime tree")
-                    # write
-                    if appendover and tree in (True,False):
-                        target_grp = _overwrite_single_node(
-                            target_grp,
-                            data
-                        )
-                    if tree in (True,None):
-                        _append_branch(
-                            target_grp,
-                            data,
-                            appendover
-                        )
-                # ...if the data is a node...
-                else:
-                    # validate the source node path
-                    where = _validate_treepath(
-                        rootgroup,
-                        data._treepath
-                    )
-                    # ...if the source node is not in the H5
-                    if where is False:
-                        raise Exception("The data passed can't be appended to it's corresponding H5 tree - the source runtime node can't be matched to the existing tree")
-                    else:
-                        source_grp,inside = where
-
-                        # ...if the source node is one node beyond the H5
-                        if inside is False:
-                            # ...if it is one node past the targetted node, write
-                            if source_grp.name == target_grp.name:
-                                if tree in (True,None):
-                                    _append_branch(
-                                        target_grp,
-                                        data,
-                                        appendover
-                                    )
-                                else:
-                                    _write_single_node(
-                                        target_grp,
-                                        data
-                                    )
-                            # ...otherwise, raise an Exception
-                            else:
-                                raise Exception("The data passed can't be added to it's corresponding H5 tree - check that the data's `.tree()` path is present in the existing EMD file")
-
-                        # ...if the source node is in inside the H5
+                        # ...otherwise raise an exception
                         else:
-                            # ...if the source node is the target node, write
-                            if source_grp.name == target_grp.name:
-                                if appendover and tree in (True,False):
-                                    target_grp = _overwrite_single_node(
-                                        target_grp,
-                                        data
-                                    )
-                                if tree in (True,None):
-                                    _append_branch(
-                                        target_grp,
-                                        data,
-                                        appendover
-                                    )
-                            # ...if the source node is one node downstream of the target, write
-                            elif basename(source_grp.name) in list(target_grp.keys()):
-                                target_grp = source_grp
-                                if appendover and tree in (True,False):
-                                    target_grp = _overwrite_single_node(
-                                        target_grp,
-                                        data
-                                    )
-                                if tree in (True,None):
-                                    _append_branch(
-                                        target_grp,
-                                        data,
-                                        appendover
-                                    )
-                            # ...if the target node is downstream of the source node...
-                            elif source_grp.__contains__(target_grp.name):
-                                # get the path from source to target, then
-                                # move `data` to the target node point
-                                path_to_target = target_grp.name.replace(source_grp.name,'')[1:]
-                                try:
-                                    data = data.tree(path_to_target)
-                                except AssertionError:
-                                    raise Exception("Append failure - the target EMD node exists downstream of the source EMD node, however the target is not present in the corresponding runtime tree")
-                                # write
-                                if appendover and tree in (True,False):
-                                    target_grp = _overwrite_single_node(
-                                        target_grp,
-                                        data
-                                    )
-                                if tree in (True,None):
-                                    _append_branch(
-                                        target_grp,
-                                        data,
-                                        appendover
-                                    )
-                            # ...otherwise raise an exception
-                            else:
-                                raise Exception("Append failure - target node may not be downstream of source node.  Check the emdpath and the runtime data tree.")
+                            raise Exception("Append failure - target node may not be downstream of source node.  Check the emdpath and the runtime data tree.")
 
-    # if a root was added, remove it
-    if added_a_root:
-        data._root = None
+        # if a root was added, remove it
+        if added_a_root:
+            data._root = None
 
-    # end
-    pass
+    def _is_pending(self, rootname):
+        """
+        True if the root called `rootname` would have been added earlier in
+        this session, in a dry run, and so isn't in the file
+        """
+        return rootname in self._rootgroups and (
+            self._file is None or not(rootname in self._file))
 
+    def _report_tree(
+        self,
+        root,
+        data,
+        tree,
+        emdpath = None,
+        ):
+        """
+        In a dry run, reports writing `data` under a root which would have
+        been added earlier in the session, or under the node at `emdpath`
+        """
+        # without an emdpath, `data` goes where it sits in its tree
+        if emdpath is None:
+            path = '/'+root.name
+            if data is root:
+                if tree is not False:
+                    _write_tree(path,data)
+            elif tree is None:
+                _write_tree(path+data._treepath,data)
+            else:
+                parent = path+data._treepath[:-len(data.name)-1]
+                grp = _write_single_node(parent,data)
+                if tree is True:
+                    _write_tree(grp,data)
+            return
+        # otherwise it goes under the target node
+        path = '/'+emdpath.strip('/')
+        rootname,_,treepath = emdpath.strip('/').partition('/')
+        if isinstance(data,Root) and tree is False:
+            raise Exception("Incompatible inputs: if appending from a Root to an existing tree, `tree` can't be False.  Try changing `data` or `tree`.")
+        # a root appended into its own tree is written from the target node
+        if data is root and rootname == root.name:
+            if treepath != '':
+                data = data.tree(treepath)
+            _write_tree(path,data)
+        elif isinstance(data,Root) or tree is None:
+            _write_tree(path,data)
+        else:
+            grp = _write_single_node(path,data)
+            if tree is True:
+                _write_tree(grp,data)
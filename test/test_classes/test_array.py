@@ -1,4 +1,5 @@
-from emdfile import Array,save,read
+from emdfile import Array,Root,DatasetProxy,save,read
+import h5py
 import numpy as np
 from os.path import join,exists
 from pathlib import Path
@@ -280,3 +281,108 @@ class TestArray():
         assert(np.array_equal( ar['b'].data, ar2['b'].data ))
         assert(np.array_equal( ar['c'].data, ar2['c'].data ))
 
+
+    def test_Array_storage(self,_tempfile):
+        # make array
+        d = np.zeros((4,5,16,16),dtype=np.uint16)
+        d[:,:,8,8] = 100
+        ar = Array(data=d,name='datacube')
+        ar.set_storage(compression='gzip',shuffle=True)
+        # save, check the layout
+        save(_tempfile,ar,mode='o')
+        with h5py.File(_tempfile,'r') as f:
+            dset = f['datacube_root/datacube/data']
+            assert(dset.chunks == (1,1,16,16))
+            assert(dset.compression == 'gzip')
+            assert(dset.shuffle)
+        # read, check
+        ar2 = read(_tempfile)
+        assert(np.array_equal(ar.data,ar2.data))
+        assert(ar2.storage['compression'] == 'gzip')
+        # lazy reads of chunked data return a proxy
+        ar3 = read(_tempfile,lazy=True)
+        assert(isinstance(ar3.data,DatasetProxy))
+        assert(np.array_equal(ar3[1,2],d[1,2]))
+
+    def test_Array_storage_per_call(self,_tempfile):
+        # make arrays
+        ar = Array(data=np.ones((3,6,8,8)),name='a')
+        ar.set_storage(chunks='real')
+        ar2 = Array(data=np.ones((3,6,8,8)),name='b')
+        # save with a per-call default
+        save(_tempfile,[ar,ar2],mode='o',storage={'compression':'lzf'})
+        with h5py.File(_tempfile,'r') as f:
+            dset = f['root_savedlist/a/data']
+            assert(dset.chunks == (3,6,1,1))
+            assert(dset.compression == 'lzf')
+            dset = f['root_savedlist/b/data']
+            assert(dset.chunks == (1,1,8,8))
+            assert(dset.compression == 'lzf')
+        # invalid options raise errors
+        with pytest.raises(AssertionError):
+            save(_tempfile,ar,mode='o',storage={'compresion':'lzf'})
+
+    def test_Array_update_in_place(self,_tempfile):
+        # make a tree
+        root = Root(name='root')
+        ar = Array(data=np.arange(24.).reshape(4,6),name='ar',dims=[1,[0,2]])
+        root.tree(ar)
+        ar.tree(Array(data=np.ones(3),name='child'))
+        ar.tree(Array(data=np.zeros(2),name='dim3'))
+        save(_tempfile,root)
+        with h5py.File(_tempfile,'a') as f:
+            f['root/ar/data'].attrs['marker'] = 1
+            f['root/ar/dim3'].attrs['marker'] = 1
+        # change data, dims, and units, and append over
+        ar.data[1,2] = -1
+        ar.set_dim(1,[0,5],units='nm')
+        ar.units = 'counts'
+        save(_tempfile,root,mode='ao')
+        with h5py.File(_tempfile,'r') as f:
+            assert('marker' in f['root/ar/data'].attrs)
+            # child nodes named like dim vectors are kept
+            assert('marker' in f['root/ar/dim3'].attrs)
+        ar2 = read(_tempfile,emdpath='root/ar')
+        assert(ar2.data[1,2] == -1)
+        assert(np.array_equal(ar2.dims[1],ar.dims[1]))
+        assert(ar2.dim_units[1] == 'nm')
+        assert(ar2.units == 'counts')
+        assert(np.array_equal(ar2.tree('child').data,np.ones(3)))
+        assert(np.array_equal(ar2.tree('dim3').data,np.zeros(2)))
+        # a layout change rewrites the group
+        ar.set_storage(compression='gzip')
+        save(_tempfile,root,mode='ao')
+        with h5py.File(_tempfile,'r') as f:
+            assert('marker' not in f['root/ar/data'].attrs)
+            assert(f['root/ar/data'].compression == 'gzip')
+        ar3 = read(_tempfile,emdpath='root/ar')
+        assert(np.array_equal(ar3.data,ar.data))
+        assert(np.array_equal(ar3.tree('child').data,np.ones(3)))
+
+    def test_Array_region(self,array,arraystack,_tempfile):
+        # save, then read a region
+        save(_tempfile,array,mode='o')
+        ar = read(
+            _tempfile,
+            emdpath = 'test_array_root/test_array',
+            region = (slice(1,3),1,...,slice(2,None,2)),
+        )
+        assert(np.array_equal(ar.data, array.data[1:3,1:2,:,:,2::2]))
+        assert(np.array_equal(ar.dim(0), array.dim(0)[1:3]))
+        assert(np.array_equal(ar.dim(1), array.dim(1)[1:2]))
+        assert(np.array_equal(ar.dim(2), array.dim(2)))
+        assert(np.array_equal(ar.dim(4), array.dim(4)[2::2]))
+        assert(ar.dim_units == array.dim_units)
+        # stack arrays
+        save(_tempfile,arraystack,mode='o')
+        ar = read(
+            _tempfile,
+            emdpath = 'test_stackarray_root/test_stackarray',
+            region = (slice(1,3),slice(10,20)),
+        )
+        assert(ar.slicelabels == ['B','C'])
+        assert(np.array_equal(ar['C'].data, arraystack['C'].data[10:20]))
+        assert(np.array_equal(ar.dim(0), arraystack.dim(0)[10:20]))
+        # regions of non-array nodes raise errors
+        with pytest.raises(AssertionError):
+            read(_tempfile,emdpath='test_stackarray_root',region=(slice(0,1),))
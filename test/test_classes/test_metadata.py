@@ -1,5 +1,6 @@
-from emdfile import Metadata, Node, save, read
+from emdfile import Metadata, Node, Root, Array, save, read
 import numpy as np
+import h5py
 from pathlib import Path
 import tempfile
 import pytest
@@ -82,3 +83,120 @@ class TestMetadata:
         assert(n['y'] == [])
 
 
+
+    def test_compact(self,metadata1,metadata2,_tempfile):
+        """Test compact mode metadata"""
+        m = metadata1
+        m['s'] = ['a','bc','']
+        m['t'] = ('x','yz')
+        m['u'] = [np.arange(6).reshape(2,3),np.ones(4)*0.5]
+        m['w'] = np.int64(7)
+        node = Node()
+        node.metadata = m
+        node.metadata = metadata2
+        save(_tempfile,node,compact_metadata=True)
+        # items are packed
+        with h5py.File(_tempfile,'r') as f:
+            grp = f['node_root/node/metadatabundle/test_metadata']
+            assert(sorted(grp.keys()) == ['_emd_compact_items','a','b','c','s','t','u'])
+        _node = read(_tempfile)
+        _m = _node.metadata['test_metadata']
+        for k in ('x','y','z','a','s','t','w'):
+            assert(m[k] == _m[k])
+            assert(type(m[k]) == type(_m[k]) or k == 'w')
+        for x,y in zip(m['u'],_m['u']):
+            assert(np.array_equal(x,y))
+        assert(isinstance(_m['u'],list))
+        assert(np.array_equal(m['c'][1],_m['c'][1]))
+        _n = _node.metadata['test_nested_metadata']
+        for k in ('x','y','z'):
+            assert(metadata2[k] == _n[k])
+
+    @pytest.mark.parametrize("compact",[False,True])
+    def test_lazy(self,metadata1,metadata2,_tempfile,compact):
+        """Test lazily read metadata"""
+        m = metadata1
+        m['s'] = ['a','bc']
+        node = Node()
+        node.metadata = m
+        node.metadata = metadata2
+        save(_tempfile,node,compact_metadata=compact)
+        _node = read(_tempfile,lazy=True)
+        _m = _node.metadata['test_metadata']
+        # values are not read until accessed
+        assert(set(_m.keys) == set(m.keys))
+        assert(type(dict.__getitem__(_m._params,'b')).__name__ == '_LazyItem')
+        assert(np.array_equal(_m['b'],m['b']))
+        assert(isinstance(dict.__getitem__(_m._params,'b'),np.ndarray))
+        assert(_m['s'] == m['s'])
+        # copies and dict updates read values
+        _c = _m.copy()
+        assert(type(_c._params) is dict)
+        assert(np.array_equal(_c['c'][1],m['c'][1]))
+        d = {}
+        d.update(_node.metadata['test_nested_metadata']._params)
+        assert(d['y'] == metadata2['y'])
+        # lazily read metadata can be saved
+        save(_tempfile,_node,mode='o')
+        assert(read(_tempfile).metadata['test_metadata']['a'] == m['a'])
+
+    def test_unknown_subclass(self,metadata1,_tempfile):
+        """Metadata of an unknown subclass is read as Metadata"""
+        node = Node()
+        node.metadata = metadata1
+        save(_tempfile,node)
+        with h5py.File(_tempfile,'a') as f:
+            f['node_root/node/metadatabundle/test_metadata'].attrs['python_class'] = 'NotAClass'
+        _node = read(_tempfile)
+        assert(type(_node.metadata['test_metadata']) is Metadata)
+        assert(_node.metadata['test_metadata']['x'] == 10)
+
+    @pytest.mark.parametrize("compact",[False,True])
+    def test_appendover_update(self,metadata1,metadata2,_tempfile,compact):
+        """Append-over rewrites only changed metadata items"""
+        root = Root(name='root')
+        root.metadata = metadata2
+        ar = Array(data=np.arange(4),name='ar')
+        ar.metadata = metadata1
+        root.tree(ar)
+        save(_tempfile,root,compact_metadata=compact)
+        # mark the stored datasets
+        paths = ['root/ar/metadatabundle/test_metadata/b',
+                 'root/ar/metadatabundle/test_metadata/c/0',
+                 'root/metadatabundle/test_nested_metadata/y']
+        with h5py.File(_tempfile,'a') as f:
+            for p in paths:
+                f[p].attrs['marker'] = 1
+        # change one item of each, remove one, and append-over
+        metadata1['b'][0,0] = 7
+        metadata1['a'] = (4,5,6)
+        del metadata1._params['z']
+        metadata2['y']['arg'] = 2
+        save(_tempfile,root,mode='ao',compact_metadata=compact)
+        with h5py.File(_tempfile,'r') as f:
+            assert('marker' not in f[paths[0]].attrs)
+            assert('marker' in f[paths[1]].attrs)
+            assert('marker' in f[paths[2]].attrs)
+        _root = read(_tempfile).root
+        _m = _root.tree('ar').metadata['test_metadata']
+        assert(_m['a'] == (4,5,6))
+        assert(_m['b'][0,0] == 7)
+        assert('z' not in _m.keys)
+        assert(_m['x'] == 10)
+        assert(_root.metadata['test_nested_metadata']['y']['arg'] == 2)
+        assert(_root.metadata['test_nested_metadata']['y']['barg'] == (1,2,3))
+
+    @pytest.mark.parametrize("compact",[False,True])
+    def test_appendover_type_change(self,_tempfile,compact):
+        """Append-over rewrites items whose type changes but value doesn't"""
+        root = Root(name='root')
+        root.metadata = Metadata(name='md',data={'a':True,'b':1,'c':'s'})
+        root.tree(Array(data=np.arange(4),name='ar'))
+        save(_tempfile,root,compact_metadata=compact)
+        root.metadata['md']['a'] = 1
+        root.metadata['md']['b'] = 1.0
+        save(_tempfile,root,mode='ao',compact_metadata=compact)
+        _md = read(_tempfile).root.metadata['md']
+        assert(type(_md['a']) is int and _md['a'] == 1)
+        assert(type(_md['b']) is float and _md['b'] == 1.0)
+        assert(_md['c'] == 's')
@@ -80,3 +80,23 @@ class TestPointList():
         pl += new_pointlist
         assert(len(pl) == 16)
 
+
+    def test_PointList_append_buffer(self,pointlist):
+        # appends fill a buffer with doubling capacity
+        dtype = pointlist.dtype
+        data = pointlist.data
+        for i in range(100):
+            pointlist.add_data_by_field(
+                [np.array(i),np.array(-i)])
+        assert(len(pointlist) == 105)
+        assert(np.array_equal(pointlist['x'][5:],np.arange(100)))
+        assert(len(pointlist._buffer) < 2*2*105)
+        # the original array is untouched
+        assert(len(data) == 5)
+        # compact releases spare capacity
+        pointlist.compact()
+        assert(pointlist._buffer is None)
+        assert(pointlist.data.base is None)
+        assert(len(pointlist) == 105)
+        pointlist += np.ones(2,dtype=dtype)
+        assert(len(pointlist) == 107)
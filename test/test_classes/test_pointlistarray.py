@@ -1,5 +1,8 @@
-from emdfile import PointListArray
+from emdfile import PointListArray, PointList, save, read, read_pla_counts
 import numpy as np
+import h5py
+from pathlib import Path
+import tempfile
 import pytest
 
 class TestPointListArray():
@@ -14,7 +17,208 @@ class TestPointListArray():
         )
         return pla
 
+    @pytest.fixture
+    def _tempfile(self):
+        """Create an empty temporary file and return as a Path."""
+        tf = tempfile.NamedTemporaryFile(mode='wb')
+        tf.close()  # need to close the file to use it later
+        return Path(tf.name)
+
+    def fill(self,pla):
+        """Adds x+y points to cell x,y"""
+        for x in range(pla.shape[0]):
+            for y in range(pla.shape[1]):
+                data = np.zeros(x+y,pla.dtype)
+                data['x'] = x
+                data['y'] = np.arange(x+y)
+                pla[x,y].add(data)
+        return pla
+
     def test_pointlistarray(self,pla):
         assert(isinstance(pla,PointListArray))
         pass
 
+    def test_pointlistarray_cells(self,pla):
+        """cells are persistent PointLists viewing a single array"""
+        self.fill(pla)
+        assert(pla[2,3] is pla[2,3])
+        assert(pla[2,3].length == 5)
+        assert(pla[-1,-1].length == 8)
+        # assignment
+        data = np.ones(3,pla.dtype)
+        pla[0,1] = PointList(data)
+        pla[0,2] += data
+        assert(pla[0,1].length == 3)
+        assert(pla[0,2].length == 5)
+        # consolidation keeps the PointLists handed out, and points them
+        # into the merged array
+        pl = pla[3,1]
+        pla._consolidate()
+        assert(pla[3,1] is pl)
+        assert(len(pla._data) == sum([x+y for x in range(5) for y in range(5)])-1+3+3)
+        assert(np.shares_memory(pl.data,pla._data))
+        pl.data['y'] = -1
+        assert(np.all(pla._data['y'][pla._offsets[16]:pla._offsets[17]] == -1))
+        # remove and sort
+        pla[4,4].remove(pla[4,4].data['y'] > 2)
+        pla[4,3].sort('y','descending')
+        pla._consolidate()
+        assert(np.array_equal(pla[4,4].data['y'],[0,1,2]))
+        assert(pla[4,3].data['y'][0] == 6)
+        with pytest.raises(AssertionError):
+            pla[5,0]
+
+    def test_pointlistarray_copy(self,pla):
+        """copies and copies with new fields"""
+        self.fill(pla)
+        new = pla.copy()
+        assert(new[3,4].length == 7)
+        assert(not np.shares_memory(new._data,pla._data))
+        new = pla.add_fields([('z',float)])
+        assert(new.fields == ('x','y','z'))
+        assert(np.array_equal(new[2,2].data['y'],pla[2,2].data['y']))
+        assert(np.all(new[2,2].data['z'] == 0))
+
+    def test_pointlistarray_io(self,pla,_tempfile):
+        """write and read"""
+        self.fill(pla)
+        save(_tempfile,pla)
+        new = read(_tempfile)
+        for x in range(pla.shape[0]):
+            for y in range(pla.shape[1]):
+                assert(np.array_equal(new[x,y].data,pla[x,y].data))
+
+    def test_pointlistarray_flat_io(self,pla,_tempfile):
+        """write and read the flat layout"""
+        pla.layout = 'flat'
+        self.fill(pla)
+        save(_tempfile,pla)
+        new = read(_tempfile)
+        assert(new.layout == 'flat')
+        assert(new.shape == pla.shape)
+        for x in range(pla.shape[0]):
+            for y in range(pla.shape[1]):
+                assert(np.array_equal(new[x,y].data,pla[x,y].data))
+        # empty
+        empty = PointListArray(dtype=pla.dtype,shape=(3,2),layout='flat')
+        save(_tempfile,empty,mode='o')
+        new = read(_tempfile)
+        assert(new.shape == (3,2))
+        assert(new[2,1].length == 0)
+
+    @pytest.mark.parametrize("layout",['vlen','flat'])
+    def test_pointlistarray_lazy(self,pla,_tempfile,layout):
+        """lazy reads, the cell cache, and loading"""
+        pla.layout = layout
+        self.fill(pla)
+        save(_tempfile,pla)
+        new = read(_tempfile,lazy=True)
+        assert(new.is_lazy)
+        assert(len(new._data) == 0)
+        assert(np.array_equal(new[2,3].data,pla[2,3].data))
+        assert(new[2,3] is new[2,3])
+        # cells are read only
+        with pytest.raises(ValueError):
+            new[2,3].data['x'] = 0
+        # a block of cells is read at once
+        new.prefetch(slice(1,3),slice(0,5))
+        assert(all([k in new._cache for k in range(5,15)]))
+        assert(np.array_equal(new[1,4].data,pla[1,4].data))
+        # the cache is bounded; changed cells are kept
+        new.cache_size = 3*2048
+        new[0,4].add(np.ones(2,pla.dtype))
+        new[4,4] = PointList(np.ones(1,pla.dtype))
+        for x in range(5):
+            new[x,0]
+        assert(len(new._cache) <= 3)
+        assert(new[0,4].length == 6)
+        assert(new[4,4].length == 1)
+        # loading reads everything, keeping changes
+        new.load()
+        assert(not new.is_lazy)
+        assert(new[0,4].length == 6)
+        assert(new[4,4].length == 1)
+        assert(np.array_equal(new[3,3].data,pla[3,3].data))
+        new[3,3].data['x'] = 0
+        assert(np.all(new.copy()[3,3].data['x'] == 0))
+
+    def test_pointlistarray_vectorized(self,pla):
+        """operations on all cells at once"""
+        self.fill(pla)
+        counts = pla.counts
+        assert(counts.shape == (5,5))
+        assert(np.array_equal(counts,np.add.outer(np.arange(5),np.arange(5))))
+        # histogram
+        hist,edges = pla.histogram('x',bins=5,range=(0,5))
+        assert(np.array_equal(hist,[np.sum(counts[x]) for x in range(5)]))
+        # apply
+        pl = pla[3,2]
+        pla.apply('y',np.add,10)
+        assert(np.array_equal(pl.data['y'],np.arange(5)+10))
+        # filter, keeping handed out PointLists live
+        pla.filter(lambda d: d['y'] < 12)
+        assert(np.array_equal(pla.counts,np.minimum(counts,2)))
+        assert(pla[3,2] is pl)
+        assert(np.array_equal(pl.data['y'],[10,11]))
+        pla.filter(np.zeros(len(pla._data),dtype=bool))
+        assert(np.all(pla.counts == 0))
+
+    def test_pointlistarray_flat(self,pla):
+        """bulk population from and to flat arrays"""
+        rng = np.random.default_rng(0)
+        data = np.zeros(200,dtype=[('x',np.int32),('y',np.float32),('rx',int),('ry',int)])
+        data['rx'] = rng.integers(0,5,200)
+        data['ry'] = rng.integers(0,4,200)
+        data['y'] = np.arange(200)
+        new = PointListArray.from_flat(data,'rx','ry',shape=(5,4))
+        for x in range(5):
+            for y in range(4):
+                cell = data[(data['rx']==x) & (data['ry']==y)]
+                assert(np.array_equal(new[x,y].data,cell))
+        flat,rx,ry = new.to_flat()
+        assert(np.array_equal(rx,flat['rx']))
+        assert(np.array_equal(ry,flat['ry']))
+        # set data on an existing PointListArray
+        pl = pla[1,1]
+        d = np.ones(3,pla.dtype)
+        pla.set_flat(d,[1,1,0],[1,1,3])
+        assert(pla[1,1] is pl)
+        assert(pl.length == 2)
+        assert(np.array_equal(pla.counts.ravel().nonzero()[0],[3,6]))
+
+    @pytest.mark.parametrize("layout",['vlen','flat'])
+    def test_pointlistarray_region(self,pla,_tempfile,layout):
+        """read a block of cells"""
+        pla.layout = layout
+        self.fill(pla)
+        save(_tempfile,pla)
+        for region in (
+            (slice(1,4),slice(2,4)),
+            (slice(0,5),slice(None)),
+            (slice(0,5,2),3),
+            (slice(2,2),slice(None)),
+        ):
+            new = read(_tempfile,emdpath='pointlistarray_root/pointlistarray',
+                tree=False,region=region)
+            xs = range(5)[region[0]]
+            ys = range(5)[region[1]] if isinstance(region[1],slice) else [region[1]]
+            assert(new.shape == (len(xs),len(ys)))
+            for a,x in enumerate(xs):
+                for b,y in enumerate(ys):
+                    assert(np.array_equal(new[a,b].data,pla[x,y].data))
+
+    @pytest.mark.parametrize("layout",['vlen','flat'])
+    def test_pointlistarray_counts_io(self,pla,_tempfile,layout):
+        """read the number of points per cell without reading the data"""
+        pla.layout = layout
+        self.fill(pla)
+        save(_tempfile,pla)
+        emdpath = 'pointlistarray_root/pointlistarray'
+        counts = read_pla_counts(_tempfile,emdpath)
+        assert(np.array_equal(counts,pla.counts))
+        # files without a counts dataset
+        if layout == 'vlen':
+            with h5py.File(_tempfile,'a') as f:
+                del f[emdpath+'/counts']
+            assert(np.array_equal(read_pla_counts(_tempfile,emdpath),pla.counts))
+            assert(np.array_equal(read(_tempfile).counts,pla.counts))
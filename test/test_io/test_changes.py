@@ -0,0 +1,133 @@
+from emdfile import Array, PointList, PointListArray, Metadata, Root, save, read
+import numpy as np
+import h5py
+from pathlib import Path
+import tempfile
+import pytest
+import gc
+
+
+class TestChangeTracking:
+
+    @pytest.fixture
+    def _tempfile(self):
+        """Create an empty temporary file and return as a Path."""
+        tf = tempfile.NamedTemporaryFile(mode='wb')
+        tf.close()  # need to close the file to use it later
+        return Path(tf.name)
+
+    @pytest.fixture
+    def root(self):
+        """Make a tree"""
+        root = Root(name='root')
+        ar = Array(data=np.arange(12).reshape(3,4),name='ar')
+        ar.metadata = Metadata(name='md',data={'a':1,'b':'x'})
+        ar2 = Array(data=np.ones((2,2)),name='ar2')
+        dtype = [('x',float),('y',float)]
+        pl = PointList(data=np.zeros(5,dtype=dtype),name='pl')
+        pla = PointListArray(dtype=dtype,shape=(2,3),name='pla')
+        pla[1,2].add(np.ones(3,dtype=dtype))
+        root.tree(ar)
+        ar.tree(ar2)
+        root.tree(pl)
+        root.tree(pla)
+        return root
+
+    @staticmethod
+    def mark(path):
+        """Set a marker attribute on every node group in the file"""
+        with h5py.File(path,'a') as f:
+            for k in ('ar','ar/ar2','pl','pla'):
+                f['root/'+k].attrs['marker'] = 1
+
+    @staticmethod
+    def marked(path):
+        with h5py.File(path,'r') as f:
+            return {k:'marker' in f['root/'+k].attrs for k in ('ar','ar/ar2','pl','pla')}
+
+    def test_unchanged_nodes_are_skipped(self,root,_tempfile):
+        save(_tempfile,root)
+        self.mark(_tempfile)
+        _root = read(_tempfile,track_changes=True)
+        # change data in place, and change metadata
+        _root.tree('ar/ar2').data[0,0] = 99
+        _root.tree('ar').metadata['md']['a'] = 2
+        # dry run
+        report = save(_tempfile,_root,mode='ao',dry_run=True)
+        assert(dict(report) == {
+            '/root/ar' : 'metadata',
+            '/root/ar/ar2' : 'overwrite',
+            '/root/pl' : 'skip',
+            '/root/pla' : 'skip',
+        })
+        assert(all(self.marked(_tempfile).values()))
+        # write
+        save(_tempfile,_root,mode='ao')
+        marked = self.marked(_tempfile)
+        # ar2 changed, but still fits its stored layout, so it's updated in
+        # place
+        assert(marked == {
+            'ar':True,'ar/ar2':True,'pl':True,'pla':True})
+        _root2 = read(_tempfile)
+        assert(_root2.tree('ar/ar2').data[0,0] == 99)
+        assert(_root2.tree('ar').metadata['md']['a'] == 2)
+        assert(np.array_equal(_root2.tree('ar').data,root.tree('ar').data))
+        assert(len(_root2.tree('pla')[1,2]) == 3)
+        # nodes are tracked after they're written
+        report = save(_tempfile,_root,mode='ao',dry_run=True)
+        assert(set([a for p,a in report]) == {'skip'})
+
+    def test_untracked_and_lazy(self,root,_tempfile):
+        save(_tempfile,root)
+        # untracked nodes are always rewritten
+        report = save(_tempfile,read(_tempfile),mode='ao',dry_run=True)
+        assert(set([a for p,a in report]) == {'overwrite'})
+        # lazily read data isn't checksummed
+        _root = read(_tempfile,lazy=True,track_changes=True)
+        report = save(_tempfile,_root,mode='ao',dry_run=True)
+        assert(set([a for p,a in report]) == {'skip'})
+        _root.tree('pla')[0,0] = PointList(data=np.ones(1,dtype=root.tree('pla').dtype))
+        report = save(_tempfile,_root,mode='ao',dry_run=True)
+        assert(dict(report)['/root/pla'] == 'overwrite')
+        del _root
+
+    @pytest.mark.parametrize("lazy",[{'lazy':True},{'lazy_tree':True},
+        {'lazy':True,'lazy_tree':True}])
+    def test_save_after_lazy_read(self,root,_tempfile,lazy):
+        """a lazily read tree can be saved back while it holds the file open"""
+        save(_tempfile,root)
+        self.mark(_tempfile)
+        # read-only by default
+        _root = read(_tempfile,track_changes=True,**lazy)
+        with pytest.raises(Exception,match="mode='r\\+'"):
+            save(_tempfile,_root,mode='ao')
+        del _root
+        gc.collect()
+        _root = read(_tempfile,track_changes=True,mode='r+',**lazy)
+        _root.tree('ar').metadata['md']['a'] = 2
+        save(_tempfile,_root,mode='ao')
+        assert(all(self.marked(_tempfile).values()))
+        assert(np.array_equal(_root.tree('ar').data,root.tree('ar').data))
+        del _root
+        gc.collect()
+        _root2 = read(_tempfile)
+        assert(_root2.tree('ar').metadata['md']['a'] == 2)
+        assert(_root2.tree('ar').metadata['md']['b'] == 'x')
+        assert(len(_root2.tree('pla')[1,2]) == 3)
+
+    def test_checksum_collision(self,_tempfile):
+        """edits are detected when a crc32 of the data wouldn't change"""
+        root = Root(name='root')
+        root.tree(Array(data=np.frombuffer(b'plumless',dtype=np.uint8),name='ar'))
+        save(_tempfile,root)
+        _root = read(_tempfile,track_changes=True).root
+        _root.tree('ar').data[:] = np.frombuffer(b'buckeroo',dtype=np.uint8)
+        report = save(_tempfile,_root,mode='ao',dry_run=True)
+        assert(dict(report)['/root/ar'] == 'overwrite')
+
+    def test_dry_run_new_file(self,root,_tempfile):
+        report = save(_tempfile,root,dry_run=True)
+        assert([p for p,a in report] == [
+            '/root','/root/ar','/root/ar/ar2','/root/pl','/root/pla'])
+        assert(set([a for p,a in report]) == {'write'})
+        assert(not _tempfile.exists())
@@ -0,0 +1,58 @@
+from emdfile import Array, Root, save, read
+from emdfile.utils import _is_EMD_file, _get_EMD_rootgroups, _get_EMD_version
+import numpy as np
+import h5py
+from pathlib import Path
+import tempfile
+import pytest
+
+
+class TestReadHandle:
+
+    @pytest.fixture
+    def _tempfile(self):
+        """Create an empty temporary file and return as a Path."""
+        tf = tempfile.NamedTemporaryFile(mode='wb')
+        tf.close()  # need to close the file to use it later
+        return Path(tf.name)
+
+    @pytest.fixture
+    def root(self):
+        """Make a tree"""
+        root = Root(name='handle_root')
+        ar = Array(data=np.arange(12).reshape(3,4),name='ar')
+        ar2 = Array(data=np.ones((2,2)),name='ar2')
+        root.tree(ar)
+        ar.tree(ar2)
+        return root
+
+    def test_utils_handle(self,root,_tempfile):
+        """header checks accept an open h5py File"""
+        save(_tempfile,root)
+        with h5py.File(_tempfile,'r') as f:
+            assert(_is_EMD_file(f))
+            assert(_get_EMD_rootgroups(f) == ['handle_root'])
+            assert(_get_EMD_version(f)[0] == 1)
+            # the file is left open
+            assert(f.id.valid)
+
+    def test_read_file_handle(self,root,_tempfile):
+        """read from an open h5py File, which is left open"""
+        save(_tempfile,root)
+        with h5py.File(_tempfile,'r') as f:
+            ar = read(f)
+            assert(f.id.valid)
+            assert(np.array_equal(ar.data,root.tree('ar').data))
+            assert(np.array_equal(ar.tree('ar2').data,np.ones((2,2))))
+            ar2 = read(f,emdpath='handle_root/ar/ar2',tree=False)
+            assert(np.array_equal(ar2.data,np.ones((2,2))))
+
+    def test_read_group_handle(self,root,_tempfile):
+        """read from an open h5py Group"""
+        save(_tempfile,root)
+        with h5py.File(_tempfile,'r') as f:
+            ar = read(f['handle_root/ar'])
+            assert(np.array_equal(ar.data,root.tree('ar').data))
+            assert(np.array_equal(ar.tree('ar2').data,np.ones((2,2))))
+            ar2 = read(f['handle_root'],emdpath='ar/ar2',tree=False)
+            assert(np.array_equal(ar2.data,np.ones((2,2))))
@@ -0,0 +1,102 @@
+from emdfile import Array, Root, DatasetProxy, save, read
+from emdfile.classes.node import _NodeStub
+import numpy as np
+import h5py
+import gc
+from pathlib import Path
+import tempfile
+import pytest
+
+
+class TestLazy:
+
+    @pytest.fixture
+    def _tempfile(self):
+        """Create an empty temporary file and return as a Path."""
+        tf = tempfile.NamedTemporaryFile(mode='wb')
+        tf.close()  # need to close the file to use it later
+        return Path(tf.name)
+
+    @pytest.fixture
+    def array(self):
+        """Make an Array"""
+        s = (4,5,6,7)
+        ar = Array(
+            data = np.arange(np.prod(s)).reshape(s),
+            name = 'lazy_array',
+            dims = [2,[0,3]],
+            dim_units = ['nm','nm'],
+        )
+        return ar
+
+    def test_lazy_memmap(self,array,_tempfile):
+        """contiguous datasets are memory mapped"""
+        save(_tempfile,array)
+        ar = read(_tempfile,lazy=True)
+        assert(isinstance(ar.data,np.memmap))
+        assert(np.array_equal(ar[1,2], array[1,2]))
+        assert(np.array_equal(ar.dim(1), array.dim(1)))
+        assert(ar.dim_units[0] == 'nm')
+
+    def test_dataset_proxy(self,array,_tempfile):
+        """chunked datasets are read lazily through a DatasetProxy"""
+        with h5py.File(_tempfile,'w') as f:
+            f.create_dataset('data',data=array.data,chunks=(1,1,6,7))
+        f = h5py.File(_tempfile,'r')
+        proxy = DatasetProxy(f['data'])
+        del f
+        gc.collect()
+        assert(proxy.shape == array.data.shape)
+        assert(proxy.dtype == array.data.dtype)
+        assert(np.array_equal(proxy[1,2:4,::2], array.data[1,2:4,::2]))
+        assert(np.array_equal(np.asarray(proxy), array.data))
+        # the file stays open while the proxy is alive
+        with pytest.raises(OSError):
+            h5py.File(_tempfile,'w')
+        del proxy
+        gc.collect()
+        with h5py.File(_tempfile,'w') as f:
+            pass
+
+    def test_lazy_read_closes_file(self,array,_tempfile):
+        """the file is released when the lazy node is released"""
+        save(_tempfile,array)
+        ar = read(_tempfile,lazy=True)
+        _ar = Array(data=ar.data,name='copy')
+        assert(np.array_equal(_ar.data,array.data))
+        del ar,_ar
+        gc.collect()
+        save(_tempfile,array,mode='o')
+        assert(np.array_equal(read(_tempfile).data,array.data))
+
+    def test_lazy_tree(self,array,_tempfile):
+        """nodes in a lazily read tree are read on first access"""
+        root = Root(name='root')
+        for i in range(3):
+            ar = Array(data=np.full((2,2),i),name=f'ar{i}')
+            root.tree(ar)
+            ar.tree(Array(data=np.full(3,10+i),name='child'))
+        root.tree('ar1/child').tree(array)
+        save(_tempfile,root)
+        _root = read(_tempfile,lazy_tree=True)
+        assert(all(isinstance(v,_NodeStub) for v in _root._branch._dict.values()))
+        # displaying the tree reads nothing
+        assert('(Array)' in repr(_root))
+        _root.tree(show=True)
+        assert(all(isinstance(v,_NodeStub) for v in _root._branch._dict.values()))
+        # reading along a path
+        node = _root.tree('ar1/child/lazy_array')
+        assert(np.array_equal(node.data,array.data))
+        assert(node._treepath == '/ar1/child/lazy_array')
+        assert(node.root is _root)
+        assert(isinstance(_root._branch._dict['ar0'],_NodeStub))
+        assert(_root.tree('/ar1/child') is node.root.tree('ar1/child'))
+        # iteration reads the whole branch
+        for k,v in _root._branch.items():
+            assert(np.array_equal(v.data,np.full((2,2),int(k[-1]))))
+        assert(np.array_equal(_root.tree('ar2/child').data,np.full(3,12)))
+        # writing reads everything
+        save(_tempfile.with_suffix('.copy'),_root)
+        _root2 = read(_tempfile.with_suffix('.copy'))
+        assert(np.array_equal(_root2.tree('ar0/child').data,np.full(3,10)))
+        _tempfile.with_suffix('.copy').unlink()
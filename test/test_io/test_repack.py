@@ -0,0 +1,97 @@
+from emdfile import Array, PointListArray, Root, Metadata, save, read, repack
+from emdfile.repack import _get_unused_fraction
+from emdfile.utils import _get_UUID
+import numpy as np
+import h5py
+from os import chmod
+from os.path import getsize
+import stat
+from pathlib import Path
+import tempfile
+import pytest
+
+
+class TestRepack:
+
+    @pytest.fixture
+    def _tempfile(self):
+        """Create an empty temporary file and return as a Path."""
+        tf = tempfile.NamedTemporaryFile(mode='wb')
+        tf.close()  # need to close the file to use it later
+        return Path(tf.name)
+
+    @pytest.fixture
+    def root(self):
+        """Make a tree"""
+        root = Root(name='root')
+        root.metadata = Metadata(name='md',data={'a':1})
+        ar = Array(data=np.random.rand(64,64,4),name='ar')
+        root.tree(ar)
+        ar.tree(Array(data=np.arange(10),name='child'))
+        pla = PointListArray(dtype=[('x',float)],shape=(4,4),name='pla')
+        pla[1,1].add(np.ones(20,dtype=[('x',float)]))
+        root.tree(pla)
+        return root
+
+    def grow(self,root,path,n=4):
+        """Overwrite the Array's group several times"""
+        ar = root.tree('ar')
+        for i in range(n):
+            ar.set_storage(chunks=(8,8,4) if i%2 else (16,16,4))
+            save(path,root,mode='ao')
+
+    def test_repack(self,root,_tempfile):
+        save(_tempfile,root)
+        size = getsize(_tempfile)
+        uuid = _get_UUID(_tempfile)
+        self.grow(root,_tempfile)
+        assert(getsize(_tempfile) > 1.5*size)
+        assert(_get_unused_fraction(_tempfile) > 0.3)
+        # below the threshold, nothing happens
+        grown = getsize(_tempfile)
+        assert(repack(_tempfile,threshold=0.99) == 0)
+        assert(getsize(_tempfile) == grown)
+        # repack
+        reclaimed = repack(_tempfile)
+        assert(reclaimed > 0)
+        assert(getsize(_tempfile) == grown - reclaimed)
+        assert(_get_unused_fraction(_tempfile) < 0.3)
+        assert(_get_UUID(_tempfile) == uuid)
+        _root = read(_tempfile)
+        assert(np.array_equal(_root.tree('ar').data,root.tree('ar').data))
+        assert(np.array_equal(_root.tree('ar/child').data,np.arange(10)))
+        assert(len(_root.tree('pla')[1,1]) == 20)
+        assert(_root.metadata['md']['a'] == 1)
+
+    def test_repack_keeps_mode(self,root,_tempfile):
+        """repacking in place keeps the file's permissions"""
+        save(_tempfile,root)
+        chmod(_tempfile,0o644)
+        repack(_tempfile)
+        assert(stat.S_IMODE(_tempfile.stat().st_mode) == 0o644)
+        chmod(_tempfile,0o640)
+        self.grow(root,_tempfile,n=2)
+        save(_tempfile,root,mode='ao',repack_threshold=0)
+        assert(stat.S_IMODE(_tempfile.stat().st_mode) == 0o640)
+
+    def test_repack_storage(self,root,_tempfile):
+        save(_tempfile,root)
+        out = _tempfile.with_suffix('.repacked')
+        repack(_tempfile,outpath=out,storage={'compression':'gzip','chunks':(32,32,4)})
+        with h5py.File(out,'r') as f:
+            dset = f['root/ar/data']
+            assert(dset.compression == 'gzip')
+            assert(dset.chunks == (32,32,4))
+        with h5py.File(_tempfile,'r') as f:
+            assert(f['root/ar/data'].compression is None)
+        _root = read(out)
+        assert(np.array_equal(_root.tree('ar').data,root.tree('ar').data))
+        out.unlink()
+
+    def test_save_repack_threshold(self,root,_tempfile):
+        save(_tempfile,root)
+        ar = root.tree('ar')
+        for i in range(4):
+            ar.set_storage(chunks=(8,8,4) if i%2 else (16,16,4))
+            save(_tempfile,root,mode='ao',repack_threshold=0.3)
+            assert(_get_unused_fraction(_tempfile) <= 0.3)
@@ -0,0 +1,132 @@
+from emdfile import (ArrayStream, PointListArrayStream, PointList, Metadata,
+    Root, save, read, read_pla_counts)
+import numpy as np
+import h5py
+from pathlib import Path
+import tempfile
+import pytest
+
+
+class TestArrayStream:
+
+    @pytest.fixture
+    def _tempfile(self):
+        """Create an empty temporary file and return as a Path."""
+        tf = tempfile.NamedTemporaryFile(mode='wb')
+        tf.close()  # need to close the file to use it later
+        return Path(tf.name)
+
+    def test_unbounded(self,_tempfile):
+        """append frames and blocks to a growing array"""
+        frames = np.random.random((7,8,9))
+        stream = ArrayStream(
+            _tempfile,
+            shape = (None,8,9),
+            dtype = frames.dtype,
+            name = 'frames',
+            dims = [0.5,[0,2]],
+            dim_units = ['s','nm'],
+            metadata = Metadata(name='acquisition',data={'rate':400}),
+            mode = 'o',
+        )
+        stream.append(frames[0])
+        stream.append(frames[1:3])
+        stream.flush()
+        # the file is readable at flush points
+        with h5py.File(_tempfile,'r') as f:
+            assert(f['frames_root/frames/data'].shape == (3,8,9))
+        stream.append(frames[3:])
+        stream.close()
+        ar = read(_tempfile)
+        assert(np.array_equal(ar.data,frames))
+        assert(np.array_equal(ar.dim(0),np.arange(7)*0.5))
+        assert(np.array_equal(ar.dim(1),np.arange(8)*2))
+        assert(ar.dim_units[0] == 's')
+        assert(ar.metadata['acquisition']['rate'] == 400)
+
+    def test_fixed_shape(self,_tempfile):
+        """write frames into a fixed shape 4D array"""
+        data = np.random.randint(0,100,(3,4,5,6)).astype(np.uint8)
+        with ArrayStream(
+            _tempfile,
+            shape = data.shape,
+            dtype = data.dtype,
+            name = 'datacube',
+            storage = {'compression':'gzip'},
+            mode = 'o',
+        ) as stream:
+            for rx in range(3):
+                for ry in range(4):
+                    stream.write((rx,ry),data[rx,ry])
+        ar = read(_tempfile)
+        assert(np.array_equal(ar.data,data))
+        assert(ar.storage['chunks'] == (1,1,5,6))
+        # appending past the end raises an error
+        with ArrayStream(_tempfile,shape=(2,3),mode='o') as stream:
+            stream.append(np.ones((2,3)))
+            with pytest.raises(AssertionError):
+                stream.append(np.ones(3))
+
+    def test_append_to_tree(self,_tempfile):
+        """stream an array into an existing EMD tree"""
+        root = Root(name='experiment')
+        save(_tempfile,root,mode='o')
+        with ArrayStream(
+            _tempfile,
+            shape = (None,2),
+            name = 'trace',
+            mode = 'a',
+            emdpath = 'experiment',
+        ) as stream:
+            for i in range(5):
+                stream.append([i,2*i])
+        ar = read(_tempfile,emdpath='experiment/trace')
+        assert(ar.data.shape == (5,2))
+        assert(np.array_equal(ar.data[:,1],2*np.arange(5)))
+
+
+class TestPointListArrayStream:
+
+    @pytest.fixture
+    def _tempfile(self):
+        """Create an empty temporary file and return as a Path."""
+        tf = tempfile.NamedTemporaryFile(mode='wb')
+        tf.close()  # need to close the file to use it later
+        return Path(tf.name)
+
+    def cell(self,rx,ry):
+        data = np.zeros(rx+ry,dtype=[('qx',float),('qy',float)])
+        data['qx'] = rx
+        data['qy'] = np.arange(rx+ry)
+        return data
+
+    def test_rows_and_cells(self,_tempfile):
+        """write rows and cells, reading partial results between flushes"""
+        stream = PointListArrayStream(
+            _tempfile,
+            dtype = [('qx',float),('qy',float)],
+            shape = (4,3),
+            name = 'peaks',
+            metadata = Metadata(name='params',data={'thresh':0.1}),
+            mode = 'o',
+        )
+        stream.write_row(0,[self.cell(0,ry) for ry in range(3)])
+        stream.write(2,1,PointList(self.cell(2,1)))
+        stream.flush()
+        # the file is readable at flush points
+        with h5py.File(_tempfile,'r') as f:
+            pla = read(f)
+            assert(pla[0,2].length == 2)
+            assert(pla[2,1].length == 3)
+            assert(pla[3,2].length == 0)
+        for rx in range(1,4):
+            stream.write_row(rx,[self.cell(rx,ry) for ry in range(3)])
+        stream.close()
+        pla = read(_tempfile)
+        assert(pla.shape == (4,3))
+        for rx in range(4):
+            for ry in range(3):
+                assert(np.array_equal(pla[rx,ry].data,self.cell(rx,ry)))
+        assert(np.array_equal(
+            read_pla_counts(_tempfile,'peaks_root/peaks'),pla.counts))
+        assert(pla.metadata['params']['thresh'] == 0.1)
@@ -0,0 +1,135 @@
+from emdfile import Array, Root, Writer, save, read
+import emdfile.write
+from emdfile.classes.utils import _set_io_options
+import numpy as np
+import h5py
+from pathlib import Path
+import tempfile
+import pytest
+import gc
+from types import SimpleNamespace
+
+
+class TestWriter:
+
+    @pytest.fixture
+    def _tempfile(self):
+        """Create an empty temporary file and return as a Path."""
+        tf = tempfile.NamedTemporaryFile(mode='wb')
+        tf.close()  # need to close the file to use it later
+        return Path(tf.name)
+
+    @pytest.fixture
+    def root(self):
+        """Make a root with two Arrays"""
+        root = Root(name='root')
+        root.tree(Array(data=np.arange(10),name='ar1'))
+        root.tree(Array(data=np.eye(3),name='ar2'))
+        return root
+
+    @pytest.fixture
+    def opens(self,monkeypatch):
+        """Count the files opened for writing"""
+        calls = []
+        _File = h5py.File
+        def File(*args,**kwargs):
+            calls.append(args)
+            return _File(*args,**kwargs)
+        monkeypatch.setattr(emdfile.write,'h5py',SimpleNamespace(File=File))
+        return calls
+
+    def test_session(self,root,_tempfile):
+        """many writes in one session"""
+        with Writer(_tempfile,mode='o') as w:
+            w.save(root)
+            w.save(Array(data=np.ones(4),name='other'))
+            w.append(Array(data=np.zeros(2),name='child'),emdpath='root/ar1')
+        _root = read(_tempfile,emdpath='root')
+        assert(np.array_equal(_root.tree('ar1').data,np.arange(10)))
+        assert(np.array_equal(_root.tree('ar1/child').data,np.zeros(2)))
+        assert(np.array_equal(read(_tempfile,emdpath='other_root/other').data,np.ones(4)))
+
+    def test_save_and_append(self,root,_tempfile):
+        """save overwrites existing nodes and append skips them"""
+        save(_tempfile,root,mode='o')
+        root.tree('ar1').data = np.arange(10)*2
+        with Writer(_tempfile) as w:
+            w.append(root)
+            assert(np.array_equal(w._file['root/ar1/data'][()],np.arange(10)))
+            w.save(root)
+        assert(np.array_equal(read(_tempfile).tree('ar1').data,np.arange(10)*2))
+
+    def test_one_open(self,root,_tempfile,opens):
+        """writing a list of rooted nodes opens the file once"""
+        save(_tempfile,[root.tree('ar1'),root.tree('ar2')],mode='o')
+        assert(len(opens) == 1)
+        _root = read(_tempfile)
+        assert(np.array_equal(_root.tree('ar2').data,np.eye(3)))
+
+    def test_dry_run_list(self,root,_tempfile):
+        """a dry run of a list write to a new file reports every node"""
+        report = save(_tempfile,[root.tree('ar1'),root.tree('ar2')],mode='o',dry_run=True)
+        assert(not _tempfile.exists())
+        assert(report == [
+            ('/root','write'),
+            ('/root/ar1','write'),
+            ('/root/ar2','write'),
+        ])
+
+    @pytest.mark.parametrize("exists",[False,True])
+    def test_dry_run_emdpath(self,root,_tempfile,exists):
+        """in a dry run, nodes can be appended by emdpath under roots added
+        earlier in the session"""
+        if exists:
+            save(_tempfile,Array(data=np.ones(2),name='other'),mode='o')
+        report = []
+        with _set_io_options(dry_run=True,removed=set(),report=report):
+            with Writer(_tempfile,mode='a' if exists else 'o') as w:
+                w.save(root)
+                w.append(Array(data=np.zeros(2),name='child'),emdpath='root/ar1')
+                w.append(root,emdpath='root/ar2')
+        assert(report == [
+            ('/root','write'),
+            ('/root/ar1','write'),
+            ('/root/ar2','write'),
+            ('/root/ar1/child','write'),
+        ])
+        if exists:
+            with h5py.File(_tempfile,'r') as f:
+                assert(list(f.keys()) == ['other_root'])
+        else:
+            assert(not _tempfile.exists())
+
+    def test_held_read_only(self,root,_tempfile):
+        """a file held open by untracked lazy data can't be written"""
+        save(_tempfile,root,mode='o')
+        _root = read(_tempfile,lazy_tree=True)
+        with pytest.raises(Exception,match="mode='r\\+'"):
+            Writer(_tempfile)
+        del _root
+        gc.collect()
+        with Writer(_tempfile) as w:
+            w.save(root)
+
+    def test_closed(self,root,_tempfile):
+        """a closed Writer can't write, and mode 'w' won't overwrite"""
+        with Writer(_tempfile,mode='o') as w:
+            w.save(root)
+        with pytest.raises(AssertionError):
+            w.save(root)
+        with pytest.raises(AssertionError):
+            Writer(_tempfile,mode='w')
+
+    def test_close(self,root,_tempfile):
+        """closing is safe to repeat, inside a with block, and before flush"""
+        w = Writer(_tempfile,mode='o')
+        w.save(root)
+        w.close()
+        w.close()
+        w.flush()
+        with Writer(_tempfile) as w:
+            w.append(root)
+            w.close()
+        with pytest.raises(AssertionError):
+            w.save(root)
+        assert(np.array_equal(read(_tempfile).tree('ar1').data,np.arange(10)))
@@ -0,0 +1,61 @@
+import emdfile as emd
+from emdfile import Array, Metadata, register_class, save, read
+from emdfile.classes.utils import _class_registry
+import numpy as np
+import sys
+import types
+from pathlib import Path
+import tempfile
+import pytest
+
+
+class TestRegistry:
+
+    @pytest.fixture
+    def _tempfile(self):
+        """Create an empty temporary file and return as a Path."""
+        tf = tempfile.NamedTemporaryFile(mode='wb')
+        tf.close()  # need to close the file to use it later
+        return Path(tf.name)
+
+    def test_register_class(self,_tempfile):
+        """explicitly registered classes are found at read time"""
+        @register_class
+        class RegisteredArray(Array):
+            pass
+        ar = RegisteredArray(data=np.arange(4),name='registered')
+        save(_tempfile,ar,mode='o')
+        ar2 = read(_tempfile)
+        assert(isinstance(ar2,RegisteredArray))
+        assert(np.array_equal(ar2.data,ar.data))
+
+    def test_hooked_module(self,_tempfile):
+        """classes in hooked modules imported after a read are found"""
+        # read once to populate the registry
+        save(_tempfile,Array(data=np.ones(3),name='a'),mode='o')
+        read(_tempfile)
+        # add a hooked module
+        module = types.ModuleType('_emd_test_hooked_module')
+        module._emd_hook = True
+        class HookedMetadata(Metadata):
+            pass
+        module.HookedMetadata = HookedMetadata
+        sys.modules[module.__name__] = module
+        try:
+            ar = Array(data=np.ones(3),name='b')
+            ar.metadata = HookedMetadata(name='hooked',data={'x':1})
+            save(_tempfile,ar,mode='o')
+            ar2 = read(_tempfile)
+            assert(isinstance(ar2.metadata['hooked'],HookedMetadata))
+            assert(ar2.metadata['hooked']['x'] == 1)
+            assert(_class_registry['HookedMetadata'] is HookedMetadata)
+        finally:
+            del sys.modules[module.__name__]
+
+    def test_unknown_class(self,_tempfile):
+        """unknown classes raise an Exception"""
+        class UnregisteredArray(Array):
+            pass
+        save(_tempfile,UnregisteredArray(data=np.ones(2)),mode='o')
+        with pytest.raises(Exception):
+            read(_tempfile)
@@ -363,6 +363,34 @@ class TestTree:
         assert(isinstance(data,PointList))
         assert(data == pl4)
 
+    def test_path_index(self,tree,tree2):
+        """
+        The root's path index tracks adds, cuts and grafts
+        """
+        pl3 = tree.tree('pointlist3')
+        pl4 = tree.tree('pointlist3/pointlist4')
+        assert(tree._index['/pointlist3/pointlist4'] is pl4)
+        assert(pl3.tree('pointlist4') is pl4)
+        assert(pl4.tree('/array/pointlistarray/pointlist2') is tree.tree('array/pointlistarray/pointlist2'))
+        # grafting a branch moves it and everything downstream of it
+        ar2 = tree2.tree('array2')
+        ar2.graft(pl3)
+        for path in ('/pointlist3','/pointlist3/pointlist4'):
+            assert(path not in tree._index)
+        assert(tree2.tree('array2/pointlist3/pointlist4') is pl4)
+        assert(pl4.root is tree2)
+        assert(pl4._treepath == '/array2/pointlist3/pointlist4')
+        with pytest.raises(AssertionError):
+            tree.tree('pointlist3')
+        # cutting
+        new_root = pl3.tree(cut=False)
+        assert(set(tree2._index.keys()) == {'/array2','/array2/pointlist5'})
+        assert(new_root.tree('/pointlist3/pointlist4') is pl4)
+        # replacing a node
+        _pl4 = PointList(data=np.zeros(1,dtype=[('x',int)]),name='pointlist4')
+        pl3.tree(_pl4)
+        assert(new_root.tree('pointlist3/pointlist4') is _pl4)
+
     # Write
 
     def test_write_single_node(self,tree,testpath):
@@ -429,6 +457,20 @@ class TestTree:
 
     # More
 
+    def test_append_new_branch(self,testpath,tree):
+        """
+        Appending a new node writes its own branch under it
+        """
+        save(testpath,tree)
+        ar = tree.tree('array')
+        node = Node(name='new_node')
+        ar.tree(node)
+        node.tree(Node(name='new_child'))
+        save(testpath,tree,mode='a')
+        with h5py.File(testpath,'r') as f:
+            assert('root/array/new_node/new_child' in f)
+            assert('root/array/new_child' not in f)
+
     def test_is_EMD_file(self,testpath,tree):
         save(testpath,tree)
         assert(_is_EMD_file(testpath))